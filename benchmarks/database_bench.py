@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Database benchmark suite.
+
+Times the BudgyDatabase operations that grow with the number of transactions against
+synthetic databases (budgy.core.synthetic) of each size: merging a statement that is
+new and one that was already imported, find_duplicate_by_content, get_report,
+all_records with and without year / month filters, bulk_categorize and get_date_range.
+Every operation runs --repeat times and the fastest run is reported. Operations that
+change the database run on a fresh copy each time.
+
+The default sizes are 10k and 100k transactions; --full adds the 1M database (slow to
+create the first time, use --data-dir to keep it). --sizes picks the sizes explicitly.
+
+With --baseline the results are compared to an earlier --json file and the run fails
+when an operation is more than --tolerance slower than it was, or when a size or an
+operation is only in one of the two, since it could not be compared.
+
+    python benchmarks/database_bench.py
+    python benchmarks/database_bench.py --full --data-dir ~/budgy-bench
+    python benchmarks/database_bench.py --json after.json --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.synthetic import SyntheticLedger, create_database
+
+DEFAULT_SIZES = [10000, 100000]
+FULL_SIZES = [10000, 100000, 1000000]
+DEFAULT_TOLERANCE = 0.25
+# differences below this are noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.005
+DUPLICATE_LOOKUPS = 200
+NEW_ACCOUNTS = (('BENCH-CHK', 'checking'), ('BENCH-VISA', 'credit'))
+
+
+def database_path(data_dir, size, seed):
+    """The synthetic database of size records, created the first time it is needed"""
+    path = os.path.join(data_dir, f'synthetic-{size}-{seed}.db')
+    if not os.path.exists(path):
+        start = time.perf_counter()
+        create_database(path + '.tmp', SyntheticLedger(size, seed=seed)).connection.close()
+        os.replace(path + '.tmp', path)
+        print(f'Created {path} in {time.perf_counter() - start:.1f}s')
+    return path
+
+
+def best_of(repeat, function, setup=None):
+    """Fastest of repeat runs of function(setup())"""
+    times = []
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        start = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def run_size(size, seed, data_dir, repeat):
+    path = database_path(data_dir, size, seed)
+    ledger = SyntheticLedger(size, seed=seed)
+    months = ledger.iter_months()
+    first_month = next(months)
+    last_month = first_month
+    for last_month in months:
+        pass
+    middle = ledger.month_start(ledger.months // 2)
+    year, month = str(middle.year), f'{middle.month:02d}'
+    new_records = SyntheticLedger(1000, seed=seed + 1, accounts=NEW_ACCOUNTS,
+                                  start=ledger.month_start(ledger.months)).records()
+    lookups = first_month[:DUPLICATE_LOOKUPS]
+
+    database = BudgyDatabase(path)
+    copy_path = os.path.join(data_dir, f'copy-{size}.db')
+
+    def fresh_copy(_=None):
+        shutil.copy(path, copy_path)
+        return BudgyDatabase(copy_path)
+
+    def find_duplicates(_):
+        for record in lookups:
+            database.find_duplicate_by_content(record)
+
+    results = {
+        'merge_records (new)': best_of(repeat, lambda db: db.merge_records(new_records), fresh_copy),
+        'merge_records (reimport)': best_of(repeat, lambda db: db.merge_records(last_month), fresh_copy),
+        f'find_duplicate_by_content x{len(lookups)}': best_of(repeat, find_duplicates),
+        'get_report': best_of(repeat, lambda _: database.get_report()),
+        'all_records': best_of(repeat, lambda _: database.all_records()),
+        'all_records (year)': best_of(repeat, lambda _: database.all_records(year=year)),
+        'all_records (year, month)': best_of(repeat, lambda _: database.all_records(year=year, month=month)),
+        'bulk_categorize': best_of(repeat, lambda db: db.bulk_categorize('BLUE%', 'Shopping',
+                                                                         include_categorized=True), fresh_copy),
+        'get_date_range': best_of(repeat, lambda _: database.get_date_range()),
+    }
+    database.connection.close()
+    os.remove(copy_path)
+    return {name: round(seconds, 6) for name, seconds in results.items()}
+
+
+def compare(results, baseline, tolerance):
+    """[(size, operation, baseline seconds, seconds)] of the operations that got slower than tolerance allows"""
+    regressions = []
+    for size, operations in results['sizes'].items():
+        for name, seconds in operations.items():
+            before = baseline.get('sizes', {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            if seconds > before * (1 + tolerance) and seconds - before > MIN_REGRESSION_SECONDS:
+                regressions.append((size, name, before, seconds))
+    return regressions
+
+
+def missing_entries(results, baseline):
+    """[(size, operation, where it is missing)] of what is in the results or the baseline but not in both"""
+    missing = []
+    measured = results['sizes']
+    expected = baseline.get('sizes', {})
+    for size in sorted(set(measured) | set(expected), key=int):
+        for name in measured.get(size, {}):
+            if name not in expected.get(size, {}):
+                missing.append((size, name, 'baseline'))
+        for name in expected.get(size, {}):
+            if name not in measured.get(size, {}):
+                missing.append((size, name, 'results'))
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser('database_bench')
+    sizes = parser.add_mutually_exclusive_group()
+    sizes.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                       help=f'Database sizes in transactions (default: {" ".join(map(str, DEFAULT_SIZES))})')
+    sizes.add_argument('--full', dest='sizes', action='store_const', const=FULL_SIZES,
+                       help=f'Run the full set of sizes: {" ".join(map(str, FULL_SIZES))}')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the synthetic data')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per operation, the fastest is reported')
+    parser.add_argument('--data-dir', help='Keep the synthetic databases here and reuse them in later runs')
+    parser.add_argument('--json', help='Also write the results to this file')
+    parser.add_argument('--baseline', help='Results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed slowdown against the baseline, 0.25 is 25%% (default: {DEFAULT_TOLERANCE})')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        data_dir = os.path.expanduser(args.data_dir) if args.data_dir else tmpdir
+        os.makedirs(data_dir, exist_ok=True)
+        results = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+            'sizes': {str(size): run_size(size, args.seed, data_dir, args.repeat) for size in args.sizes}
+        }
+
+    sizes = list(results['sizes'])
+    print(f'{"operation (ms)":<34}' + ''.join(f'{size:>12}' for size in sizes))
+    for name in results['sizes'][sizes[0]]:
+        print(f'{name:<34}' + ''.join(f'{results["sizes"][size][name] * 1000:>12.2f}' for size in sizes))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for size, name, before, seconds in regressions:
+            print(f'REGRESSION: {name} at {size} records took {seconds * 1000:.2f}ms, '
+                  f'baseline {before * 1000:.2f}ms (+{(seconds / before - 1):.0%})')
+        missing = missing_entries(results, baseline)
+        for size, name, where in missing:
+            print(f'MISSING: {name} at {size} records is not in the {where}')
+        if len(regressions) > 0:
+            print(f'{len(regressions)} operations are more than {args.tolerance:.0%} slower than {args.baseline}')
+        if len(missing) > 0:
+            print(f'{len(missing)} operations could not be compared with {args.baseline}')
+        if len(regressions) > 0 or len(missing) > 0:
+            return 1
+        print(f'No regressions against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark for the budgy console entry points.
+
+Each entry point module from setup.cfg is imported in a fresh interpreter with
+`python -X importtime`. The report shows the total import time, the wall clock time
+of the interpreter, which heavy dependencies were loaded and the slowest top level
+imports, so a change that pulls pygame or ofxtools into a command line tool shows up.
+
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 5 --json startup.json
+"""
+import argparse
+import configparser
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT_DIR, 'src')
+HEAVY_MODULES = ['ofxtools', 'pygame', 'pygame_gui', 'dateutils']
+
+
+def entry_points():
+    """{'budgy-import': 'budgy.core.importer', ...} from the console_scripts in setup.cfg"""
+    config = configparser.ConfigParser()
+    config.read(os.path.join(ROOT_DIR, 'setup.cfg'))
+    scripts = {}
+    for line in config['options.entry_points']['console_scripts'].strip().splitlines():
+        name, target = [part.strip() for part in line.split('=', 1)]
+        scripts[name] = target.split(':')[0]
+    return scripts
+
+
+def parse_importtime(output):
+    """[(name, self_us, cumulative_us, depth)] from -X importtime output"""
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure(module):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get('PYTHONPATH', '')]),
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    imports = parse_importtime(proc.stderr)
+    names = {name.split('.')[0] for name, _, _, _ in imports}
+    return {
+        'module': module,
+        'ok': proc.returncode == 0,
+        'wall_ms': wall * 1000,
+        'import_ms': sum(self_us for _, self_us, _, _ in imports) / 1000,
+        'modules': len(imports),
+        'heavy': [name for name in HEAVY_MODULES if name in names],
+        'slowest': [{'name': name, 'cumulative_ms': cumulative / 1000}
+                    for name, _, cumulative, depth in sorted(imports, key=lambda i: -i[2])
+                    if depth == 1][:5]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser('startup_time')
+    parser.add_argument('--runs', type=int, default=3, help='Runs per entry point, the fastest is reported')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    for script, module in entry_points().items():
+        runs = [measure(module) for _ in range(args.runs)]
+        results[script] = min(runs, key=lambda r: r['import_ms'])
+
+    print(f'{"entry point":<16}{"import ms":>10}{"wall ms":>10}{"modules":>9}  heavy dependencies')
+    for script, result in results.items():
+        heavy = ', '.join(result['heavy']) if result['ok'] else 'IMPORT FAILED'
+        print(f'{script:<16}{result["import_ms"]:>10.1f}{result["wall_ms"]:>10.1f}{result["modules"]:>9}  {heavy}')
+    for script, result in results.items():
+        slowest = ', '.join(f'{s["name"]} {s["cumulative_ms"]:.1f}' for s in result['slowest'])
+        print(f'  {script}: {slowest}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if all(r['ok'] for r in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
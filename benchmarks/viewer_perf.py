@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Headless performance harness for budgy-viewer.
+
+Boots BudgyViewerApp with the SDL dummy video driver against a synthetic database, then
+replays scripted interactions: scrolling the record view, opening detail reports and
+changing categories. Frames are run the way GuiApp.run runs them, without waiting for the
+clock, so the numbers are the work the viewer does. The report shows frame times, max RSS
+and the latency of every interaction (events posted until the frame that handled them is
+drawn), and --max-latency makes the run fail when an interaction gets too slow.
+
+tracemalloc slows down every allocation, so the timed run does not trace memory.
+--trace-memory replays the same interactions a second time, on a fresh copy of the
+database, to report the peak Python memory. HOME points at the temporary directory while
+the viewer runs, so nothing is written to the real ~/.config/budgy.
+
+    python benchmarks/viewer_perf.py
+    python benchmarks/viewer_perf.py --records 100000 --trace-memory --json viewer-perf.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import pygame
+
+from budgy.core.synthetic import SyntheticLedger, create_database
+from budgy.gui.configdata import BudgyConfig
+from budgy.gui.events import category_changed_event
+from budgy.gui.profiler import RollingStats
+from budgy.gui.viewer import BudgyViewerApp
+from budgy.gui.report_panel import EXPENSE_DETAILS_REQUEST
+
+FRAME_SECONDS = 1 / 60
+
+
+class ViewerHarness(object):
+    def __init__(self, workdir: Path, database_path: Path):
+        config = BudgyConfig(configdir=workdir / 'config')
+        config.config_dict['database']['path'] = str(database_path)
+        config.config_dict['import_data']['import_dir'] = str(workdir)
+        config.save_config()
+        argv = ['budgy-viewer', '--log-dir', str(workdir / 'logs'), '--profile', str(workdir / 'profile.json')]
+        # BudgyViewerApp() reads and saves the default config in ~/.config/budgy
+        (workdir / '.config').mkdir(exist_ok=True)
+        with patch.object(sys, 'argv', argv), patch.dict(os.environ, {'HOME': str(workdir)}):
+            self.app = BudgyViewerApp()
+            self.app._config = config
+            self.app.setup()
+        self.profiler = self.app._profiler
+        self.interactions = {}
+
+    def frame(self):
+        for event in pygame.event.get():
+            if not self.app.handle_event(event):
+                self.app.ui_manager.process_events(event)
+        self.app.ui_manager.update(FRAME_SECONDS)
+        self.app.ui_manager.draw_ui(pygame.display.get_surface())
+        pygame.display.update()
+
+    def settle(self, frames=3):
+        for _ in range(frames):
+            self.frame()
+
+    def interact(self, name, events):
+        """Post events, run frames until they are handled and record how long it took"""
+        start = time.perf_counter()
+        for event in events:
+            pygame.event.post(event)
+        self.frame()
+        while pygame.event.peek():
+            self.frame()
+        elapsed = time.perf_counter() - start
+        if name not in self.interactions:
+            self.interactions[name] = RollingStats()
+        self.interactions[name].add(elapsed)
+
+    def scroll(self, steps, rng):
+        self.app.function_panel.show_subpanel('data')
+        self.settle()
+        for _ in range(steps):
+            amount = rng.choice([-3, -1, -1, 1])
+            self.interact('scroll', [pygame.event.Event(pygame.MOUSEWHEEL, {
+                'x': 0, 'y': amount, 'flipped': False, 'precise_x': 0.0, 'precise_y': float(amount)
+            })])
+
+    def open_details(self, count, rng):
+        self.app.function_panel.show_subpanel('report')
+        self.settle()
+        start, end = self.app._database.get_date_range()
+        years = list(range(start.year, end.year + 1))
+        for _ in range(count):
+            month = rng.choice([None] + list(range(1, 13)))
+            self.interact('detail report', [pygame.event.Event(EXPENSE_DETAILS_REQUEST, {
+                'year': rng.choice(years), 'month': month
+            })])
+
+    def change_categories(self, count, rng):
+        database = self.app._database
+        categories = database.get_catetory_dict()
+        choices = [(category, subcategory) for category in categories for subcategory in categories[category]]
+        records = database.all_records()
+        for _ in range(count):
+            record = rng.choice(records)
+            old_category = database.get_category_for_fitid(record['fitid'])
+            category, subcategory = rng.choice(choices)
+            # what CategoryDialog.save does
+            database.set_txn_category(record['fitid'], category, subcategory)
+            self.interact('change category', [category_changed_event(
+                record['fitid'], record['account'], record['posted'], record['amount'],
+                category, subcategory, categories[category][subcategory], old_category[2])])
+
+
+def replay(workdir: Path, database_path: Path, args):
+    """Start the viewer and run the scripted interactions, returns the harness and the startup seconds"""
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    harness = ViewerHarness(workdir, database_path)
+    harness.settle()
+    startup_seconds = time.perf_counter() - start
+    harness.scroll(args.scroll, rng)
+    harness.open_details(args.details, rng)
+    harness.change_categories(args.categories, rng)
+    return harness, startup_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser('viewer_perf')
+    parser.add_argument('--records', type=int, default=20000, help='Transactions in the synthetic database')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for the data and the interactions')
+    parser.add_argument('--scroll', type=int, default=200, help='Scroll wheel steps in the record view')
+    parser.add_argument('--details', type=int, default=20, help='Detail reports to open')
+    parser.add_argument('--categories', type=int, default=20, help='Category changes')
+    parser.add_argument('--max-latency', type=float, metavar='MS',
+                        help='Fail when the p95 latency of an interaction is above MS milliseconds')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Replay the interactions again under tracemalloc to report the peak Python memory')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = Path(tmpdir)
+        database_path = workdir / 'viewer-perf.db'
+        start = time.perf_counter()
+        create_database(database_path, SyntheticLedger(args.records, seed=args.seed)).connection.close()
+        create_seconds = time.perf_counter() - start
+        if args.trace_memory:
+            # the timed run changes categories, the memory run starts from the same data
+            shutil.copy(database_path, workdir / 'viewer-memory.db')
+
+        harness, startup_seconds = replay(workdir, database_path, args)
+        profile = harness.profiler.as_dict()
+        # kilobytes on Linux
+        max_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        peak_traced = None
+        if args.trace_memory:
+            tracemalloc.start()
+            replay(workdir, workdir / 'viewer-memory.db', args)
+            peak_traced = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        # pygame_gui keeps its fonts across apps, so pygame is shut down once, after both runs
+        pygame.quit()
+
+    results = {
+        'records': args.records,
+        'seed': args.seed,
+        'create_database_ms': round(create_seconds * 1000, 3),
+        'startup_ms': round(startup_seconds * 1000, 3),
+        'peak_python_bytes': peak_traced,
+        'max_rss_kb': max_rss_kb,
+        'frames': profile['timers'].get('frame'),
+        'widgets': profile['widgets'],
+        'interactions': {name: stats.summary() for name, stats in harness.interactions.items()},
+        'profile': profile
+    }
+
+    memory = f'max RSS {max_rss_kb / 1024:.1f}MB'
+    if peak_traced is not None:
+        memory += f', peak python memory {peak_traced / 1024 / 1024:.1f}MB'
+    print(f'{args.records} records, startup {results["startup_ms"]:.0f}ms, {memory}')
+    print(f'{"":<18}{"count":>7}{"mean ms":>10}{"p50 ms":>10}{"p95 ms":>10}{"max ms":>10}')
+    rows = [('frame', results['frames'])] + list(results['interactions'].items())
+    for name, summary in rows:
+        if summary is None:
+            continue
+        print(f'{name:<18}{summary["count"]:>7}{summary["mean_ms"]:>10.2f}{summary["p50_ms"]:>10.2f}'
+              f'{summary["p95_ms"]:>10.2f}{summary["max_ms"]:>10.2f}')
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_latency is not None:
+        slow = [name for name, summary in results['interactions'].items() if summary['p95_ms'] > args.max_latency]
+        for name in slow:
+            print(f'SLOW: {name} p95 {results["interactions"][name]["p95_ms"]:.1f}ms > {args.max_latency}ms')
+        if len(slow) > 0:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1 +1,6 @@
-from budgy.version import __version__
+def __getattr__(name):
+    # looking up the installed version is slow, only do it when it is asked for
+    if name in ('version', '__version__'):
+        import budgy.version
+        return budgy.version if name == 'version' else budgy.version.__version__
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
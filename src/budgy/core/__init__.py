@@ -1,9 +1,8 @@
 import logging
 from pathlib import Path
 
-import ofxtools
-from ofxtools.Parser import OFXTree
-
+# ofxtools takes a few hundred milliseconds to import. It is imported in load_ofx_file()
+# so tools that never parse statements (budgy-help, budgy-report) start quickly.
 ofxtools_logger = logging.getLogger('ofxtools')
 ofxtools_logger.setLevel(logging.ERROR)
 ofxparser_logger = logging.getLogger('ofxtools.Parser')
@@ -11,13 +10,15 @@ ofxparser_logger.setLevel(logging.ERROR)
 
 
 def load_ofx_file(ofxfile:Path):
+    from ofxtools.Parser import OFXTree
+    from ofxtools.models.bank.stmt import STMTRS
     parser = OFXTree()
     parser.parse(ofxfile)
     ofx = parser.convert()
     records = []
     logging.info(f'{len(ofx.statements)} statements')
     for statement in ofx.statements:
-        is_checking = isinstance(statement, ofxtools.models.bank.stmt.STMTRS)
+        is_checking = isinstance(statement, STMTRS)
         account = statement.bankacctfrom.acctid if is_checking else statement.ccacctfrom.acctid
         for txn in statement.transactions:
             checknum = txn.checknum if is_checking else ''
@@ -7,7 +7,7 @@ import os.path
 import sys
 from pathlib import Path
 
-from budgy import __version__ as BUDGY_VERSION
+import budgy
 
 class BudgyApp(object):
     def __init__(self, app_name):
@@ -114,7 +114,7 @@ class BudgyApp(object):
         header += '##############################\n'
         header += '#\n'
         header += f'# {os.path.basename((sys.argv[0]))}\n'
-        header += f'# budgy {BUDGY_VERSION}\n'
+        header += f'# budgy {budgy.__version__}\n'
         header += f'# Start Time: {datetime.datetime.now()}\n'
         header += '#\n'
         header += '##############################\n'
@@ -0,0 +1,98 @@
+"""
+Parsed statement cache
+
+Parsing an OFX statement with ofxtools is by far the slowest part of importing one.
+StatementCache keeps the records parsed from every statement in a directory, one file
+per statement named by the SHA-256 of the statement's bytes, the parser version and the
+reader options (CSV mapping, default account), so a statement that has not changed is
+never parsed twice. Entries are zlib compressed marshal data: the record field names once,
+then one tuple of values per record.
+
+The cache is bounded by max_bytes. Reading an entry refreshes its modification time and
+the least recently used entries are deleted when the cache grows past the limit.
+"""
+import hashlib
+import json
+import logging
+import marshal
+import os
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from budgy.core.formats import PARSER_VERSION
+
+DEFAULT_CACHE_DIR = Path('~/.config/budgy/cache')
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_SUFFIX = '.records'
+
+
+class StatementCache(object):
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = Path(directory).expanduser()
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(data: bytes, **options) -> str:
+        """Cache key for the statement data parsed with options"""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps([PARSER_VERSION, options], sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key) -> Path:
+        return self.directory / f'{key}{CACHE_SUFFIX}'
+
+    def get(self, key) -> Optional[List[Dict]]:
+        """Cached records or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                fields, rows = marshal.loads(zlib.decompress(f.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, zlib.error) as e:
+            logging.warning(f'Ignoring unreadable cache entry {path}: {e}')
+            return None
+        return [dict(zip(fields, row)) for row in rows]
+
+    def put(self, key, records: List[Dict]):
+        fields = tuple(records[0]) if len(records) > 0 else ()
+        rows = [tuple(record.get(field) for field in fields) for record in records]
+        data = zlib.compress(marshal.dumps((fields, rows)))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        # write then rename so a reader in another process never sees half an entry
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        if self.directory.is_dir():
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(CACHE_SUFFIX):
+                    os.remove(entry.path)
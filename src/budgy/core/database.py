@@ -1,20 +1,60 @@
 import datetime
 import logging
+import os
 import sqlite3
-from typing import List, Dict
+from bisect import bisect_right
+from pathlib import Path
+from typing import List, Dict, Iterator
+from budgy.core.merchants import normalize_merchant_name, LRUCache
+from budgy.core.transfers import find_transfer_pairs, DEFAULT_WINDOW_DAYS
+from budgy.core import duplicates
 class BudgyDatabase(object):
     TXN_TABLE_NAME = 'transactions'
+    TXN_VIEW_NAME = 'transactions_view'
+    ACCOUNT_TABLE_NAME = 'accounts'
+    NAME_TABLE_NAME = 'names'
     CATEGORY_TABLE_NAME = 'categories'
     CATEGORY_RULES_TABLE_NAME = 'cat_rules'
+    MERCHANT_TABLE_NAME = 'merchants'
+    IMPORT_TABLE_NAME = 'imports'
+    IMPORT_FILE_TABLE_NAME = 'import_files'
+    IMPORT_JOURNAL_TABLE_NAME = 'import_journal'
+    MERCHANT_CACHE_SIZE = 4096
+    DICTIONARY_CACHE_SIZE = 4096
+    ITER_BATCH_SIZE = 1000
+    # merge_record results
+    MERGE_INSERTED = 'inserted'
+    MERGE_DUPLICATE = 'duplicate'
+    MERGE_NEAR_DUPLICATE = 'near_duplicate'
     DEFAULT_CATEGORY = 'No Category'
+    TRANSFER_CATEGORY = 'Transfer'
     EMPTY_SUBCATEGORY = ''
     NON_EXPENSE_TYPE = 0
     ONE_TIME_EXPENSE_TYPE = 1
     RECURRING_EXPENSE_TYPE = 2
     connection = None
-    def __init__(self, path):
+    def __init__(self, path, connection=None):
         self.db_path = path
+        if connection is not None:
+            self.connection = connection
+        # canonical merchant name -> merchant id
+        self._merchant_cache = LRUCache(self.MERCHANT_CACHE_SIZE)
+        # account / name text -> dictionary id
+        self._account_cache = LRUCache(self.DICTIONARY_CACHE_SIZE)
+        self._name_cache = LRUCache(self.DICTIONARY_CACHE_SIZE)
         self._open_database()
+    @classmethod
+    def snapshot(cls, path):
+        """
+        In-memory copy of the database at path, read without modifying the file. Nothing done to the
+        copy reaches the file. If path does not exist the copy starts empty.
+        """
+        memory = sqlite3.connect(':memory:')
+        if os.path.exists(path):
+            source = sqlite3.connect(f'{Path(path).absolute().as_uri()}?mode=ro', uri=True)
+            source.backup(memory)
+            source.close()
+        return cls(':memory:', memory)
     def table_exists(self, table_name):
         sql = "SELECT name FROM sqlite_master WHERE type='table' AND name=?;"
         result = self.execute(sql, (table_name,))
@@ -25,28 +65,93 @@ class BudgyDatabase(object):
         result = self.execute(sql, (index_name,))
         rows = result.fetchall()
         return len(rows) > 0
+    def view_exists(self, view_name):
+        sql = "SELECT name FROM sqlite_master WHERE type='view' AND name=?;"
+        result = self.execute(sql, (view_name,))
+        rows = result.fetchall()
+        return len(rows) > 0
+    def column_exists(self, table_name, column_name):
+        result = self.execute(f'PRAGMA table_info({table_name})')
+        for col in result.fetchall():
+            if col[1] == column_name:  # col[1] is column name
+                return True
+        return False
     def _create_txn_table_if_missing(self):
         table_name = self.TXN_TABLE_NAME
         if not self.table_exists(table_name):
             logging.info(f'Creating table: {table_name}')
-            sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
-                  f'fitid INTEGER PRIMARY KEY AUTOINCREMENT, ' \
-                  f'account TEXT, ' \
-                  f'type TEXT, ' \
-                  f'posted TEXT, ' \
-                  f'amount FLOAT, ' \
-                  f'name TEXT, ' \
-                  f'memo TEXT, ' \
-                  f'category INT DEFAULT 1, ' \
-                  f'checknum TEXT' \
-                  f');'
+            sql = self._txn_table_sql(table_name)
             logging.debug(f'Executing SQL: {sql}')
             result = self.execute(sql)
             logging.debug(f'Create Table Result: {result}')
-            # Create index on content fields for duplicate detection
-            sql = f'CREATE INDEX content_lookup ON {table_name} (account, posted, amount, name, memo, type);'
+            self._create_txn_indexes()
+    def _txn_table_sql(self, table_name):
+        # account and name are stored once in dictionary tables and referenced by id
+        return f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+               f'fitid INTEGER PRIMARY KEY AUTOINCREMENT, ' \
+               f'account_id INT, ' \
+               f'type TEXT, ' \
+               f'posted TEXT, ' \
+               f'amount FLOAT, ' \
+               f'name_id INT, ' \
+               f'memo TEXT, ' \
+               f'category INT DEFAULT 1, ' \
+               f'checknum TEXT, ' \
+               f'merchant INT' \
+               f');'
+    def _create_txn_indexes(self):
+        table_name = self.TXN_TABLE_NAME
+        # Create index on content fields for duplicate detection
+        sql = f'CREATE INDEX IF NOT EXISTS content_lookup ON {table_name} (account_id, posted, amount, name_id, memo, type);'
+        result = self.execute(sql)
+        logging.debug(f'Create Content Index: {result}')
+        sql = f'CREATE INDEX IF NOT EXISTS txn_merchant ON {table_name} (merchant);'
+        result = self.execute(sql)
+        logging.debug(f'Create Merchant Index: {result}')
+        sql = f'CREATE INDEX IF NOT EXISTS txn_name ON {table_name} (name_id);'
+        result = self.execute(sql)
+        logging.debug(f'Create Name Index: {result}')
+        # blocking index for near-duplicate detection
+        sql = f'CREATE INDEX IF NOT EXISTS txn_block ON {table_name} (account_id, amount, posted);'
+        result = self.execute(sql)
+        logging.debug(f'Create Block Index: {result}')
+        # sorting and filtering in the record view
+        sql = f'CREATE INDEX IF NOT EXISTS txn_posted ON {table_name} (posted);'
+        result = self.execute(sql)
+        logging.debug(f'Create Posted Index: {result}')
+        sql = f'CREATE INDEX IF NOT EXISTS txn_amount ON {table_name} (amount);'
+        result = self.execute(sql)
+        logging.debug(f'Create Amount Index: {result}')
+        sql = f'CREATE INDEX IF NOT EXISTS txn_category ON {table_name} (category, posted);'
+        result = self.execute(sql)
+        logging.debug(f'Create Category Index: {result}')
+    def _create_dictionary_tables_if_missing(self):
+        for table_name, column in ((self.ACCOUNT_TABLE_NAME, 'account'), (self.NAME_TABLE_NAME, 'name')):
+            if not self.table_exists(table_name):
+                logging.info(f'Creating table: {table_name}')
+                sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+                      f'id INTEGER PRIMARY KEY AUTOINCREMENT, ' \
+                      f'{column} TEXT' \
+                      f');'
+                logging.debug(f'Executing SQL: {sql}')
+                result = self.execute(sql)
+                logging.debug(f'Create Table Result: {result}')
+                sql = f'CREATE UNIQUE INDEX {table_name}_{column} ON {table_name} ({column});'
+                result = self.execute(sql)
+                logging.debug(f'Create Unique Index: {result}')
+    def _create_txn_view_if_missing(self):
+        """Compatibility view with the account and name text joined back in (same column order as the old table)"""
+        if not self.view_exists(self.TXN_VIEW_NAME):
+            logging.info(f'Creating view: {self.TXN_VIEW_NAME}')
+            sql = (f'CREATE VIEW IF NOT EXISTS {self.TXN_VIEW_NAME} AS '
+                   f'SELECT t.fitid AS fitid, a.account AS account, t.type AS type, t.posted AS posted, '
+                   f't.amount AS amount, n.name AS name, t.memo AS memo, t.category AS category, '
+                   f't.checknum AS checknum, t.merchant AS merchant, t.account_id AS account_id, t.name_id AS name_id '
+                   f'FROM {self.TXN_TABLE_NAME} AS t '
+                   f'JOIN {self.ACCOUNT_TABLE_NAME} AS a ON a.id = t.account_id '
+                   f'JOIN {self.NAME_TABLE_NAME} AS n ON n.id = t.name_id;')
             result = self.execute(sql)
-            logging.debug(f'Create Unique Index: {result}')
+            logging.debug(f'Create View Result: {result}')
     def _create_rules_table_if_missing(self):
         table_name = self.CATEGORY_RULES_TABLE_NAME
         if not self.table_exists(table_name):
@@ -55,11 +160,76 @@ class BudgyDatabase(object):
                    f'id INTEGER PRIMARY KEY AUTOINCREMENT, ' \
                    f'pattern TEXT, ' \
                    f'category TEXT, ' \
-                   f'subcategory TEXT ' \
+                   f'subcategory TEXT, ' \
+                   f'merchant INT' \
                    f');'
             logging.debug(f'Executing SQL: {sql}')
             result = self.execute(sql)
             logging.debug(f'Create Table Result: {result}')
+    def _create_merchant_table_if_missing(self):
+        table_name = self.MERCHANT_TABLE_NAME
+        if not self.table_exists(table_name):
+            logging.info(f'Creating table: {table_name}')
+            sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+                  f'id INTEGER PRIMARY KEY AUTOINCREMENT, ' \
+                  f'name TEXT' \
+                  f');'
+            logging.debug(f'Executing SQL: {sql}')
+            result = self.execute(sql)
+            logging.debug(f'Create Table Result: {result}')
+            sql = f'CREATE UNIQUE INDEX merchant_name ON {table_name} (name);'
+            result = self.execute(sql)
+            logging.debug(f'Create Unique Index: {result}')
+    def _create_import_table_if_missing(self):
+        table_name = self.IMPORT_TABLE_NAME
+        if not self.table_exists(table_name):
+            logging.info(f'Creating table: {table_name}')
+            sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+                  f'id INTEGER PRIMARY KEY AUTOINCREMENT, ' \
+                  f'account_id INT, ' \
+                  f'first_posted TEXT, ' \
+                  f'last_posted TEXT, ' \
+                  f'records INT, ' \
+                  f'inserted INT, ' \
+                  f'stored INT, ' \
+                  f'imported TEXT' \
+                  f');'
+            logging.debug(f'Executing SQL: {sql}')
+            result = self.execute(sql)
+            logging.debug(f'Create Table Result: {result}')
+            sql = f'CREATE INDEX import_account ON {table_name} (account_id, first_posted);'
+            result = self.execute(sql)
+            logging.debug(f'Create Index: {result}')
+    def _create_import_file_table_if_missing(self):
+        table_name = self.IMPORT_FILE_TABLE_NAME
+        if not self.table_exists(table_name):
+            logging.info(f'Creating table: {table_name}')
+            sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+                  f'id INTEGER PRIMARY KEY AUTOINCREMENT, ' \
+                  f'path TEXT UNIQUE, ' \
+                  f'size INT, ' \
+                  f'mtime INT, ' \
+                  f'records INT, ' \
+                  f'imported TEXT' \
+                  f');'
+            logging.debug(f'Executing SQL: {sql}')
+            result = self.execute(sql)
+            logging.debug(f'Create Table Result: {result}')
+    def _create_import_journal_table_if_missing(self):
+        table_name = self.IMPORT_JOURNAL_TABLE_NAME
+        if not self.table_exists(table_name):
+            logging.info(f'Creating table: {table_name}')
+            sql = f'CREATE TABLE IF NOT EXISTS {table_name} (' \
+                  f'source TEXT PRIMARY KEY, ' \
+                  f'size INT, ' \
+                  f'mtime INT, ' \
+                  f'records INT, ' \
+                  f'complete INT DEFAULT 0, ' \
+                  f'updated TEXT' \
+                  f');'
+            logging.debug(f'Executing SQL: {sql}')
+            result = self.execute(sql)
+            logging.debug(f'Create Table Result: {result}')
     def _create_category_table_if_missing(self):
         table_name = self.CATEGORY_TABLE_NAME
         if not self.table_exists(table_name):
@@ -184,10 +354,20 @@ class BudgyDatabase(object):
         self._create_txn_table_if_missing()
         self._create_category_table_if_missing()
         self._create_rules_table_if_missing()
+        self._create_merchant_table_if_missing()
+        self._create_dictionary_tables_if_missing()
+        self._create_import_table_if_missing()
+        self._create_import_file_table_if_missing()
+        self._create_import_journal_table_if_missing()
         self.migrate_to_auto_fitid()
+        self.migrate_add_merchants()
+        self.migrate_to_dictionary_tables()
+        self._create_txn_indexes()
+        self._create_txn_view_if_missing()
+        self.backfill_merchants()
     def get_record_by_fitid(self, fitid):
         """Get record by our internal auto-generated fitid"""
-        sql = f'SELECT * from {self.TXN_TABLE_NAME} WHERE fitid = ?;'
+        sql = f'SELECT * from {self.TXN_VIEW_NAME} WHERE fitid = ?;'
         result = self.execute(sql, (fitid,))
         rows = result.fetchall()
         return rows[0] if len(rows) == 1 else None
@@ -203,34 +383,134 @@ class BudgyDatabase(object):
             'memo': row[6],
             'checknum': checknum
         }
-    def insert_record(self, record):
+    def get_merchant_id(self, name, commit=True):
+        """Map a raw transaction name to the id of its canonical merchant, creating the merchant if needed"""
+        merchant_name = normalize_merchant_name(name)
+        merchant_id = self._merchant_cache.get(merchant_name)
+        if merchant_id is not None:
+            return merchant_id
+        sql = f'SELECT id FROM {self.MERCHANT_TABLE_NAME} WHERE name = ?'
+        row = self.execute(sql, (merchant_name,)).fetchone()
+        if row is None:
+            sql = f'INSERT INTO {self.MERCHANT_TABLE_NAME} (name) VALUES (?)'
+            merchant_id = self.execute(sql, (merchant_name,)).lastrowid
+            if commit:
+                self.connection.commit()
+        else:
+            merchant_id = row[0]
+        self._merchant_cache.put(merchant_name, merchant_id)
+        return merchant_id
+    def _get_dictionary_id(self, table_name, column, cache, value, create, commit):
+        dictionary_id = cache.get(value)
+        if dictionary_id is not None:
+            return dictionary_id
+        sql = f'SELECT id FROM {table_name} WHERE {column} IS ?'
+        row = self.execute(sql, (value,)).fetchone()
+        if row is not None:
+            dictionary_id = row[0]
+        elif create:
+            sql = f'INSERT INTO {table_name} ({column}) VALUES (?)'
+            dictionary_id = self.execute(sql, (value,)).lastrowid
+            if commit:
+                self.connection.commit()
+        else:
+            return None
+        cache.put(value, dictionary_id)
+        return dictionary_id
+    def get_account_id(self, account, create=True, commit=True):
+        """Dictionary id for an account string. Returns None if create is False and the account is unknown"""
+        return self._get_dictionary_id(self.ACCOUNT_TABLE_NAME, 'account', self._account_cache, account, create, commit)
+    def get_name_id(self, name, create=True, commit=True):
+        """Dictionary id for a transaction name. Returns None if create is False and the name is unknown"""
+        return self._get_dictionary_id(self.NAME_TABLE_NAME, 'name', self._name_cache, name, create, commit)
+    def get_account_list(self):
+        sql = f'SELECT account FROM {self.ACCOUNT_TABLE_NAME} ORDER BY account'
+        result = self.execute(sql)
+        return [row[0] for row in result]
+    def get_merchant_name(self, merchant_id):
+        sql = f'SELECT name FROM {self.MERCHANT_TABLE_NAME} WHERE id = ?'
+        row = self.execute(sql, (merchant_id,)).fetchone()
+        return None if row is None else row[0]
+    def get_merchant_list(self):
+        sql = f'SELECT id, name FROM {self.MERCHANT_TABLE_NAME} ORDER BY name'
+        result = self.execute(sql)
+        return [{'id': row[0], 'name': row[1]} for row in result]
+    def insert_record(self, record, commit=True):
         checknum = "" if record.get('checknum') is None else record['checknum']
-        sql = f'INSERT INTO {self.TXN_TABLE_NAME} (account, type, posted, amount, name, memo, checknum) VALUES (?, ?, ?, ?, ?, ?, ?);'
+        merchant_id = self.get_merchant_id(record["name"], commit=False)
+        sql = f'INSERT INTO {self.TXN_TABLE_NAME} (account_id, type, posted, amount, name_id, memo, checknum, merchant) VALUES (?, ?, ?, ?, ?, ?, ?, ?);'
         result = self.execute(sql, (
-            record["account"],
+            self.get_account_id(record["account"], commit=False),
             record["type"],
             record["posted"],
             record["amount"],
-            record["name"],
+            self.get_name_id(record["name"], commit=False),
             record["memo"],
-            checknum
+            checknum,
+            merchant_id
         ))
-        self.connection.commit()
+        if commit:
+            self.connection.commit()
+        return result.lastrowid
     def find_duplicate_by_content(self, record):
         """Find potential duplicate based on all content fields (ignoring fitid and checknum)"""
-        sql = f'''SELECT * FROM {self.TXN_TABLE_NAME}
-                  WHERE account = ? AND posted = ? AND amount = ? AND name = ? AND memo = ? AND type = ?'''
+        account_id = self.get_account_id(record['account'], create=False)
+        name_id = self.get_name_id(record['name'], create=False)
+        if account_id is None or name_id is None:
+            # an unknown account or name can not have a duplicate
+            return None
+        sql = f'''SELECT * FROM {self.TXN_VIEW_NAME}
+                  WHERE account_id = ? AND posted = ? AND amount = ? AND name_id = ? AND memo = ? AND type = ?'''
         result = self.execute(sql, (
-            record['account'],
+            account_id,
             record['posted'],
             record['amount'],
-            record['name'],
+            name_id,
             record['memo'],
             record['type']
         ))
         rows = result.fetchall()
         return rows[0] if len(rows) > 0 else None
-    def merge_record(self, record):
+    def find_near_duplicates_for(self, record, threshold=duplicates.DEFAULT_THRESHOLD) -> List[Dict]:
+        """Review entries for stored records that look like copies of record (same account and amount, posted a day apart, similar text)"""
+        account_id = self.get_account_id(record['account'], create=False)
+        if account_id is None:
+            return []
+        posted = datetime.datetime.fromisoformat(record['posted']).date()
+        window = datetime.timedelta(days=duplicates.MAX_DAYS_APART)
+        # the block is read through the txn_block index
+        sql = (f'SELECT fitid, account, type, posted, amount, name, memo, checknum, category FROM {self.TXN_VIEW_NAME} '
+               f'WHERE account_id = ? AND amount = ? AND posted >= ? AND posted < ?')
+        result = self.execute(sql, (
+            account_id,
+            record['amount'],
+            str(posted - window),
+            str(posted + window + datetime.timedelta(days=1))
+        ))
+        pairs = []
+        for row in result:
+            existing = {
+                'fitid': row[0],
+                'account': row[1],
+                'type': row[2],
+                'posted': row[3],
+                'amount': row[4],
+                'name': row[5],
+                'memo': row[6],
+                'checknum': row[7],
+                'category': row[8]
+            }
+            pair = duplicates.score_pair(existing, record, threshold)
+            if pair is not None:
+                pairs.append(pair)
+        return pairs
+    def merge_record(self, record, near_duplicates=None, commit=True):
+        """
+        Insert record unless an exact copy is already stored.
+        Records that look like copies of a stored record are inserted and, if near_duplicates is a list,
+        added to it for review.
+        :return: MERGE_INSERTED, MERGE_DUPLICATE or MERGE_NEAR_DUPLICATE
+        """
         # Check for duplicate content (ignoring bank fitid and checknum)
         duplicate_record = self.find_duplicate_by_content(record)
         if duplicate_record is not None:
@@ -243,10 +523,20 @@ class BudgyDatabase(object):
             # this is definitely a duplicate
             logging.info('   SKIPPING: All content fields match, treating as duplicate')
             logging.warning(f'Skipped duplicate: existing_fitid={old_record["fitid"]}')
-            return
+            return self.MERGE_DUPLICATE
+        pairs = self.find_near_duplicates_for(record)
         # Insert new record (fitid will be auto-generated)
         logging.debug(f'New record, inserting: {record["account"]}|{record["posted"]}')
-        self.insert_record(record)
+        fitid = self.insert_record(record, commit)
+        if len(pairs) == 0:
+            return self.MERGE_INSERTED
+        logging.warning(f'Possible duplicate inserted for review: fitid={fitid} '
+                        f'looks like existing_fitid={pairs[0]["original"]["fitid"]} (score {pairs[0]["score"]:.2f})')
+        if near_duplicates is not None:
+            for pair in pairs:
+                pair['duplicate'] = dict(record, fitid=fitid)
+                near_duplicates.append(pair)
+        return self.MERGE_NEAR_DUPLICATE
     def get_date_range(self):
         sql = f'SELECT MIN(posted) AS start, MAX(posted) AS end FROM transactions'
         result = self.execute(sql)
@@ -304,28 +594,37 @@ class BudgyDatabase(object):
                     amount = row[2]
                     data[year]['months'][expense_month] -= amount
             for year in data:
-                sum = 0
-                n = 0
-                data[year]['minimum'] = None
-                data[year]['maximum'] = None
-                max_expense = None
-                for monthly_expense in data[year]['months']:
-                    # NOTE: expenses are negative so the max expense is less-than the others
-                    if monthly_expense is not None:
-                        if data[year]['minimum'] is None:
-                            data[year]['minimum'] = monthly_expense
-                        else:
-                            if monthly_expense < data[year]['minimum']:
-                                data[year]['minimum'] = monthly_expense
-                        if data[year]['maximum'] is None:
-                            data[year]['maximum'] = monthly_expense
-                        else:
-                            if monthly_expense > data[year]['maximum']:
-                                data[year]['maximum'] = monthly_expense
-                        sum += float(monthly_expense)
-                        n += 1
-                data[year]['average'] = sum / n
+                self.summarize_report_year(data[year])
         return data
+    @staticmethod
+    def summarize_report_year(year_data):
+        """Set minimum, maximum and average of one get_report() year from its months"""
+        expenses = [float(expense) for expense in year_data['months'] if expense is not None]
+        year_data['minimum'] = min(expenses) if len(expenses) > 0 else None
+        year_data['maximum'] = max(expenses) if len(expenses) > 0 else None
+        year_data['average'] = sum(expenses) / len(expenses) if len(expenses) > 0 else None
+    @classmethod
+    def report_delta(cls, posted, amount, old_expense_type, new_expense_type):
+        """
+        How a category change moves the get_report() expenses: (year, month index, change) or None if the
+        report does not change. Only withdrawals count, and only when the change moves them between an
+        expense and a non-expense category.
+        """
+        amount = float(amount)
+        old_expense = old_expense_type != cls.NON_EXPENSE_TYPE
+        new_expense = new_expense_type != cls.NON_EXPENSE_TYPE
+        if amount >= 0 or old_expense == new_expense:
+            return None
+        delta = abs(amount) if new_expense else -abs(amount)
+        return posted[:4], int(posted[5:7]) - 1, delta
+    @classmethod
+    def apply_report_delta(cls, report_data, year, month, delta) -> bool:
+        """Add delta to one month of get_report() data. Returns False if the report has no such month"""
+        if year not in report_data or report_data[year]['months'][month] is None:
+            return False
+        report_data[year]['months'][month] += delta
+        cls.summarize_report_year(report_data[year])
+        return True
     def all_records(self, year=None, month=None) -> List[Dict]:
         where_clause = ''
         params = []
@@ -339,8 +638,8 @@ class BudgyDatabase(object):
             if month is not None:
                 where_clause += and_clause + 'STRFTIME("%m", posted) = ?'
                 params.append(month)
-        sql = (f'SELECT fitid, account, type, posted, amount, name, memo, checknum, category '
-               f'FROM {self.TXN_TABLE_NAME} '
+        sql = (f'SELECT fitid, account, type, posted, amount, name, memo, checknum, category, merchant '
+               f'FROM {self.TXN_VIEW_NAME} '
                f'{where_clause}'
                f'ORDER BY posted')
         logging.debug(f'All records SQL: {sql}')
@@ -357,19 +656,392 @@ class BudgyDatabase(object):
                     'name': record[5],
                     'memo': record[6],
                     'checknum': record[7],
-                    'category': record[8] if record[8] != '' else self.DEFAULT_CATEGORY
+                    'category': record[8] if record[8] != '' else self.DEFAULT_CATEGORY,
+                    'merchant': record[9]
                 })
         return records
+    def iter_records(self, start=None, end=None, account=None, category=None, subcategory=None,
+                     batch_size=ITER_BATCH_SIZE) -> Iterator[Dict]:
+        """
+        Stream records ordered by posted date without loading the table into memory.
+        Rows are read from the cursor batch_size at a time with fetchmany().
+        :param start: first posted date to include, 'YYYY-MM-DD'
+        :param end: last posted date to include, 'YYYY-MM-DD'
+        :param account: account identifier
+        :param category: category name, optionally narrowed by subcategory
+        """
+        where_clause = 'WHERE 1 '
+        params = []
+        if start is not None:
+            where_clause += 'AND txn.posted >= ? '
+            params.append(str(start))
+        if end is not None:
+            # posted holds a time, so compare against the start of the following day
+            end = datetime.date.fromisoformat(str(end)) + datetime.timedelta(days=1)
+            where_clause += 'AND txn.posted < ? '
+            params.append(str(end))
+        if account is not None:
+            where_clause += 'AND txn.account_id = ? '
+            params.append(self.get_account_id(account, create=False))
+        if category is not None:
+            where_clause += 'AND cat.name = ? '
+            params.append(category)
+        if subcategory is not None:
+            where_clause += 'AND cat.subcategory = ? '
+            params.append(subcategory)
+        sql = (f'SELECT txn.fitid, txn.account, txn.type, txn.posted, txn.amount, txn.name, txn.memo, txn.checknum, '
+               f'cat.name, cat.subcategory, m.name '
+               f'FROM {self.TXN_VIEW_NAME} AS txn '
+               f'LEFT JOIN {self.CATEGORY_TABLE_NAME} AS cat ON txn.category = cat.id '
+               f'LEFT JOIN {self.MERCHANT_TABLE_NAME} AS m ON txn.merchant = m.id '
+               f'{where_clause}'
+               f'ORDER BY txn.posted, txn.fitid')
+        logging.debug(f'Iter records SQL: {sql}')
+        cursor = self.execute(sql, tuple(params) if params else None)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if len(rows) == 0:
+                break
+            for row in rows:
+                yield {
+                    'fitid': row[0],
+                    'account': row[1],
+                    'type': row[2],
+                    'posted': row[3],
+                    'amount': row[4],
+                    'name': row[5],
+                    'memo': row[6],
+                    'checknum': '' if row[7] is None else row[7],
+                    'category': self.DEFAULT_CATEGORY if row[8] is None else row[8],
+                    'subcategory': '' if row[9] is None else row[9],
+                    'merchant': row[10]
+                }
+    def _record_filter_sql(self, record_filter):
+        """WHERE clause and parameters selecting the transactions (AS txn) that match record_filter"""
+        where_clause = 'WHERE 1 '
+        params = []
+        if record_filter.account is not None:
+            where_clause += 'AND txn.account_id = ? '
+            params.append(self.get_account_id(record_filter.account, create=False))
+        if record_filter.start is not None:
+            where_clause += 'AND txn.posted >= ? '
+            params.append(str(record_filter.start))
+        if record_filter.end is not None:
+            # posted holds a time, so compare against the start of the following day
+            end = datetime.date.fromisoformat(str(record_filter.end)) + datetime.timedelta(days=1)
+            where_clause += 'AND txn.posted < ? '
+            params.append(str(end))
+        if record_filter.min_amount is not None:
+            where_clause += 'AND txn.amount >= ? '
+            params.append(float(record_filter.min_amount))
+        if record_filter.max_amount is not None:
+            where_clause += 'AND txn.amount <= ? '
+            params.append(float(record_filter.max_amount))
+        if record_filter.category is not None or record_filter.subcategory is not None or \
+                record_filter.expense_type is not None:
+            # resolve the category ids first so the transactions are filtered on their own indexed column
+            sql = f'SELECT id FROM {self.CATEGORY_TABLE_NAME} WHERE 1 '
+            category_params = []
+            for column, value in (('name', record_filter.category), ('subcategory', record_filter.subcategory),
+                                  ('expense_type', record_filter.expense_type)):
+                if value is not None:
+                    sql += f'AND {column} = ? '
+                    category_params.append(value)
+            category_ids = [row[0] for row in self.execute(sql, tuple(category_params))]
+            where_clause += f'AND txn.category IN ({", ".join("?" * len(category_ids))}) '
+            params.extend(category_ids)
+        return where_clause, params
+    def count_filtered_records(self, record_filter, before_date=None) -> int:
+        """
+        :param before_date: only count the records that come before this date ('YYYY-MM-DD') in the
+                            record_filter's order, which is the index of the first record on or past the date
+        """
+        where_clause, params = self._record_filter_sql(record_filter)
+        if before_date is not None:
+            if record_filter.sort != 'posted':
+                raise ValueError(f'Records sorted by {record_filter.sort} have no date position')
+            if record_filter.descending:
+                where_clause += 'AND txn.posted >= ? '
+                params.append(str(datetime.date.fromisoformat(str(before_date)) + datetime.timedelta(days=1)))
+            else:
+                where_clause += 'AND txn.posted < ? '
+                params.append(str(before_date))
+        sql = f'SELECT COUNT(*) FROM {self.TXN_TABLE_NAME} AS txn {where_clause}'
+        return self.execute(sql, tuple(params)).fetchone()[0]
+    def filter_records(self, record_filter, limit, offset=0, after=None) -> List[Dict]:
+        """
+        Up to limit records matching record_filter, in its sort order.
+        :param offset: number of matching records to skip
+        :param after: a record of the previous page, the page continues after it (keyset paging, offset is
+                      ignored)
+        """
+        where_clause, params = self._record_filter_sql(record_filter)
+        column = f'txn.{record_filter.sort}'
+        direction = 'DESC' if record_filter.descending else 'ASC'
+        if after is not None:
+            comparison = '<' if record_filter.descending else '>'
+            where_clause += f'AND ({column}, txn.fitid) {comparison} (?, ?) '
+            params.extend([after[record_filter.sort], after['fitid']])
+            offset = 0
+        sql = (f'SELECT txn.fitid, a.account, txn.type, txn.posted, txn.amount, n.name, txn.memo, txn.checknum, '
+               f'txn.category, txn.merchant '
+               f'FROM {self.TXN_TABLE_NAME} AS txn '
+               f'JOIN {self.ACCOUNT_TABLE_NAME} AS a ON a.id = txn.account_id '
+               f'JOIN {self.NAME_TABLE_NAME} AS n ON n.id = txn.name_id '
+               f'{where_clause}'
+               f'ORDER BY {column} {direction}, txn.fitid {direction} '
+               f'LIMIT ? OFFSET ?')
+        logging.debug(f'Filter records SQL: {sql}')
+        result = self.execute(sql, tuple(params) + (limit, offset))
+        return [{
+            'fitid': row[0],
+            'account': row[1],
+            'type': row[2],
+            'posted': row[3],
+            'amount': row[4],
+            'name': row[5],
+            'memo': row[6],
+            'checknum': row[7],
+            'category': row[8] if row[8] != '' else self.DEFAULT_CATEGORY,
+            'merchant': row[9]
+        } for row in result]
+    def get_merchant_report(self, year=None, month=None) -> List[Dict]:
+        """Expense totals grouped by merchant id, largest first"""
+        where_clause = 'WHERE txn.amount < 0 '
+        params = []
+        if year is not None:
+            where_clause += 'AND STRFTIME("%Y", txn.posted) = ? '
+            params.append(year)
+        if month is not None:
+            where_clause += 'AND STRFTIME("%m", txn.posted) = ? '
+            params.append(month)
+        sql = (f'SELECT txn.merchant, m.name, COUNT(*), SUM(ABS(txn.amount)) AS total '
+               f'FROM {self.TXN_TABLE_NAME} AS txn '
+               f'LEFT JOIN {self.MERCHANT_TABLE_NAME} AS m ON txn.merchant = m.id '
+               f'{where_clause}'
+               f'GROUP BY txn.merchant ORDER BY total DESC')
+        logging.debug(f'Merchant report SQL: {sql}')
+        result = self.execute(sql, tuple(params) if params else None)
+        return [{'merchant': row[0], 'name': row[1], 'count': row[2], 'total': row[3]} for row in result]
+    def get_category_report(self, year=None, month=None) -> List[Dict]:
+        """Expense totals grouped by category / subcategory, largest first"""
+        where_clause = 'WHERE txn.amount < 0 '
+        params = []
+        if year is not None:
+            where_clause += 'AND STRFTIME("%Y", txn.posted) = ? '
+            params.append(year)
+        if month is not None:
+            where_clause += 'AND STRFTIME("%m", txn.posted) = ? '
+            params.append(month)
+        sql = (f'SELECT cat.name, cat.subcategory, cat.expense_type, COUNT(*), SUM(ABS(txn.amount)) AS total '
+               f'FROM {self.TXN_TABLE_NAME} AS txn '
+               f'JOIN {self.CATEGORY_TABLE_NAME} AS cat ON txn.category = cat.id '
+               f'{where_clause}'
+               f'GROUP BY txn.category ORDER BY total DESC')
+        logging.debug(f'Category report SQL: {sql}')
+        result = self.execute(sql, tuple(params) if params else None)
+        return [{'category': row[0], 'subcategory': row[1], 'expense_type': row[2], 'count': row[3], 'total': row[4]}
+                for row in result]
     def delete_all_records(self):
         sql = f'DELETE FROM {self.TXN_TABLE_NAME}'
         result = self.execute(sql)
-    def merge_records(self, newrecords):
+        for table_name in (self.ACCOUNT_TABLE_NAME, self.NAME_TABLE_NAME, self.IMPORT_TABLE_NAME,
+                           self.IMPORT_FILE_TABLE_NAME, self.IMPORT_JOURNAL_TABLE_NAME):
+            self.execute(f'DELETE FROM {table_name}')
+        self._account_cache.clear()
+        self._name_cache.clear()
+        self.connection.commit()
+    def count_account_records(self, account_id, first_posted, last_posted):
+        sql = f'SELECT COUNT(*) FROM {self.TXN_TABLE_NAME} WHERE account_id = ? AND posted >= ? AND posted <= ?'
+        result = self.execute(sql, (account_id, first_posted, last_posted))
+        return result.fetchone()[0]
+    def _verified_import_sql(self):
+        """Imports whose range still holds at least as many records as right after the import"""
+        return (f'imp.stored <= (SELECT COUNT(*) FROM {self.TXN_TABLE_NAME} AS txn WHERE txn.account_id = imp.account_id '
+                f'AND txn.posted >= imp.first_posted AND txn.posted <= imp.last_posted)')
+    def record_import(self, account_id, first_posted, last_posted, records, inserted, commit=True):
+        """
+        Remember that account has been imported from first_posted to last_posted (inclusive). Verified ranges that
+        overlap it are folded into the new row, so re-importing overlapping statements does not add rows.
+        """
+        sql = f'SELECT imp.id, imp.first_posted, imp.last_posted, imp.records, imp.inserted ' \
+              f'FROM {self.IMPORT_TABLE_NAME} AS imp ' \
+              f'WHERE imp.account_id = ? AND imp.first_posted <= ? AND imp.last_posted >= ? AND ' \
+              f'{self._verified_import_sql()}'
+        rows = self.execute(sql, (account_id, last_posted, first_posted)).fetchall()
+        for row_id, row_first, row_last, row_records, row_inserted in rows:
+            first_posted = min(first_posted, row_first)
+            last_posted = max(last_posted, row_last)
+            records += row_records
+            inserted += row_inserted
+        if len(rows) > 0:
+            self.connection.executemany(f'DELETE FROM {self.IMPORT_TABLE_NAME} WHERE id = ?', [(row[0],) for row in rows])
+        stored = self.count_account_records(account_id, first_posted, last_posted)
+        sql = f'INSERT INTO {self.IMPORT_TABLE_NAME} ' \
+              f'(account_id, first_posted, last_posted, records, inserted, stored, imported) VALUES (?, ?, ?, ?, ?, ?, ?)'
+        self.execute(sql, (account_id, first_posted, last_posted, records, inserted, stored,
+                           datetime.datetime.now().isoformat(timespec='seconds')))
+        if commit:
+            self.connection.commit()
+    def is_file_imported(self, path, size, mtime) -> bool:
+        """True if the manifest has path with the same size and modification time (ns)"""
+        sql = f'SELECT size, mtime FROM {self.IMPORT_FILE_TABLE_NAME} WHERE path = ?'
+        row = self.execute(sql, (str(path),)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime
+    def record_imported_file(self, path, size, mtime, records):
+        """Add path to the manifest of imported files, replacing an older entry for the same path"""
+        sql = f'INSERT OR REPLACE INTO {self.IMPORT_FILE_TABLE_NAME} (path, size, mtime, records, imported) ' \
+              f'VALUES (?, ?, ?, ?, ?)'
+        self.execute(sql, (str(path), size, mtime, records, datetime.datetime.now().isoformat(timespec='seconds')))
+        self.connection.commit()
+    def get_import_progress(self, source):
+        """
+        Journal entry for a statement source of an unfinished import.
+        :return: (size, mtime, records merged, complete) or None
+        """
+        sql = f'SELECT size, mtime, records, complete FROM {self.IMPORT_JOURNAL_TABLE_NAME} WHERE source = ?'
+        row = self.execute(sql, (str(source),)).fetchone()
+        return None if row is None else (row[0], row[1], row[2], bool(row[3]))
+    def record_import_progress(self, source, size, mtime, records, complete=False, commit=True):
+        """Journal that the first records of source (size and mtime of the file it was read from) are merged"""
+        sql = f'INSERT OR REPLACE INTO {self.IMPORT_JOURNAL_TABLE_NAME} (source, size, mtime, records, complete, updated) ' \
+              f'VALUES (?, ?, ?, ?, ?, ?)'
+        self.execute(sql, (str(source), size, mtime, records, int(complete),
+                           datetime.datetime.now().isoformat(timespec='seconds')))
+        if commit:
+            self.connection.commit()
+    def clear_import_progress(self, sources):
+        """Drop the journal entries of sources once their import has finished"""
+        sql = f'DELETE FROM {self.IMPORT_JOURNAL_TABLE_NAME} WHERE source = ?'
+        self.connection.executemany(sql, [(str(source),) for source in sources])
+        self.connection.commit()
+    def get_coverage(self, account_id) -> List[tuple]:
+        """
+        Verified date ranges already imported for account_id as sorted, non-overlapping (first_posted, last_posted).
+        An import is only trusted while the account still holds at least as many records in its range as it did
+        right after the import; deleting records drops the range until it is imported again.
+        """
+        sql = f'SELECT imp.first_posted, imp.last_posted FROM {self.IMPORT_TABLE_NAME} AS imp ' \
+              f'WHERE imp.account_id = ? AND {self._verified_import_sql()} ORDER BY imp.first_posted'
+        coverage = []
+        for first_posted, last_posted in self.execute(sql, (account_id,)):
+            if len(coverage) > 0 and first_posted <= coverage[-1][1]:
+                coverage[-1] = (coverage[-1][0], max(coverage[-1][1], last_posted))
+            else:
+                coverage.append((first_posted, last_posted))
+        return coverage
+    @staticmethod
+    def is_covered(posted, coverage):
+        i = bisect_right(coverage, (posted, chr(0x10ffff))) - 1
+        return i >= 0 and coverage[i][0] <= posted <= coverage[i][1]
+    def get_content_keys(self, account_id, first_posted, last_posted):
+        """Set of (posted, amount, name, memo, type) stored for account_id in the range, read in one query"""
+        sql = f'SELECT posted, amount, name, memo, type FROM {self.TXN_VIEW_NAME} ' \
+              f'WHERE account_id = ? AND posted >= ? AND posted <= ? AND memo IS NOT NULL'
+        return set(self.execute(sql, (account_id, first_posted, last_posted)))
+    def merge_records(self, newrecords, commit=True, record_coverage=True):
+        """
+        Merge newrecords, usually one chunk of a statement file. With commit False nothing is committed, so the
+        caller can commit the chunk together with its own bookkeeping. With record_coverage False the imported
+        ranges are not recorded, the caller records them with record_import once the whole statement is merged.
+        Records inside date ranges that earlier imports verified as complete are checked against a single
+        bulk read of the stored records. Only records outside those ranges, or missing from them, take the full
+        duplicate / near-duplicate path of merge_record. The merchant rules categorize the inserted records.
+        :return: totals, the near-duplicate review pairs, rules_applied and 'accounts': per account counts of
+                 records, merged, duplicates and near_duplicates (merged records that look like copies)
+        """
         result = {
-            'merged': 0
+            'merged': 0,
+            'duplicates': 0,
+            'covered': 0,
+            'rules_applied': 0,
+            'near_duplicates': [],
+            'accounts': {}
         }
         logging.info(f'Merging {len(newrecords)} records')
+        last_fitid = self.execute(f'SELECT MAX(fitid) FROM {self.TXN_TABLE_NAME}').fetchone()[0]
+        accounts = {}
         for record in newrecords:
-            self.merge_record(record)
+            accounts.setdefault(record['account'], []).append(record)
+        for account, records in accounts.items():
+            account_id = self.get_account_id(account, create=False)
+            coverage = [] if account_id is None else self.get_coverage(account_id)
+            covered = [r['posted'] for r in records if self.is_covered(r['posted'], coverage)]
+            existing = set() if len(covered) == 0 else self.get_content_keys(account_id, min(covered), max(covered))
+            logging.info(f'{account}: {len(covered)} of {len(records)} records in previously imported ranges')
+            counts = {'records': len(records), 'merged': 0, 'duplicates': 0, 'near_duplicates': 0}
+            for record in records:
+                key = (record['posted'], float(record['amount']), record['name'], record['memo'], record['type'])
+                if key in existing:
+                    counts['duplicates'] += 1
+                    result['covered'] += 1
+                    continue
+                status = self.merge_record(record, result['near_duplicates'], commit=False)
+                if status == self.MERGE_DUPLICATE:
+                    counts['duplicates'] += 1
+                else:
+                    counts['merged'] += 1
+                    if status == self.MERGE_NEAR_DUPLICATE:
+                        counts['near_duplicates'] += 1
+            merged = counts['merged']
+            result['merged'] += merged
+            result['duplicates'] += counts['duplicates']
+            result['accounts'][account] = counts
+            if not record_coverage:
+                continue
+            if account_id is None:
+                account_id = self.get_account_id(account, create=False)
+            if account_id is not None:
+                posted = [r['posted'] for r in records]
+                self.record_import(account_id, min(posted), max(posted), len(records), merged, commit=False)
+        if result['merged'] > 0:
+            result['rules_applied'] = self.apply_merchant_rules(after_fitid=last_fitid or 0, commit=False)
+        if commit:
+            self.connection.commit()
+        return result
+    def find_near_duplicates(self, threshold=duplicates.DEFAULT_THRESHOLD) -> List[Dict]:
+        """Review list of stored records that look like copies of each other"""
+        sql = (f'SELECT fitid, account, type, posted, amount, name, memo, checknum, category '
+               f'FROM {self.TXN_VIEW_NAME} ORDER BY account_id, amount, posted')
+        result = self.execute(sql)
+        records = [{
+            'fitid': row[0],
+            'account': row[1],
+            'type': row[2],
+            'posted': row[3],
+            'amount': row[4],
+            'name': row[5],
+            'memo': row[6],
+            'checknum': row[7],
+            'category': row[8]
+        } for row in result]
+        return duplicates.find_near_duplicates(records, threshold)
+    def merge_near_duplicates(self, pairs):
+        """
+        Delete the duplicate of each reviewed pair, keeping the original. If only the duplicate
+        was categorized its category moves to the original. Runs in a single transaction.
+        :return: number of records deleted
+        """
+        default_category_id = self.get_category_id(self.DEFAULT_CATEGORY, self.EMPTY_SUBCATEGORY)
+        deleted = set()
+        try:
+            for pair in pairs:
+                original_fitid = pair['original']['fitid']
+                duplicate_fitid = pair['duplicate']['fitid']
+                if duplicate_fitid in deleted or original_fitid in deleted:
+                    continue
+                sql = (f'UPDATE {self.TXN_TABLE_NAME} SET category = '
+                       f'(SELECT category FROM {self.TXN_TABLE_NAME} WHERE fitid = ?) '
+                       f'WHERE fitid = ? AND category = ?')
+                self.execute(sql, (duplicate_fitid, original_fitid, default_category_id))
+                self.execute(f'DELETE FROM {self.TXN_TABLE_NAME} WHERE fitid = ?', (duplicate_fitid,))
+                deleted.add(duplicate_fitid)
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+        logging.info(f'Merged {len(deleted)} near-duplicate records')
+        return len(deleted)
     def get_catetory_dict(self):
         sql = f'SELECT name, subcategory, expense_type, id FROM {self.CATEGORY_TABLE_NAME} ORDER BY name'
         result = self.execute(sql)
@@ -424,14 +1096,145 @@ class BudgyDatabase(object):
         category_id = self.get_category_id(category, subcategory)
         if not include_categorized:
             default_category_id = self.get_category_id(self.DEFAULT_CATEGORY, self.EMPTY_SUBCATEGORY)
-            sql = f'UPDATE {self.TXN_TABLE_NAME} SET category = ? WHERE name LIKE ? AND category = ?'
+            sql = (f'UPDATE {self.TXN_TABLE_NAME} SET category = ? '
+                   f'WHERE name_id IN (SELECT id FROM {self.NAME_TABLE_NAME} WHERE name LIKE ?) AND category = ?')
             result = self.execute(sql, (category_id, txn_pattern, default_category_id))
         else:
-            sql = f'UPDATE {self.TXN_TABLE_NAME} SET category = ? WHERE name LIKE ?'
+            sql = (f'UPDATE {self.TXN_TABLE_NAME} SET category = ? '
+                   f'WHERE name_id IN (SELECT id FROM {self.NAME_TABLE_NAME} WHERE name LIKE ?)')
             result = self.execute(sql, (category_id, txn_pattern))
         if not result:
             raise Exception(f'Bulk Categorize Failed for {txn_pattern} to "{category}" "{subcategory}"')
         self.connection.commit()
+    def categorize_merchant(self, merchant_id, category, subcategory=EMPTY_SUBCATEGORY, include_categorized=False):
+        """Set the category of every transaction from one merchant"""
+        category_id = self.get_category_id(category, subcategory)
+        if not include_categorized:
+            default_category_id = self.get_category_id(self.DEFAULT_CATEGORY, self.EMPTY_SUBCATEGORY)
+            sql = f'UPDATE {self.TXN_TABLE_NAME} SET category = ? WHERE merchant = ? AND category = ?'
+            result = self.execute(sql, (category_id, merchant_id, default_category_id))
+        else:
+            sql = f'UPDATE {self.TXN_TABLE_NAME} SET category = ? WHERE merchant = ?'
+            result = self.execute(sql, (category_id, merchant_id))
+        self.connection.commit()
+        return result.rowcount
+    def add_merchant_rule(self, merchant_id, category, subcategory=EMPTY_SUBCATEGORY):
+        """Remember that transactions from merchant_id belong in category / subcategory"""
+        if self.get_category_id(category, subcategory) is None:
+            raise Exception(f'Category not in database: "{category}" / "{subcategory}"')
+        sql = f'DELETE FROM {self.CATEGORY_RULES_TABLE_NAME} WHERE merchant = ?'
+        self.execute(sql, (merchant_id,))
+        sql = f'INSERT INTO {self.CATEGORY_RULES_TABLE_NAME} (merchant, category, subcategory) VALUES (?, ?, ?)'
+        self.execute(sql, (merchant_id, category, subcategory))
+        self.connection.commit()
+    def apply_merchant_rules(self, include_categorized=False, after_fitid=None, commit=True):
+        """
+        Categorize transactions using the merchant rules. Returns the number of transactions updated
+        :param after_fitid: only categorize transactions inserted after this one
+        """
+        rule_category = (f'SELECT c.id FROM {self.CATEGORY_RULES_TABLE_NAME} AS r, {self.CATEGORY_TABLE_NAME} AS c '
+                         f'WHERE r.merchant = {self.TXN_TABLE_NAME}.merchant '
+                         f'AND c.name = r.category AND c.subcategory = r.subcategory')
+        sql = (f'UPDATE {self.TXN_TABLE_NAME} SET category = ({rule_category}) '
+               f'WHERE merchant IN (SELECT merchant FROM {self.CATEGORY_RULES_TABLE_NAME} WHERE merchant IS NOT NULL)')
+        params = []
+        if not include_categorized:
+            sql += ' AND category = ?'
+            params.append(self.get_category_id(self.DEFAULT_CATEGORY, self.EMPTY_SUBCATEGORY))
+        if after_fitid is not None:
+            sql += ' AND fitid > ?'
+            params.append(after_fitid)
+        result = self.execute(sql, tuple(params))
+        if commit:
+            self.connection.commit()
+        return result.rowcount
+    def find_transfers(self, window_days=DEFAULT_WINDOW_DAYS, include_categorized=False) -> List[Dict]:
+        """Review list of withdrawal / deposit pairs that look like transfers between accounts"""
+        sql = f'SELECT fitid, account, posted, amount, name, category FROM {self.TXN_VIEW_NAME}'
+        params = None
+        if not include_categorized:
+            # only consider uncategorized records or ones already marked as transfers
+            sql += ' WHERE category IN (?, ?)'
+            params = (self.get_category_id(self.DEFAULT_CATEGORY, self.EMPTY_SUBCATEGORY),
+                      self.get_category_id(self.TRANSFER_CATEGORY, self.EMPTY_SUBCATEGORY))
+        result = self.execute(sql, params)
+        records = [{
+            'fitid': row[0],
+            'account': row[1],
+            'posted': row[2],
+            'amount': row[3],
+            'name': row[4],
+            'category': row[5]
+        } for row in result]
+        pairs = find_transfer_pairs(records, window_days)
+        transfer_id = self.get_category_id(self.TRANSFER_CATEGORY, self.EMPTY_SUBCATEGORY)
+        # pairs where both sides are already transfers need no review
+        return [p for p in pairs
+                if p['withdrawal']['category'] != transfer_id or p['deposit']['category'] != transfer_id]
+    def assign_transfers(self, pairs):
+        """Set the Transfer category on both sides of each pair in a single transaction"""
+        transfer_id = self.get_category_id(self.TRANSFER_CATEGORY, self.EMPTY_SUBCATEGORY)
+        updates = []
+        for pair in pairs:
+            updates.append((transfer_id, pair['withdrawal']['fitid']))
+            updates.append((transfer_id, pair['deposit']['fitid']))
+        sql = f'UPDATE {self.TXN_TABLE_NAME} SET category = ? WHERE fitid = ?'
+        try:
+            self.connection.executemany(sql, updates)
+            self.connection.commit()
+        except sqlite3.Error:
+            self.connection.rollback()
+            raise
+        logging.info(f'Assigned {self.TRANSFER_CATEGORY} to {len(updates)} transactions')
+        return len(updates)
+    def migrate_add_merchants(self):
+        """Add merchant ids to databases created before merchant normalization"""
+        if not self.column_exists(self.CATEGORY_RULES_TABLE_NAME, 'merchant'):
+            logging.info('Migrating database: adding merchant column to rules')
+            self.execute(f'ALTER TABLE {self.CATEGORY_RULES_TABLE_NAME} ADD COLUMN merchant INT')
+        if not self.column_exists(self.TXN_TABLE_NAME, 'merchant'):
+            logging.info('Migrating database: adding merchant column to transactions')
+            self.execute(f'ALTER TABLE {self.TXN_TABLE_NAME} ADD COLUMN merchant INT')
+        self.connection.commit()
+    def backfill_merchants(self):
+        """Assign merchant ids to transactions that do not have one yet"""
+        sql = (f'SELECT DISTINCT t.name_id, n.name FROM {self.TXN_TABLE_NAME} AS t '
+               f'JOIN {self.NAME_TABLE_NAME} AS n ON n.id = t.name_id WHERE t.merchant IS NULL')
+        names = self.execute(sql).fetchall()
+        if len(names) == 0:
+            return
+        logging.info(f'Assigning merchants for {len(names)} transaction names')
+        updates = [(self.get_merchant_id(name, commit=False), name_id) for name_id, name in names]
+        sql = f'UPDATE {self.TXN_TABLE_NAME} SET merchant = ? WHERE name_id = ? AND merchant IS NULL'
+        self.connection.executemany(sql, updates)
+        self.connection.commit()
+    def migrate_to_dictionary_tables(self):
+        """Move account and name text out of the transactions table into the accounts and names tables"""
+        if not self.column_exists(self.TXN_TABLE_NAME, 'account'):
+            return
+        logging.info('Migrating database: moving accounts and names to dictionary tables')
+        new_table_name = f'{self.TXN_TABLE_NAME}_new'
+        self.execute(f'DROP VIEW IF EXISTS {self.TXN_VIEW_NAME}')
+        self.execute(self._txn_table_sql(new_table_name))
+        self.execute(f'INSERT OR IGNORE INTO {self.ACCOUNT_TABLE_NAME} (account) '
+                     f'SELECT DISTINCT account FROM {self.TXN_TABLE_NAME}')
+        self.execute(f'INSERT OR IGNORE INTO {self.NAME_TABLE_NAME} (name) '
+                     f'SELECT DISTINCT name FROM {self.TXN_TABLE_NAME}')
+        # fitids are kept so category assignments stay valid
+        sql = f'''INSERT INTO {new_table_name}
+                  (fitid, account_id, type, posted, amount, name_id, memo, category, checknum, merchant)
+                  SELECT t.fitid, a.id, t.type, t.posted, t.amount, n.id, t.memo, t.category, t.checknum, t.merchant
+                  FROM {self.TXN_TABLE_NAME} AS t
+                  JOIN {self.ACCOUNT_TABLE_NAME} AS a ON a.account IS t.account
+                  JOIN {self.NAME_TABLE_NAME} AS n ON n.name IS t.name;'''
+        self.execute(sql)
+        self.execute(f'DROP TABLE {self.TXN_TABLE_NAME}')
+        self.execute(f'ALTER TABLE {new_table_name} RENAME TO {self.TXN_TABLE_NAME}')
+        self._create_txn_indexes()
+        self.connection.commit()
+        # give the space used by the duplicated text back to the file system
+        self.execute('VACUUM')
+        logging.info('Migration to dictionary tables completed successfully')
     def migrate_to_auto_fitid(self):
         """Migrate existing database to use auto-generated fitids"""
         # Check if we need to migrate by looking at the table structure
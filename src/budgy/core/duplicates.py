@@ -0,0 +1,98 @@
+"""
+Near-duplicate detection for Budgy
+
+find_duplicate_by_content() only catches exact matches. Banks sometimes re-export a
+transaction with a slightly different memo or with the posted time shifted by a time
+zone, which lets a second copy in. Near-duplicates are found by blocking: records are
+grouped by (account, amount, posted day) and name / memo similarity is only scored
+between records in the same or the neighbouring day's block, which keeps the work
+close to linear in the number of records.
+"""
+import datetime
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List
+
+# how many days the posted date of two copies may differ
+MAX_DAYS_APART = 1
+# minimum similarity score to report a pair
+DEFAULT_THRESHOLD = 0.8
+NAME_WEIGHT = 0.6
+MEMO_WEIGHT = 0.4
+
+
+def _text(value):
+    return '' if value is None else ' '.join(str(value).upper().split())
+
+
+def _posted_day(record):
+    return datetime.datetime.fromisoformat(record['posted']).date().toordinal()
+
+
+def block_key(record):
+    """(account, amount in cents, posted day) - only records with equal keys or adjacent days are compared"""
+    return record['account'], int(round(float(record['amount']) * 100)), _posted_day(record)
+
+
+def text_similarity(a, b) -> float:
+    a = _text(a)
+    b = _text(b)
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def similarity(a, b) -> float:
+    """Weighted name / memo similarity between two records, 0.0 - 1.0"""
+    return NAME_WEIGHT * text_similarity(a['name'], b['name']) + MEMO_WEIGHT * text_similarity(a['memo'], b['memo'])
+
+
+def score_pair(original, candidate, threshold=DEFAULT_THRESHOLD, max_days=MAX_DAYS_APART):
+    """Return a review entry if candidate looks like a copy of original, otherwise None"""
+    days = abs(_posted_day(candidate) - _posted_day(original))
+    if days > max_days:
+        return None
+    score = similarity(original, candidate)
+    if score < threshold:
+        return None
+    return {
+        'original': original,
+        'duplicate': candidate,
+        'score': score,
+        'days': days
+    }
+
+
+def find_near_duplicates(records, threshold=DEFAULT_THRESHOLD, max_days=MAX_DAYS_APART) -> List[Dict]:
+    """
+    Find pairs of records that look like copies of the same transaction.
+    The record with the lower fitid (the one imported first) is reported as the original.
+    :return: list of {'original', 'duplicate', 'score', 'days'} ordered by score, best first
+    """
+    blocks = defaultdict(list)
+    for record in records:
+        account, cents, day = block_key(record)
+        blocks[(account, cents, day)].append(record)
+
+    pairs = []
+    for (account, cents, day), block in blocks.items():
+        neighbours = []
+        for offset in range(1, max_days + 1):
+            neighbours.extend(blocks.get((account, cents, day + offset), []))
+        for i, record in enumerate(block):
+            # pairs inside the block, then pairs with the following days
+            for other in block[i + 1:] + neighbours:
+                first, second = sorted((record, other), key=lambda r: (r.get('fitid') is None, r.get('fitid') or 0))
+                pair = score_pair(first, second, threshold, max_days)
+                if pair is not None:
+                    pairs.append(pair)
+    pairs.sort(key=lambda p: -p['score'])
+    return pairs
+
+
+def format_near_duplicate(pair) -> str:
+    original = pair['original']
+    duplicate = pair['duplicate']
+    return (f'{pair["score"]:4.2f} {original["account"]} {original["amount"]:10.2f} '
+            f'{original["posted"][:10]} "{original["name"]}" / "{original["memo"]}" <-> '
+            f'{duplicate["posted"][:10]} "{duplicate["name"]}" / "{duplicate["memo"]}"')
@@ -0,0 +1,107 @@
+"""
+Transaction export for Budgy
+
+budgy-export streams transactions from the database to CSV or JSON Lines, optionally
+gzip compressed. Records come from BudgyDatabase.iter_records() and are written one
+at a time, so memory use does not grow with the size of the database.
+"""
+import csv
+import datetime
+import gzip
+import io
+import json
+import logging
+import sys
+from pathlib import Path
+
+from budgy.core.app import BudgyApp
+from budgy.core.database import BudgyDatabase
+
+EXPORT_FIELDS = ['fitid', 'account', 'type', 'posted', 'amount', 'name', 'memo', 'checknum',
+                 'category', 'subcategory', 'merchant']
+FORMATS = ['csv', 'jsonl']
+
+
+def export_records(records, out, output_format='csv') -> int:
+    """
+    Write records to the text stream out.
+    :return: number of records written
+    """
+    count = 0
+    if output_format == 'csv':
+        writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    elif output_format == 'jsonl':
+        for record in records:
+            out.write(json.dumps({field: record[field] for field in EXPORT_FIELDS}))
+            out.write('\n')
+            count += 1
+    else:
+        raise ValueError(f'Unknown export format: {output_format}')
+    return count
+
+
+def open_export_file(path: Path, compress=False):
+    """
+    Text stream for path, gzip compressed if compress is set or path ends in .gz.
+    With path None the compressed stream goes to stdout, closing it leaves stdout open.
+    """
+    if path is None:
+        sys.stdout.flush()
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=sys.stdout.buffer, mode='wb'), encoding='utf-8', newline='')
+    if compress or path.suffix == '.gz':
+        return io.TextIOWrapper(gzip.open(path, 'wb'), encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def guess_format(path: Path):
+    suffixes = [suffix for suffix in path.suffixes if suffix != '.gz']
+    if len(suffixes) > 0 and suffixes[-1] in ('.jsonl', '.json'):
+        return 'jsonl'
+    return 'csv'
+
+
+class ExportApp(BudgyApp):
+    def __init__(self):
+        super().__init__('Budgy Export')
+        if not self._args.db.expanduser().is_file():
+            self.arg_parser.error(f'database not found: {self._args.db}')
+        self._db = BudgyDatabase(self._args.db.expanduser())
+
+    def _add_command_args(self):
+        parser = self.arg_parser
+        parser.add_argument('--db', type=Path, required=True, help='Path to sqlite3 database')
+        parser.add_argument('--output', type=Path,
+                            help='File to write. A name ending in .gz is compressed. (default: stdout)')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='csv or jsonl (JSON Lines). Default: from the output file name, otherwise csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output (file or stdout) with gzip')
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help='First posted date to export (YYYY-MM-DD)')
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help='Last posted date to export (YYYY-MM-DD)')
+        parser.add_argument('--account', type=str, help='Only export this account')
+        parser.add_argument('--category', type=str, help='Only export this category')
+        parser.add_argument('--subcategory', type=str, help='Only export this subcategory (use with --category)')
+
+    def run(self):
+        self.log_app_header()
+        args = self._args
+        output_format = args.format
+        if output_format is None:
+            output_format = 'csv' if args.output is None else guess_format(args.output)
+        records = self._db.iter_records(start=args.start, end=args.end, account=args.account,
+                                        category=args.category, subcategory=args.subcategory)
+        if args.output is None and not args.gzip:
+            count = export_records(records, sys.stdout, output_format)
+        else:
+            with open_export_file(args.output, args.gzip) as out:
+                count = export_records(records, out, output_format)
+        logging.info(f'Exported {count} records')
+        return count
+
+
+def main():
+    myapp = ExportApp()
+    myapp.run()
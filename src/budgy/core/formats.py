@@ -0,0 +1,302 @@
+"""
+Statement file formats for Budgy
+
+OFX / QFX, bank CSV exports and QIF files are read into the same record dicts that
+load_ofx_file() produces:
+
+    {'account', 'type', 'posted', 'amount', 'name', 'memo', 'checknum'}
+
+iter_record_chunks() detects the format of a file and yields its records in lists of
+at most chunk_size so a large CSV export is parsed and merged a piece at a time
+instead of being loaded whole. New formats are added with register_format().
+
+A source is a file name or a binary file object (for example a member read out of an
+archive); for file objects pass name= so the format and default account can be found.
+"""
+import csv
+import datetime
+import io
+import json
+import logging
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from budgy.core import load_ofx_file
+
+DEFAULT_CHUNK_SIZE = 5000
+# part of the parsed statement cache key: bump it whenever a reader returns different records
+PARSER_VERSION = 1
+# how much of a file detect_format() looks at when the extension is unknown
+SNIFF_SIZE = 1024
+
+# header names used by common bank exports, tried in order when no mapping is given
+CSV_COLUMN_ALIASES = {
+    'date': ['Date', 'Posting Date', 'Posted Date', 'Transaction Date', 'Trans. Date'],
+    'amount': ['Amount', 'Transaction Amount'],
+    'debit': ['Debit', 'Withdrawal', 'Withdrawals'],
+    'credit': ['Credit', 'Deposit', 'Deposits'],
+    'name': ['Description', 'Payee', 'Name', 'Merchant'],
+    'memo': ['Memo', 'Details', 'Notes'],
+    'type': ['Type', 'Transaction Type'],
+    'checknum': ['Check Number', 'Check or Slip #', 'Check #', 'Check No.'],
+    'account': ['Account', 'Account Number', 'Account Name'],
+}
+CSV_DATE_FORMATS = ['%m/%d/%Y', '%Y-%m-%d', '%m/%d/%y', '%d-%b-%Y']
+CSV_DELIMITERS = ',;\t|'
+
+
+def _posted(date: datetime.date) -> str:
+    """Posted value in the format load_ofx_file() stores: '2023-09-01 00:00:00+00:00'"""
+    return str(datetime.datetime(date.year, date.month, date.day, tzinfo=datetime.timezone.utc))
+
+
+def _parse_amount(text) -> float:
+    text = str(text).strip().replace('$', '').replace(',', '')
+    if text.startswith('(') and text.endswith(')'):
+        text = '-' + text[1:-1]
+    return float(text)
+
+
+def _record(account, posted, amount, name, memo='', checknum='', txn_type=None) -> Dict:
+    if txn_type is None or txn_type == '':
+        txn_type = 'DEBIT' if amount < 0 else 'CREDIT'
+    return {
+        'account': account,
+        'type': txn_type,
+        'posted': posted,
+        'amount': amount,
+        'name': name,
+        'memo': memo,
+        'checknum': checknum
+    }
+
+
+def _is_file_object(source):
+    return hasattr(source, 'read')
+
+
+def _source_name(source, name=None) -> str:
+    if name is not None:
+        return str(name)
+    if _is_file_object(source):
+        return str(getattr(source, 'name', ''))
+    return str(source)
+
+
+def _open_text(source, **kwargs):
+    if _is_file_object(source):
+        return io.TextIOWrapper(source, newline='', **kwargs)
+    return open(source, newline='', **kwargs)
+
+
+def _chunks(records, chunk_size) -> Iterator[List[Dict]]:
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def load_csv_mapping(path) -> Dict:
+    """
+    Read a column mapping from a JSON file, for example
+    {"date": "Post Date", "name": "Description", "debit": "Debit", "credit": "Credit", "date_format": "%d/%m/%Y"}
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def resolve_csv_mapping(fieldnames, mapping=None) -> Dict:
+    """Column name for each record field, from mapping or else the first matching alias"""
+    mapping = {} if mapping is None else mapping
+    columns = {}
+    for field, aliases in CSV_COLUMN_ALIASES.items():
+        if field in mapping:
+            if mapping[field] not in fieldnames:
+                raise ValueError(f'CSV mapping for {field}: no column "{mapping[field]}" in {fieldnames}')
+            columns[field] = mapping[field]
+            continue
+        columns[field] = next((alias for alias in aliases if alias in fieldnames), None)
+    if columns['date'] is None or (columns['amount'] is None and columns['debit'] is None):
+        raise ValueError(f'CSV needs a date and an amount (or debit / credit) column, found {fieldnames}')
+    return columns
+
+
+def _parse_csv_date(text, date_formats) -> datetime.date:
+    for date_format in date_formats:
+        try:
+            return datetime.datetime.strptime(text.strip(), date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognized date: "{text}"')
+
+
+def iter_csv_records(source, csv_mapping=None, account=None, name=None, **kwargs) -> Iterator[Dict]:
+    """
+    Stream records from a bank CSV export.
+    :param csv_mapping: {field: column name} overriding CSV_COLUMN_ALIASES, plus an optional 'date_format'
+    :param account: account for files without an account column (default: the file name)
+    """
+    mapping = {} if csv_mapping is None else csv_mapping
+    if account is None:
+        account = Path(_source_name(source, name)).stem
+    date_formats = [mapping['date_format']] if 'date_format' in mapping else CSV_DATE_FORMATS
+    with _open_text(source, encoding='utf-8-sig') as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(SNIFF_SIZE), delimiters=CSV_DELIMITERS)
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        reader = csv.DictReader(f, dialect=dialect)
+        columns = resolve_csv_mapping(reader.fieldnames or [], mapping)
+
+        def value(row, field):
+            column = columns[field]
+            return '' if column is None or row.get(column) is None else row[column].strip()
+
+        for row in reader:
+            if value(row, 'date') == '':
+                continue
+            if columns['amount'] is not None and value(row, 'amount') != '':
+                amount = _parse_amount(value(row, 'amount'))
+            else:
+                debit = value(row, 'debit')
+                credit = value(row, 'credit')
+                amount = _parse_amount(credit) if credit != '' else -abs(_parse_amount(debit or '0'))
+            yield _record(
+                value(row, 'account') or account,
+                _posted(_parse_csv_date(value(row, 'date'), date_formats)),
+                amount,
+                value(row, 'name'),
+                value(row, 'memo'),
+                value(row, 'checknum'),
+                value(row, 'type').upper() or None
+            )
+
+
+def _parse_qif_date(text) -> datetime.date:
+    # QIF dates look like 9/ 1/2023, 09/01/23, 9/1'23 or 2023-09-01, some exporters put the day first (25/9'23)
+    text = text.replace("'", '/').replace(' ', '').replace('-', '/')
+    parts = text.split('/')
+    if len(parts[0]) == 4:
+        year, month, day = [int(part) for part in parts]
+        return datetime.date(year, month, day)
+    month, day, year = [int(part) for part in parts]
+    if month > 12 >= day:
+        month, day = day, month
+    if year < 100:
+        year += 2000 if year < 70 else 1900
+    return datetime.date(year, month, day)
+
+
+def iter_qif_records(source, account=None, name=None, **kwargs) -> Iterator[Dict]:
+    """Stream records from a QIF file. An !Account block sets the account of the records that follow."""
+    if account is None:
+        account = Path(_source_name(source, name)).stem
+    fields = {}
+    in_account_block = False
+    with _open_text(source, encoding='utf-8-sig', errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line == '':
+                continue
+            if line.startswith('!'):
+                in_account_block = line.strip().lower() == '!account'
+                continue
+            code, text = line[0], line[1:].strip()
+            if code == '^':
+                if in_account_block:
+                    account = fields.get('N', account)
+                    in_account_block = False
+                elif 'D' in fields and ('T' in fields or 'U' in fields):
+                    yield _record(
+                        account,
+                        _posted(_parse_qif_date(fields['D'])),
+                        _parse_amount(fields.get('T', fields.get('U'))),
+                        fields.get('P', ''),
+                        fields.get('M', ''),
+                        fields.get('N', '')
+                    )
+                fields = {}
+            else:
+                fields[code] = text
+
+
+def iter_ofx_records(source, **kwargs) -> Iterator[Dict]:
+    # ofxtools parses the whole document, there is nothing to gain from streaming it
+    return iter(load_ofx_file(source))
+
+
+# format name -> (file extensions, record iterator)
+_FORMATS = {}
+# formats whose reader yields records as it reads the file, instead of parsing the whole file first
+_STREAMED_FORMATS = set()
+
+
+def register_format(name, extensions, reader, streamed=True):
+    """reader(source, **options) returns an iterator of records; options it does not use must be ignored"""
+    _FORMATS[name] = ([extension.lower() for extension in extensions], reader)
+    if streamed:
+        _STREAMED_FORMATS.add(name)
+    else:
+        _STREAMED_FORMATS.discard(name)
+
+
+register_format('ofx', ['.ofx', '.qfx'], iter_ofx_records, streamed=False)
+register_format('csv', ['.csv'], iter_csv_records)
+register_format('qif', ['.qif'], iter_qif_records)
+
+
+def supported_extensions() -> List[str]:
+    return [extension for extensions, _ in _FORMATS.values() for extension in extensions]
+
+
+def is_streamed_format(format_name) -> bool:
+    return format_name in _STREAMED_FORMATS
+
+
+def is_supported_file(path) -> bool:
+    return os.path.splitext(str(path))[1].lower() in supported_extensions()
+
+
+def detect_format(source, name=None) -> str:
+    """Format name from the file extension, or from the start of the file if the extension is unknown"""
+    extension = os.path.splitext(_source_name(source, name))[1].lower()
+    for format_name, (extensions, _) in _FORMATS.items():
+        if extension in extensions:
+            return format_name
+    if _is_file_object(source):
+        position = source.tell()
+        head = source.read(SNIFF_SIZE)
+        source.seek(position)
+    else:
+        with open(source, 'rb') as f:
+            head = f.read(SNIFF_SIZE)
+    head = head.lstrip().upper()
+    if head.startswith(b'OFXHEADER') or b'<OFX>' in head:
+        return 'ofx'
+    if head.startswith(b'!TYPE') or head.startswith(b'!ACCOUNT'):
+        return 'qif'
+    return 'csv'
+
+
+def iter_record_chunks(source, chunk_size=DEFAULT_CHUNK_SIZE, name=None, **options) -> Iterator[List[Dict]]:
+    """
+    Records from source in lists of at most chunk_size.
+    :param options: csv_mapping, account - passed to the reader for the detected format
+    """
+    file_format = detect_format(source, name)
+    logging.info(f'Reading {_source_name(source, name)} as {file_format.upper()}')
+    _, reader = _FORMATS[file_format]
+    return _chunks(reader(source, name=name, **options), chunk_size)
+
+
+def load_records(source, **options) -> List[Dict]:
+    """All records from a statement file of any supported format"""
+    records = []
+    for chunk in iter_record_chunks(source, **options):
+        records.extend(chunk)
+    return records
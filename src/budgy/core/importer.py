@@ -1,32 +1,133 @@
 import argparse
+import json
 import logging
+import os
+import time
 from pathlib import Path
 
 from budgy.core.app import BudgyApp
 from budgy.core.database import BudgyDatabase
-from budgy.core import load_ofx_file
+from budgy.core.formats import load_csv_mapping, DEFAULT_CHUNK_SIZE
+from budgy.core.sources import iter_sources, DEFAULT_JOBS
+from budgy.core.journal import merge_sources
+from budgy.core.cache import StatementCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from budgy.core.metrics import ImportMetrics, format_metrics, format_summary
+from budgy.core.transfers import format_transfer_pair, DEFAULT_WINDOW_DAYS
+from budgy.core.duplicates import format_near_duplicate
+from budgy.core.watcher import FolderWatcher, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS
 
 class ImporterApp(BudgyApp):
     def __init__(self):
         super().__init__('Budgy Data Importer')
-        self._db = BudgyDatabase(self._args.db)
+        if len(self._args.datafiles) == 0 and self._args.watch is None:
+            self.arg_parser.error('datafiles are required unless --watch is used')
+        if self._args.dry_run:
+            if self._args.watch is not None:
+                self.arg_parser.error('--dry-run can not be used with --watch')
+            # everything happens to an in-memory copy, the database file is only read
+            self._db = BudgyDatabase.snapshot(self._args.db)
+        else:
+            self._db = BudgyDatabase(self._args.db)
+        self._csv_mapping = None if self._args.csv_mapping is None else load_csv_mapping(self._args.csv_mapping)
+        self._cache = None
+        if not self._args.no_cache:
+            self._cache = StatementCache(self._args.cache_dir, int(self._args.cache_size * 1024 * 1024))
 
     def _add_command_args(self):
         parser:argparse.ArgumentParser = self.arg_parser
         parser.add_argument('--db', type=Path, required=True, help='Path to sqlite3 database. Will be created if it '
                                                                    'does not exist')
-        parser.add_argument('datafiles', nargs='+', help='One or more datafiles to import')
+        parser.add_argument('--transfers', choices=['review', 'apply'],
+                            help='After importing, list transactions that look like transfers between accounts '
+                                 '("review") or also set their category to Transfer ("apply")')
+        parser.add_argument('--transfer-window', type=int, default=DEFAULT_WINDOW_DAYS,
+                            help=f'Maximum days between the two sides of a transfer (default: {DEFAULT_WINDOW_DAYS})')
+        parser.add_argument('--near-duplicates', choices=['review', 'merge'],
+                            help='After importing, list records that look like copies of another record (same '
+                                 'account and amount, posted a day apart, similar name and memo). "merge" keeps '
+                                 'the first copy and deletes the others.')
+        parser.add_argument('--account', type=str,
+                            help='Account for CSV and QIF files that do not name one (default: the file name)')
+        parser.add_argument('--csv-mapping', type=Path,
+                            help='JSON file mapping record fields (date, amount, debit, credit, name, memo, type, '
+                                 'checknum, account, date_format) to the column names of a bank CSV export')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help=f'Records parsed and merged at a time (default: {DEFAULT_CHUNK_SIZE})')
+        parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                            help=f'OFX statements parsed in parallel, CSV and QIF are streamed (default: {DEFAULT_JOBS})')
+        parser.add_argument('--cache-dir', type=Path, default=DEFAULT_CACHE_DIR,
+                            help=f'Where parsed statements are cached (default: {DEFAULT_CACHE_DIR})')
+        parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                            help=f'Maximum size of the parsed statement cache in MB '
+                                 f'(default: {DEFAULT_MAX_BYTES // (1024 * 1024)})')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Always parse statements, do not use or fill the cache')
+        parser.add_argument('--apply-rules', action='store_true',
+                            help='After importing, also categorize the uncategorized transactions already in the '
+                                 'database with the merchant rules (new transactions always are)')
+        parser.add_argument('--metrics', type=str, metavar='FILE',
+                            help='Write import statistics (timings, records per second, duplicates, statement bytes; '
+                                 'per statement, per account and overall) to FILE as JSON. "-" writes to stdout. '
+                                 'With --watch a line is appended for every import.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Import into an in-memory copy of the database and report what would be added, '
+                                 'per statement and per account. The database is not changed.')
+        parser.add_argument('--watch', nargs='?', const='', metavar='DIR',
+                            help='Keep running and import new statements as they appear in DIR '
+                                 '(default: the import folder from the budgy config)')
+        parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                            help=f'Seconds between scans of the watched folder (default: {DEFAULT_POLL_INTERVAL:.0f})')
+        parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                            help='Seconds a new file must stay unchanged before it is imported '
+                                 f'(default: {DEFAULT_SETTLE_SECONDS:.0f})')
+        parser.add_argument('datafiles', nargs='*',
+                            help='OFX, QFX, CSV or QIF files to import, directories (searched recursively) or '
+                                 'zip, tar and gzip archives of statements')
 
     def run(self):
         self.log_app_header()
-        
+        if len(self._args.datafiles) > 0:
+            metrics = self.import_paths(self._args.datafiles)
+            if self._args.dry_run:
+                print(f'Dry run, {self._args.db} was not changed')
+                for line in format_metrics(metrics):
+                    print(line)
+        if self._args.watch is not None:
+            self.watch_folder(self._args.watch or self._default_watch_folder())
+
+    def _default_watch_folder(self):
+        # only the watch mode needs the GUI's config file
+        from budgy.gui.configdata import BudgyConfig
+        return BudgyConfig().import_data_path
+
+    def import_paths(self, paths):
+        """
+        Import statement files, directories and archives, then record each path in the import manifest.
+        An import that was interrupted resumes where it stopped. Files that cannot be read or parsed are
+        logged and skipped, and left out of the manifest.
+        """
         nrecords0 = self._db.count_records()
         if nrecords0 > 0:
             logging.info(f'Database already contains {nrecords0} records')
-        for datafile in self._args.datafiles:
-            logging.info(f'Importing {datafile}...')
-            records = load_ofx_file(datafile)
-            self._db.merge_records(records)
+        near_duplicates = 0
+        imported = {}
+        metrics = ImportMetrics()
+        errors = []
+        sources = iter_sources(paths, errors=errors)
+        for source, records, result in merge_sources(self._db, sources, self._args.chunk_size, self._args.jobs,
+                                                     metrics=metrics, cache=self._cache, errors=errors,
+                                                     csv_mapping=self._csv_mapping, account=self._args.account):
+            logging.info(f'Imported {len(records)} records from {source.name}')
+            near_duplicates += len(result['near_duplicates'])
+            imported[source.path] = imported.get(source.path, 0) + len(records)
+        failed = {source.path for source, error in errors}
+        if len(errors) > 0:
+            logging.warning(f' - Skipped {len(errors)} statements that could not be read')
+        for path, records in imported.items():
+            if path in failed:
+                continue
+            stat = os.stat(path)
+            self._db.record_imported_file(os.path.abspath(path), stat.st_size, stat.st_mtime_ns, records)
         nrecords1 = self._db.count_records()
         logging.info(f'Database now contains {nrecords1} records')
         new_records = nrecords1 - nrecords0
@@ -34,6 +135,76 @@ class ImporterApp(BudgyApp):
             logging.info(f' - Added {new_records} records')
         else:
             logging.info(' - No new records added.')
+        if near_duplicates > 0:
+            logging.warning(f' - {near_duplicates} new records look like copies of existing records '
+                            f'(use --near-duplicates review)')
+        if self._args.near_duplicates is not None:
+            self.review_near_duplicates(merge=self._args.near_duplicates == 'merge')
+        if self._args.transfers is not None:
+            self.detect_transfers(apply=self._args.transfers == 'apply')
+        if self._args.apply_rules:
+            metrics.rules_applied += self._db.apply_merchant_rules()
+        metrics.finish()
+        logging.info(format_summary(metrics))
+        if self._args.metrics is not None:
+            self.write_metrics(metrics)
+        return metrics
+
+    def write_metrics(self, metrics):
+        text = json.dumps(metrics.as_dict())
+        if self._args.metrics == '-':
+            print(text)
+        else:
+            # one JSON object per line, so watch mode can keep appending
+            with open(self._args.metrics, 'a') as f:
+                f.write(text + '\n')
+
+    def watch_folder(self, directory, max_polls=None):
+        """
+        Poll directory and import statements once they have stopped changing. Files already in the
+        import manifest with the same size and modification time are skipped.
+        :param max_polls: stop after this many scans (default: run until interrupted)
+        """
+        directory = os.path.abspath(os.path.expanduser(directory))
+        logging.info(f'Watching {directory} every {self._args.poll_interval}s')
+        watcher = FolderWatcher(directory, self._args.settle)
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                ready = [path for path, (size, mtime) in watcher.poll()
+                         if not self._db.is_file_imported(path, size, mtime)]
+                if len(ready) > 0:
+                    logging.info(f'Importing {len(ready)} new statements')
+                    try:
+                        self.import_paths(ready)
+                    except Exception:
+                        # keep watching, the files are tried again once they change
+                        logging.exception(f'Importing {len(ready)} statements from {directory} failed')
+                polls += 1
+                if max_polls is None or polls < max_polls:
+                    time.sleep(self._args.poll_interval)
+        except KeyboardInterrupt:
+            logging.info(f'Stopped watching {directory}')
+
+    def detect_transfers(self, apply=False):
+        pairs = self._db.find_transfers(window_days=self._args.transfer_window)
+        print(f'Found {len(pairs)} possible transfers')
+        for pair in pairs:
+            print(f'  {format_transfer_pair(pair)}')
+        if apply and len(pairs) > 0:
+            updated = self._db.assign_transfers(pairs)
+            print(f'Set category {self._db.TRANSFER_CATEGORY} on {updated} transactions')
+        return pairs
+
+    def review_near_duplicates(self, merge=False):
+        pairs = self._db.find_near_duplicates()
+        print(f'Found {len(pairs)} possible duplicates')
+        for pair in pairs:
+            print(f'  {format_near_duplicate(pair)}')
+        if merge and len(pairs) > 0:
+            deleted = self._db.merge_near_duplicates(pairs)
+            print(f'Deleted {deleted} duplicate transactions')
+        return pairs
 
 
 def main():
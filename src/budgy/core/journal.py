@@ -0,0 +1,123 @@
+"""
+Resumable imports
+
+merge_sources() merges statement sources chunk by chunk. Each chunk is committed in the
+same transaction as a journal entry saying how many records of its source are now in the
+database, so an import that dies partway through leaves the database and the journal in
+step. The next import of the same sources skips every source the journal marks complete
+without parsing it, and skips the records of a partly imported source that were already
+merged. Journal entries are dropped once the whole import has finished.
+
+The date range of each account in a source is recorded as import coverage once, when the
+source is complete, instead of once per chunk.
+
+A journal entry only applies while the file it was read from keeps the same size and
+modification time; a changed file is imported from the start.
+"""
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from budgy.core import formats
+from budgy.core.metrics import timed
+from budgy.core.sources import iter_source_chunks, StatementSource, DEFAULT_JOBS
+
+
+def _signature(source: StatementSource) -> Tuple[int, int]:
+    stat = os.stat(source.path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def merge_sources(database, sources, chunk_size=formats.DEFAULT_CHUNK_SIZE, jobs=DEFAULT_JOBS, metrics=None,
+                  cache=None, errors=None, **options) -> Iterator[Tuple[StatementSource, List[Dict], Dict]]:
+    """
+    Merge sources into database, resuming an interrupted import of the same sources.
+    :param metrics: ImportMetrics to add counts and timings to
+    :param cache: StatementCache for parsed records
+    :param errors: list to collect (source, exception) of sources that cannot be parsed. They are skipped and
+                   not marked complete; the chunks merged before the error stay merged.
+    :param options: csv_mapping, account - passed to the format readers
+    :return: iterator of (source, records, merge_records result) for every chunk merged
+    """
+    sources = list(sources)
+    signatures = {}
+    skip = {}
+    pending = []
+    for source in sources:
+        signatures[source.name] = _signature(source)
+        progress = database.get_import_progress(source.name)
+        if progress is None or progress[:2] != signatures[source.name]:
+            pending.append(source)
+        elif progress[3]:
+            logging.info(f'Skipping {source.name}: imported by an earlier, interrupted import')
+        else:
+            logging.info(f'Resuming {source.name} after {progress[2]} records')
+            skip[source.name] = progress[2]
+            pending.append(source)
+
+    # source name -> account -> [first_posted, last_posted, records, inserted]
+    coverage = {}
+
+    def add_coverage(source, records, result=None):
+        accounts = coverage.setdefault(source.name, {})
+        for record in records:
+            entry = accounts.setdefault(record['account'], [record['posted'], record['posted'], 0, 0])
+            entry[0] = min(entry[0], record['posted'])
+            entry[1] = max(entry[1], record['posted'])
+            entry[2] += 1
+        if result is not None:
+            for account, counts in result['accounts'].items():
+                accounts[account][3] += counts['merged']
+
+    def failed(source):
+        return errors is not None and any(s is source for s, _ in errors)
+
+    def finish(source, done):
+        if failed(source):
+            coverage.pop(source.name, None)
+            return
+        for account, (first_posted, last_posted, records, inserted) in coverage.pop(source.name, {}).items():
+            account_id = database.get_account_id(account, create=False)
+            if account_id is not None:
+                database.record_import(account_id, first_posted, last_posted, records, inserted, commit=False)
+        size, mtime = signatures[source.name]
+        database.record_import_progress(source.name, size, mtime, done, complete=True)
+
+    if metrics is not None:
+        for source in pending:
+            metrics.add_source(source.name, source.size)
+    current = None
+    done = 0
+    chunks = iter_source_chunks(pending, chunk_size, jobs, cache, errors, **options)
+    for (source, records), parse_seconds in timed(chunks):
+        if source is not current:
+            if current is not None:
+                finish(current, done)
+            current = source
+            done = 0
+        start = done
+        done += len(records)
+        already = skip.get(source.name, 0)
+        if done <= already:
+            # merged by the interrupted import, still part of the source's coverage
+            add_coverage(source, records)
+            continue
+        add_coverage(source, records[:max(already - start, 0)])
+        records = records[max(already - start, 0):]
+        size, mtime = signatures[source.name]
+        start_merge = time.perf_counter()
+        try:
+            result = database.merge_records(records, commit=False, record_coverage=False)
+            database.record_import_progress(source.name, size, mtime, done, commit=False)
+            database.connection.commit()
+        except Exception:
+            database.connection.rollback()
+            raise
+        add_coverage(source, records, result)
+        if metrics is not None:
+            metrics.add(source.name, result, parse_seconds, time.perf_counter() - start_merge)
+        yield source, records, result
+    if current is not None:
+        finish(current, done)
+    database.clear_import_progress(source.name for source in sources)
@@ -0,0 +1,105 @@
+"""
+Merchant name normalization for Budgy
+
+OFX data reports the same merchant under many `name` variants (store numbers,
+payment processor prefixes, city suffixes, truncation). normalize_merchant_name()
+reduces a raw name to a canonical merchant key which the database maps to an
+integer merchant id.
+"""
+import functools
+import re
+from collections import OrderedDict
+
+# OFX 1.x limits NAME to 32 characters, so names this long may end in a partial word
+OFX_NAME_MAX_LENGTH = 32
+# card statements pad the merchant name to a fixed width column followed by the city
+CARD_MERCHANT_WIDTH = 24
+
+# Prefixes added by banks / card networks in front of the merchant name
+POS_PREFIXES = (
+    'POS PURCHASE ',
+    'POS DEBIT ',
+    'POS ',
+    'DEBIT CARD PURCHASE ',
+    'CHECKCARD ',
+    'CHECK CARD ',
+    'PURCHASE AUTHORIZED ON ',
+    'RECURRING PAYMENT ',
+    'PURCHASE ',
+)
+
+# Payment processor codes are short prefixes separated by '*' (SQ *, TST*, FD *, FSP*, ...)
+PROCESSOR_PREFIX_MAX_LENGTH = 4
+WALLET_PREFIXES = ('PAYPAL',)
+
+_column_split = re.compile(r'\s{2,}')
+_whitespace = re.compile(r'\s+')
+_has_digit = re.compile(r'\d')
+_trim_chars = ' -*#.,/&'
+
+
+@functools.lru_cache(maxsize=4096)
+def normalize_merchant_name(name) -> str:
+    """Return the canonical merchant key for a raw transaction name"""
+    if name is None:
+        return ''
+    raw = name.strip().upper()
+    if raw == '':
+        return ''
+    text = raw
+    columns = _column_split.split(text)
+    if len(text) > CARD_MERCHANT_WIDTH + 1 and text[CARD_MERCHANT_WIDTH] == ' ':
+        text = text[:CARD_MERCHANT_WIDTH]
+    elif len(columns) > 1:
+        text = columns[0]
+    elif len(name) >= OFX_NAME_MAX_LENGTH and ' ' in text:
+        # the last word may have been cut off by the bank
+        text = text.rsplit(' ', 1)[0]
+    for prefix in POS_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+            break
+    if '*' in text:
+        head, tail = text.split('*', 1)
+        head = head.strip()
+        if (len(head) <= PROCESSOR_PREFIX_MAX_LENGTH or head in WALLET_PREFIXES) and tail.strip() != '':
+            text = tail
+    if '*' in text:
+        # whatever follows a '*' after the merchant is a reference code
+        text = text.split('*', 1)[0]
+    # store numbers, reference ids, check numbers, ...
+    words = [w for w in _whitespace.split(text) if w and not _has_digit.search(w)]
+    text = ' '.join(w.strip(_trim_chars) for w in words).strip(_trim_chars)
+    text = _whitespace.sub(' ', text)
+    return text if text != '' else raw
+
+
+class LRUCache(object):
+    """Small bounded mapping which evicts the least recently used entry"""
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def values(self):
+        return self._data.values()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,133 @@
+"""
+Import statistics
+
+ImportMetrics adds up what an import did, per statement and per account: records read,
+records merged (inserted), exact duplicates skipped and merged records that look like
+copies of stored ones (near duplicates, inserted as well and flagged for review), statement bytes (StatementSource.size), plus the time spent
+parsing and merging.
+merge_sources() fills one in when it is passed a metrics object; as_dict() is the JSON
+written by budgy-import --metrics.
+"""
+import datetime
+import time
+from typing import Dict, List
+
+COUNTERS = ('records', 'merged', 'duplicates', 'near_duplicates')
+
+
+def _counters() -> Dict:
+    counters = {counter: 0 for counter in COUNTERS}
+    counters['parse_seconds'] = 0.0
+    counters['merge_seconds'] = 0.0
+    counters['bytes'] = 0
+    return counters
+
+
+def _with_rate(counters) -> Dict:
+    seconds = counters['parse_seconds'] + counters['merge_seconds']
+    return dict(counters,
+                inserted=counters['merged'],
+                rows_per_second=round(counters['records'] / seconds, 1) if seconds > 0 else None)
+
+
+def timed(iterable):
+    """(item, seconds spent producing it) for every item of iterable"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        yield item, time.perf_counter() - start
+
+
+class ImportMetrics(object):
+    def __init__(self):
+        # statement name -> counters
+        self.files: Dict[str, Dict] = {}
+        # account -> counters
+        self.accounts: Dict[str, Dict] = {}
+        # transactions categorized by merchant rules, as they were merged or by --apply-rules
+        self.rules_applied = 0
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self._start = time.perf_counter()
+        self.elapsed_seconds = 0.0
+
+    def add_source(self, source_name, nbytes):
+        """Count a statement that is about to be read"""
+        self.files.setdefault(source_name, _counters())['bytes'] += nbytes
+
+    def add(self, source_name, result, parse_seconds=0.0, merge_seconds=0.0):
+        """Count one merge_records() result for source_name"""
+        file = self.files.setdefault(source_name, _counters())
+        file['parse_seconds'] += parse_seconds
+        file['merge_seconds'] += merge_seconds
+        self.rules_applied += result.get('rules_applied', 0)
+        for account, counts in result['accounts'].items():
+            totals = self.accounts.setdefault(account, _counters())
+            for counter in COUNTERS:
+                file[counter] += counts[counter]
+                totals[counter] += counts[counter]
+        # timings are per chunk, share them out by record count
+        nrecords = sum(counts['records'] for counts in result['accounts'].values())
+        for account, counts in result['accounts'].items():
+            share = counts['records'] / nrecords if nrecords > 0 else 0.0
+            self.accounts[account]['parse_seconds'] += parse_seconds * share
+            self.accounts[account]['merge_seconds'] += merge_seconds * share
+
+    @property
+    def totals(self) -> Dict:
+        totals = _counters()
+        for file in self.files.values():
+            for counter in totals:
+                totals[counter] += file[counter]
+        return totals
+
+    def finish(self):
+        """Stop the wall clock"""
+        self.elapsed_seconds = time.perf_counter() - self._start
+
+    def as_dict(self) -> Dict:
+        totals = _with_rate(self.totals)
+        totals['rules_applied'] = self.rules_applied
+        totals['files'] = len(self.files)
+        return {
+            'started': self.started,
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'totals': totals,
+            'files': {name: _with_rate(counters) for name, counters in self.files.items()},
+            # bytes are only known per statement
+            'accounts': {account: _with_rate(dict(counters, bytes=None))
+                         for account, counters in sorted(self.accounts.items())}
+        }
+
+
+def _row(label, counters) -> str:
+    return (f'{label[-40:]:40} {counters["records"]:8} {counters["merged"]:8} {counters["duplicates"]:8} '
+            f'{counters["near_duplicates"]:8} {counters["parse_seconds"]:8.2f} {counters["merge_seconds"]:8.2f}')
+
+
+def format_summary(metrics: ImportMetrics) -> str:
+    """One line summary of an import"""
+    totals = _with_rate(metrics.totals)
+    line = (f'Read {totals["records"]} records from {len(metrics.files)} statements: {totals["inserted"]} new, '
+            f'{totals["duplicates"]} duplicates, {totals["near_duplicates"]} possible duplicates')
+    if metrics.rules_applied > 0:
+        line += f', {metrics.rules_applied} categorized by rules'
+    if totals['rows_per_second'] is not None:
+        line += f' ({totals["rows_per_second"]:.0f} records/s)'
+    return line
+
+
+def format_metrics(metrics: ImportMetrics) -> List[str]:
+    """Text table of metrics by statement and by account"""
+    header = f'{"":40} {"Records":>8} {"New":>8} {"Dups":>8} {"Near":>8} {"Parse s":>8} {"Merge s":>8}'
+    lines = [f'{"Statement":40}' + header[40:]]
+    lines.extend(_row(name, counters) for name, counters in metrics.files.items())
+    lines.append('')
+    lines.append(f'{"Account":40}' + header[40:])
+    lines.extend(_row(account, counters) for account, counters in sorted(metrics.accounts.items()))
+    lines.append('')
+    lines.append(_row('Total', metrics.totals))
+    return lines
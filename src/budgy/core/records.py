@@ -0,0 +1,127 @@
+"""
+Filtered, sorted and paged transactions
+
+RecordFilter describes what the record view shows: account, amount range, category,
+expense type, posted date range and the sort order. BudgyDatabase.filter_records() turns it
+into parameterized SQL on the transactions table that the indexes on posted, amount,
+category and account can serve.
+
+PagedRecords is a read-only sequence over the filtered records. len() runs one COUNT and
+records are read a page at a time when they are first indexed. The page after a cached
+page continues from the cached page's last row (keyset paging), other pages are read with
+OFFSET. Only max_pages pages are kept, so a million row history costs a few hundred rows
+of memory. index_of_date() finds where a date starts with one COUNT on the posted index.
+"""
+import datetime
+from typing import Dict, List, Optional
+
+from budgy.core.merchants import LRUCache
+
+DEFAULT_PAGE_SIZE = 200
+DEFAULT_MAX_PAGES = 16
+
+
+def parse_date(text) -> str:
+    """'YYYY-MM-DD' for a 'YYYY-MM-DD' date or a 'YYYY-MM' month (its first day)"""
+    text = text.strip()
+    try:
+        if len(text) == 7:
+            return datetime.date.fromisoformat(f'{text}-01').isoformat()
+        return datetime.date.fromisoformat(text).isoformat()
+    except ValueError:
+        raise ValueError(f'Not a date or month: {text}') from None
+
+
+class RecordFilter(object):
+    SORT_COLUMNS = ('posted', 'amount')
+
+    def __init__(self, account=None, min_amount=None, max_amount=None, category=None, subcategory=None,
+                 expense_type=None, start=None, end=None, sort='posted', descending=False):
+        """
+        :param account: account identifier
+        :param min_amount: lowest amount to include, expenses are negative
+        :param max_amount: highest amount to include
+        :param category: category name
+        :param subcategory: subcategory name, on its own it matches that subcategory of every category
+        :param expense_type: one of the BudgyDatabase expense types
+        :param start: first posted date to include, 'YYYY-MM-DD'
+        :param end: last posted date to include, 'YYYY-MM-DD'
+        :param sort: 'posted' or 'amount', ties are ordered by fitid
+        """
+        if sort not in self.SORT_COLUMNS:
+            raise ValueError(f'Cannot sort records by {sort}')
+        self.account = account
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.category = category
+        self.subcategory = subcategory
+        self.expense_type = expense_type
+        self.start = start
+        self.end = end
+        self.sort = sort
+        self.descending = descending
+
+    def __eq__(self, other):
+        return isinstance(other, RecordFilter) and vars(self) == vars(other)
+
+    def __repr__(self):
+        options = ', '.join(f'{k}={v!r}' for k, v in vars(self).items() if v is not None)
+        return f'RecordFilter({options})'
+
+
+class PagedRecords(object):
+    def __init__(self, database, record_filter: RecordFilter = None, page_size=DEFAULT_PAGE_SIZE,
+                 max_pages=DEFAULT_MAX_PAGES):
+        self.database = database
+        self.record_filter = RecordFilter() if record_filter is None else record_filter
+        self.page_size = page_size
+        self._pages = LRUCache(max_pages)
+        self._count: Optional[int] = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.database.count_filtered_records(self.record_filter)
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('record index out of range')
+        page = self._page(index // self.page_size)
+        return page[index % self.page_size]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _page(self, number) -> List[Dict]:
+        page = self._pages.get(number)
+        if page is None:
+            previous = self._pages.get(number - 1)
+            if previous is not None and len(previous) > 0:
+                page = self.database.filter_records(self.record_filter, self.page_size, after=previous[-1])
+            else:
+                page = self.database.filter_records(self.record_filter, self.page_size,
+                                                    offset=number * self.page_size)
+            self._pages.put(number, page)
+        return page
+
+    def index_of_date(self, date):
+        """Index of the first record on date, or of the record the date would come before"""
+        return self.database.count_filtered_records(self.record_filter, before_date=date)
+
+    def refresh(self):
+        """Forget the count and the cached pages, e.g. after the database changed"""
+        self._count = None
+        self._pages.clear()
+
+    def update_categories(self, fitids, category_id):
+        """Keep the cached rows in sync after a category change"""
+        fitids = set(fitids)
+        for page in self._pages.values():
+            for record in page:
+                if record['fitid'] in fitids:
+                    record['category'] = category_id
@@ -0,0 +1,126 @@
+"""
+Headless expense reports for Budgy
+
+budgy-report prints the same monthly expense grid as the viewer's report panel, plus
+the yearly stats and a category breakdown, as text, CSV or JSON. It only uses
+budgy.core so it can run from cron on machines without a display.
+"""
+import csv
+import json
+import logging
+import sys
+from pathlib import Path
+
+from budgy.core.app import BudgyApp
+from budgy.core.database import BudgyDatabase
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+SUMMARY_COLUMNS = ['year', 'average', 'minimum', 'maximum'] + MONTH_NAMES
+CATEGORY_COLUMNS = ['category', 'subcategory', 'expense_type', 'count', 'total']
+
+
+def summary_rows(report):
+    """One row per year: year, average, minimum, maximum, then the twelve months (None if no data)"""
+    rows = []
+    for year in sorted(report):
+        data = report[year]
+        rows.append([year, data['average'], data['minimum'], data['maximum']] + list(data['months']))
+    return rows
+
+
+def category_rows(categories):
+    return [[c[column] for column in CATEGORY_COLUMNS] for c in categories]
+
+
+def _amount(value, precision):
+    return '' if value is None else f'{value:.{precision}f}'
+
+
+def format_summary_text(report) -> str:
+    lines = [''.join(f'{column.capitalize():>9}' for column in SUMMARY_COLUMNS)]
+    for row in summary_rows(report):
+        lines.append(f'{row[0]:>9}' + ''.join(f'{_amount(value, 0):>9}' for value in row[1:]))
+    return '\n'.join(lines)
+
+
+def format_categories_text(categories) -> str:
+    lines = [f'{"Category":<40}{"Count":>8}{"Total":>12}']
+    for c in categories:
+        name = c['category'] if c['subcategory'] == '' else f'{c["category"]} / {c["subcategory"]}'
+        lines.append(f'{name:<40}{c["count"]:>8}{c["total"]:>12.2f}')
+    return '\n'.join(lines)
+
+
+def write_csv(out, columns, rows):
+    writer = csv.writer(out)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+
+
+class ReportApp(BudgyApp):
+    REPORTS = ['summary', 'categories', 'all']
+    FORMATS = ['text', 'csv', 'json']
+
+    def __init__(self):
+        super().__init__('Budgy Report')
+        if not self._args.db.expanduser().is_file():
+            self.arg_parser.error(f'database not found: {self._args.db}')
+        self._db = BudgyDatabase(self._args.db.expanduser())
+
+    def _add_command_args(self):
+        parser = self.arg_parser
+        parser.add_argument('--db', type=Path, required=True, help='Path to sqlite3 database')
+        parser.add_argument('--report', choices=self.REPORTS, default='all',
+                            help='summary: monthly expense grid with yearly average / min / max, '
+                                 'categories: expenses by category (default: all)')
+        parser.add_argument('--format', choices=self.FORMATS, default='text', help='Output format (default: text)')
+        parser.add_argument('--year', help='Limit the category breakdown to one year (YYYY)')
+        parser.add_argument('--month', type=int, choices=range(1, 13), metavar='MONTH',
+                            help='Limit the category breakdown to one month (1-12)')
+        parser.add_argument('--output', type=Path, help='Write the report to a file instead of stdout')
+
+    def build_report(self):
+        report = {}
+        if self._args.report in ('summary', 'all'):
+            report['summary'] = self._db.get_report()
+        if self._args.report in ('categories', 'all'):
+            month = None if self._args.month is None else f'{self._args.month:02d}'
+            report['categories'] = self._db.get_category_report(year=self._args.year, month=month)
+        return report
+
+    def write_report(self, report, out):
+        output_format = self._args.format
+        if output_format == 'json':
+            json.dump(report, out, indent=2)
+            out.write('\n')
+            return
+        sections = []
+        if 'summary' in report:
+            sections.append(('summary', SUMMARY_COLUMNS, summary_rows(report['summary'])))
+        if 'categories' in report:
+            sections.append(('categories', CATEGORY_COLUMNS, category_rows(report['categories'])))
+        for i, (name, columns, rows) in enumerate(sections):
+            if i > 0:
+                out.write('\n')
+            if output_format == 'csv':
+                write_csv(out, columns, rows)
+            elif name == 'summary':
+                out.write(format_summary_text(report['summary']) + '\n')
+            else:
+                out.write(format_categories_text(report['categories']) + '\n')
+
+    def run(self):
+        self.log_app_header()
+        report = self.build_report()
+        if self._args.output is None:
+            self.write_report(report, sys.stdout)
+        else:
+            with open(self._args.output, 'w', newline='') as out:
+                self.write_report(report, out)
+            logging.info(f'Report written to {self._args.output}')
+
+
+def main():
+    myapp = ReportApp()
+    myapp.run()
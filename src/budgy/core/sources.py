@@ -0,0 +1,373 @@
+"""
+Statement sources for Budgy imports
+
+iter_sources() turns the paths given to an import (files, directories, zip and tar
+archives, gzip, bzip2 and xz compressed statements) into StatementSource objects, one per statement. Directories are walked
+recursively and archive members are read straight out of the archive, nothing is
+extracted to disk. A tar archive is opened once for all its members, which are listed in
+archive order, so a compressed tar is decompressed front to back instead of once per member.
+
+iter_source_chunks() parses the sources and yields their records in chunks, ready for
+BudgyDatabase.merge_records(). CSV and QIF statements are streamed in process a chunk at a
+time. With jobs > 1 the OFX statements, which are parsed whole anyway, are parsed in a
+process pool (parsing is pure Python, so threads would not help), at most jobs at a time so
+memory is bounded by jobs statements, not by the whole import. The results still come back
+in source order so imports are repeatable. Given a
+StatementCache, OFX statements parsed before are loaded from the cache instead. CSV and
+QIF statements, and statements larger than MAX_CACHED_BYTES, are always streamed: caching
+them would mean holding the whole statement and all its records in memory at once.
+
+Both take an errors list. A statement or archive that cannot be read or parsed is then
+logged, added to the list as (source, exception) and skipped, instead of stopping the
+whole import.
+"""
+import bz2
+import collections
+import contextlib
+import gzip
+import io
+import logging
+import lzma
+import os
+import tarfile
+import zipfile
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+
+from budgy.core import formats
+
+DEFAULT_JOBS = min(os.cpu_count() or 1, 4)
+TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+# compressed single statements, e.g. checking.qfx.bz2
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz')
+# last suffix of every archive name iter_sources() opens
+ARCHIVE_SUFFIXES = ['.zip', '.gz', '.tar', '.tgz', '.bz2', '.tbz2', '.xz', '.txz']
+# larger statements are not cached
+MAX_CACHED_BYTES = 16 * 1024 * 1024
+
+
+class StatementSource(object):
+    """One statement: a file on disk or a member of an archive"""
+    FILE = 'file'
+    ZIP = 'zip'
+    TAR = 'tar'
+    GZIP = 'gzip'
+    BZIP2 = 'bzip2'
+    XZ = 'xz'
+    # kind -> (suffix, open function) of compressed statements
+    COMPRESSED = {
+        GZIP: ('.gz', gzip.open),
+        BZIP2: ('.bz2', bz2.open),
+        XZ: ('.xz', lzma.open)
+    }
+
+    def __init__(self, path, kind=FILE, member=None, info=None, archive=None):
+        """
+        :param info: ZipInfo or TarInfo of the member, from the listing of the archive
+        :param archive: _TarArchive shared by the members of a tar archive
+        """
+        self.path = str(path)
+        self.kind = kind
+        self.member = member
+        self.info = info
+        self._archive = archive
+
+    def __getstate__(self):
+        # worker processes open the archive themselves
+        return dict(self.__dict__, _archive=None)
+
+    @property
+    def name(self) -> str:
+        """Name used to detect the format, e.g. 'statements.zip/2023/checking.qfx'"""
+        if self.kind == self.FILE:
+            return self.path
+        if self.kind in self.COMPRESSED:
+            return self.path[:-len(self.COMPRESSED[self.kind][0])]
+        return f'{self.path}/{self.member}'
+
+    @property
+    def size(self) -> int:
+        """
+        Bytes this statement takes in its file: the compressed size for zip members and gzip / bzip2 / xz files,
+        the member size for tar members (a compressed tar is compressed as a whole, its members have no
+        compressed size of their own).
+        """
+        if self.kind == self.ZIP:
+            return self._member_info().compress_size
+        if self.kind == self.TAR:
+            return self._member_info().size
+        return os.path.getsize(self.path)
+
+    def _member_info(self):
+        if self.info is None:
+            if self.kind == self.ZIP:
+                with zipfile.ZipFile(self.path) as archive:
+                    self.info = archive.getinfo(self.member)
+            else:
+                with tarfile.open(self.path) as archive:
+                    self.info = archive.getmember(self.member)
+        return self.info
+
+    @contextlib.contextmanager
+    def open(self) -> Iterator[BinaryIO]:
+        """Binary stream of the statement, archive members are decompressed as they are read"""
+        if self.kind == self.ZIP:
+            with zipfile.ZipFile(self.path) as archive, archive.open(self._member_info()) as f:
+                yield f
+        elif self.kind == self.TAR:
+            if self._archive is None:
+                self._archive = _TarArchive(self.path)
+            with self._archive.extractfile(self._member_info()) as f:
+                yield f
+            # the shared archive is closed once every member was read, reading again opens it again
+            self._archive = None
+        elif self.kind in self.COMPRESSED:
+            with self.COMPRESSED[self.kind][1](self.path, 'rb') as f:
+                yield f
+        else:
+            with open(self.path, 'rb') as f:
+                yield f
+
+    def read(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def is_streamed(self) -> bool:
+        """Whether the format reader streams this statement (CSV, QIF) instead of parsing it whole (OFX)"""
+        name = self.path if self.kind == self.FILE else self.name
+        return formats.is_streamed_format(formats.detect_format(name))
+
+    def is_cacheable(self) -> bool:
+        """Only statements that are parsed whole anyway (OFX) and not larger than MAX_CACHED_BYTES are cached"""
+        return self.size <= MAX_CACHED_BYTES and not self.is_streamed()
+
+    def iter_record_chunks(self, chunk_size=formats.DEFAULT_CHUNK_SIZE, cache=None, **options) -> Iterator[List[Dict]]:
+        if cache is not None and self.is_cacheable():
+            records = self.load_records(cache, **options)
+            return iter([records[start:start + chunk_size] for start in range(0, len(records), chunk_size)])
+        if self.kind == self.FILE:
+            # files on disk are streamed by the format reader
+            return formats.iter_record_chunks(self.path, chunk_size, **options)
+        return self._iter_member_chunks(chunk_size, **options)
+
+    def _iter_member_chunks(self, chunk_size, **options) -> Iterator[List[Dict]]:
+        if not self.is_streamed():
+            # ofxtools reads the whole document anyway
+            yield from formats.iter_record_chunks(io.BytesIO(self.read()), chunk_size, name=self.name, **options)
+            return
+        with self.open() as f:
+            yield from formats.iter_record_chunks(f, chunk_size, name=self.name, **options)
+
+    def load_records(self, cache=None, data=None, **options) -> List[Dict]:
+        """All records of the statement. data is its content, when the caller has read it already."""
+        key = None
+        if cache is not None and self.is_cacheable():
+            if data is None:
+                data = self.read()
+            key = cache.key(data, **options)
+            records = cache.get(key)
+            if records is not None:
+                logging.info(f'Loaded {len(records)} records for {self.name} from the cache')
+                return records
+        if data is None:
+            records = []
+            for chunk in self.iter_record_chunks(**options):
+                records.extend(chunk)
+            return records
+        records = formats.load_records(io.BytesIO(data), name=self.name, **options)
+        if key is not None:
+            cache.put(key, records)
+        return records
+
+    def __repr__(self):
+        return f'StatementSource({self.name!r})'
+
+
+class _TarArchive(object):
+    """
+    A tar archive opened once for all its members. Members are read with the TarInfo from the listing, in
+    archive order, so a compressed tar is decompressed front to back once instead of once per member.
+    The archive is closed when every member has been read.
+    """
+    def __init__(self, path, archive=None, members=1):
+        self.path = path
+        self._archive = archive
+        self._unread = members
+
+    @contextlib.contextmanager
+    def extractfile(self, info) -> Iterator[BinaryIO]:
+        if self._archive is None:
+            self._archive = tarfile.open(self.path)
+        try:
+            with self._archive.extractfile(info) as f:
+                yield f
+        finally:
+            self._unread -= 1
+            if self._unread <= 0:
+                self._archive.close()
+                self._archive = None
+
+
+def _is_tar(path) -> bool:
+    return path.lower().endswith(TAR_SUFFIXES)
+
+
+def _archive_sources(path) -> Iterator[StatementSource]:
+    lower = path.lower()
+    if lower.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            members = sorted((info for info in archive.infolist() if not info.is_dir()), key=lambda i: i.filename)
+        for info in members:
+            if formats.is_supported_file(info.filename):
+                yield StatementSource(path, StatementSource.ZIP, info.filename, info)
+    elif _is_tar(path):
+        listing = tarfile.open(path)
+        # archive order, a compressed tar can only be read front to back
+        members = [info for info in listing.getmembers() if info.isfile() and formats.is_supported_file(info.name)]
+        if len(members) == 0:
+            listing.close()
+        archive = _TarArchive(path, listing, len(members))
+        for info in members:
+            yield StatementSource(path, StatementSource.TAR, info.name, info, archive)
+    else:
+        for kind, (suffix, _) in StatementSource.COMPRESSED.items():
+            if lower.endswith(suffix) and formats.is_supported_file(path[:-len(suffix)]):
+                yield StatementSource(path, kind)
+
+
+def _skip(source, error, errors):
+    if errors is None:
+        raise error
+    logging.error(f'Skipping {source.name}: {error}')
+    errors.append((source, error))
+
+
+def _read_archive(path, errors) -> List[StatementSource]:
+    try:
+        return list(_archive_sources(path))
+    except Exception as e:
+        _skip(StatementSource(path), e, errors)
+        return []
+
+
+def is_archive(path) -> bool:
+    lower = str(path).lower()
+    return lower.endswith('.zip') or _is_tar(lower) or lower.endswith(COMPRESSED_SUFFIXES)
+
+
+def supported_suffixes() -> List[str]:
+    """File name suffixes an import can open: statement formats and archives"""
+    return formats.supported_extensions() + ARCHIVE_SUFFIXES
+
+
+def iter_sources(paths, recursive=True, errors=None) -> Iterator[StatementSource]:
+    """
+    Statements in paths. Files given by name are always imported (their format is detected
+    from their content if need be); files found in directories and archives only if they
+    have a supported extension.
+    :param errors: list to collect (source, exception) of archives that cannot be opened
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            yield from _directory_sources(path, recursive, errors)
+        elif is_archive(path):
+            yield from _read_archive(path, errors)
+        else:
+            yield StatementSource(path)
+
+
+def _directory_sources(directory, recursive, errors) -> Iterator[StatementSource]:
+    with os.scandir(directory) as it:
+        entries = sorted(it, key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir():
+            if recursive:
+                yield from _directory_sources(entry.path, recursive, errors)
+        elif is_archive(entry.path):
+            yield from _read_archive(entry.path, errors)
+        elif formats.is_supported_file(entry.path):
+            yield StatementSource(entry.path)
+
+
+def _load_source(args) -> List[Dict]:
+    source, data, cache, options = args
+    return source.load_records(cache, data, **options)
+
+
+def _submit(pool, source, cache, options) -> Future:
+    """Parse source in the pool. Tar members are read here, where the archive is already open."""
+    try:
+        data = source.read() if source.kind == StatementSource.TAR else None
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
+    return pool.submit(_load_source, (source, data, cache, options))
+
+
+def _parse_in_pool(source) -> bool:
+    try:
+        return not source.is_streamed()
+    except Exception:
+        # read in process, where the error is reported like any other
+        return False
+
+
+def iter_source_chunks(sources, chunk_size=formats.DEFAULT_CHUNK_SIZE, jobs=DEFAULT_JOBS, cache=None, errors=None,
+                       **options) -> Iterator[Tuple[StatementSource, List[Dict]]]:
+    """
+    (source, records) for every chunk of every source, in source order.
+    :param jobs: parse up to this many OFX sources at once in worker processes
+    :param cache: StatementCache for parsed records
+    :param errors: list to collect (source, exception) of sources that cannot be parsed, they are skipped.
+                   Without it the first error is raised.
+    :param options: csv_mapping, account - passed to the format readers
+    """
+    sources = list(sources)
+    if jobs <= 1 or len(sources) <= 1:
+        for source in sources:
+            yield from _source_chunks(source, chunk_size, cache, errors, options)
+        return
+    logging.info(f'Parsing {len(sources)} statements with {jobs} workers')
+    remaining = iter(sources)
+    # (source, future) in source order, future is None for sources streamed in process
+    pending = collections.deque()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        def submit():
+            """Queue sources until jobs parses are in flight"""
+            in_flight = sum(1 for _, future in pending if future is not None)
+            for source in remaining:
+                if _parse_in_pool(source):
+                    pending.append((source, _submit(pool, source, cache, options)))
+                    in_flight += 1
+                    if in_flight >= jobs:
+                        return
+                else:
+                    pending.append((source, None))
+
+        submit()
+        while len(pending) > 0:
+            source, future = pending.popleft()
+            if future is None:
+                yield from _source_chunks(source, chunk_size, cache, errors, options)
+                continue
+            try:
+                records = future.result()
+            except Exception as e:
+                _skip(source, e, errors)
+                continue
+            finally:
+                submit()
+            for start in range(0, len(records), chunk_size):
+                yield source, records[start:start + chunk_size]
+
+
+def _source_chunks(source, chunk_size, cache, errors, options) -> Iterator[Tuple[StatementSource, List[Dict]]]:
+    try:
+        for chunk in source.iter_record_chunks(chunk_size, cache, **options):
+            yield source, chunk
+    except Exception as e:
+        _skip(source, e, errors)
@@ -0,0 +1,290 @@
+"""
+Synthetic transaction data
+
+Deterministic generator for scale tests and benchmarks: the same count, seed and accounts
+always produce the same transactions. A household has a checking, a savings and a credit
+card account by default and each month gets
+
+- paychecks on the 1st and 15th and monthly bills (mortgage, utilities, insurance,
+  streaming) on fixed days, some with fixed and some with varying amounts
+- transfers between accounts: the credit card payment and a savings deposit appear in
+  both accounts, a few days apart, so find_transfers() has work to do
+- an occasional check with an increasing check number
+- purchases from chain merchants whose names vary by store number and city, so merchant
+  normalization has work to do, plus some one-off local merchants that stay uncategorized
+
+The transactions are spread evenly over the months, so count is exact. write_statements()
+writes one OFX statement per account and month, each overlapping the previous month by a
+few days like real downloads do, and create_database() fills a BudgyDatabase directly
+(without the duplicate checks) and categorizes the known merchants.
+
+    python -m budgy.core.synthetic --records 100000 --db big.db --statements statements/
+"""
+import argparse
+import calendar
+import datetime
+import random
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from budgy.core.database import BudgyDatabase
+
+DEFAULT_ACCOUNTS = (('CHK-0001', 'checking'), ('SAV-0002', 'savings'), ('VISA-0003', 'credit'))
+DEFAULT_START = datetime.date(2020, 1, 1)
+DEFAULT_OVERLAP_DAYS = 7
+# OFX 1.x limits NAME to 32 characters
+MAX_NAME_LENGTH = 32
+
+CITIES = ('SAN JOSE', 'SUNNYVALE', 'LOS GATOS', 'SANTA CLARA', 'CAMPBELL', 'CUPERTINO')
+# name template, category, subcategory, lowest amount, highest amount, weight
+MERCHANTS = (
+    ('SAFEWAY #{store} {city}', 'Groceries / Food', '', 15, 180, 10),
+    ('TRADER JOE S #{store} {city}', 'Groceries / Food', '', 10, 120, 8),
+    ('SHELL OIL {store} {city}', 'Auto', 'Gas', 25, 80, 6),
+    ('CHEVRON {store} {city}', 'Auto', 'Gas', 25, 80, 4),
+    ('STARBUCKS STORE {store} {city}', 'Entertainment', 'Coffee', 4, 12, 8),
+    ('AMAZON MKTPL*{code}', 'Shopping', 'Amazon', 8, 150, 8),
+    ('CVS/PHARMACY #{store} {city}', 'Medical', 'Medicine', 5, 60, 4),
+    ('HOME DEPOT #{store} {city}', 'Household', 'Repairs', 10, 400, 3),
+    ('UBER *TRIP {code}', 'Rideshare', '', 8, 45, 3),
+    ('CHIPOTLE {store} {city}', 'Entertainment', 'Dining', 9, 40, 5),
+    ('UNITED AIRLINES {code}', 'Travel', 'Transportation (air, sea, rail)', 150, 900, 1),
+    ('MARRIOTT {city}', 'Travel', 'Hotel', 120, 600, 1),
+)
+LOCAL_WORDS = ('BLUE', 'GOLDEN', 'OAK', 'SUNRISE', 'MAIN ST', 'VALLEY', 'CORNER', 'HAPPY')
+LOCAL_KINDS = ('BAKERY', 'DELI', 'HARDWARE', 'TAILOR', 'CAFE', 'NURSERY', 'BARBER', 'BOOKS')
+LOCAL_FRACTION = 0.1
+# account kind, day of month, name, type, lowest amount, highest amount, category, subcategory
+SCHEDULED = (
+    ('checking', 1, 'ACME CORP PAYROLL', 'DIRECTDEP', 3200, 3400, 'Income', 'Salary / Wages'),
+    ('checking', 15, 'ACME CORP PAYROLL', 'DIRECTDEP', 3200, 3400, 'Income', 'Salary / Wages'),
+    ('checking', 1, 'LOANCARE MORTGAGE PMT', 'DEBIT', -2450, -2450, 'Morgage', ''),
+    ('checking', 5, 'STATE FARM INSURANCE', 'DEBIT', -182.4, -182.4, 'Insurance', 'Auto'),
+    ('checking', 25, 'CITY OF SAN JOSE WATER', 'DEBIT', -140, -60, 'Utilities', 'Water'),
+    ('credit', 12, 'PGANDE WEB ONLINE', 'DEBIT', -320, -90, 'Utilities', 'Gas / Electric'),
+    ('credit', 18, 'COMCAST CALIFORNIA', 'DEBIT', -89.99, -89.99, 'Utilities', 'Internet'),
+    ('credit', 22, 'NETFLIX.COM', 'DEBIT', -15.49, -15.49, 'Entertainment', 'Video Streaming'),
+    ('savings', 28, 'INTEREST PAYMENT', 'INT', 2, 40, 'Income', 'Interest'),
+)
+# day of month, from account kind, to account kind, days until it posts in the other account, amount range
+TRANSFERS = (
+    (20, 'checking', 'credit', 2, 1500, 3000),
+    (16, 'checking', 'savings', 1, 500, 500),
+)
+# merchant categories assigned by create_database()
+CATEGORIES = sorted({(template.split(' ')[0].split('*')[0], category, subcategory)
+                     for template, category, subcategory, _, _, _ in MERCHANTS} |
+                    {(name, category, subcategory) for _, _, name, _, _, _, category, subcategory in SCHEDULED})
+
+
+def _posted(date: datetime.date) -> str:
+    return f'{date.isoformat()} 00:00:00+00:00'
+
+
+class SyntheticLedger(object):
+    """The transactions of one household, month by month"""
+    def __init__(self, count, seed=1, accounts=DEFAULT_ACCOUNTS, start=DEFAULT_START, months=None):
+        if months is None:
+            months = max(1, min(120, count // 200))
+        self.count = count
+        self.seed = seed
+        self.accounts = list(accounts)
+        self.start = start
+        self.months = months
+        self._kinds = {}
+        for account, kind in self.accounts:
+            self._kinds.setdefault(kind, account)
+
+    def month_start(self, month) -> datetime.date:
+        year = self.start.year + (self.start.month - 1 + month) // 12
+        return datetime.date(year, (self.start.month - 1 + month) % 12 + 1, 1)
+
+    def _account(self, kind):
+        """The first account of kind, or the first account when there is none"""
+        return self._kinds.get(kind, self.accounts[0][0])
+
+    def _record(self, account, date, txn_type, amount, name, memo='', checknum=''):
+        return {
+            'account': account,
+            'type': txn_type,
+            'posted': _posted(date),
+            'amount': round(amount, 2),
+            'name': name[:MAX_NAME_LENGTH],
+            'memo': memo,
+            'checknum': checknum
+        }
+
+    def _scheduled(self, rng, first, days, checknum):
+        records = []
+        for kind, day, name, txn_type, low, high, _, _ in SCHEDULED:
+            date = first.replace(day=min(day, days))
+            records.append(self._record(self._account(kind), date, txn_type, rng.uniform(low, high), name,
+                                        'Recurring'))
+        for day, from_kind, to_kind, delay, low, high in TRANSFERS:
+            from_account = self._account(from_kind)
+            to_account = self._account(to_kind)
+            if from_account == to_account:
+                continue
+            amount = round(rng.uniform(low, high), 2)
+            date = first.replace(day=min(day, days))
+            records.append(self._record(from_account, date, 'XFER', -amount, f'TRANSFER TO {to_account}', 'Transfer'))
+            records.append(self._record(to_account, date + datetime.timedelta(days=delay), 'XFER', amount,
+                                        f'TRANSFER FROM {from_account}', 'Transfer'))
+        if rng.random() < 0.5:
+            date = first.replace(day=rng.randint(1, days))
+            records.append(self._record(self._account('checking'), date, 'CHECK', -rng.uniform(50, 800),
+                                        f'CHECK {checknum}', 'Check', str(checknum)))
+        return records
+
+    def _purchase(self, rng, first, days):
+        date = first.replace(day=rng.randint(1, days))
+        account = self._account('credit') if rng.random() < 0.7 else self._account('checking')
+        if rng.random() < LOCAL_FRACTION:
+            name = f'{rng.choice(LOCAL_WORDS)} {rng.choice(LOCAL_KINDS)} {rng.choice(CITIES)}'
+            return self._record(account, date, 'DEBIT', -rng.uniform(5, 90), name, 'Purchase')
+        template, _, _, low, high, _ = rng.choices(MERCHANTS, weights=[m[5] for m in MERCHANTS])[0]
+        name = template.format(store=rng.randint(100, 4999), city=rng.choice(CITIES),
+                               code=f'{rng.randrange(16 ** 6):06X}')
+        return self._record(account, date, 'DEBIT', -rng.uniform(low, high), name, 'Purchase')
+
+    def iter_months(self) -> Iterator[List[Dict]]:
+        """The records of each month, sorted by posted date. Records carry the bank's 'fitid'."""
+        rng = random.Random(self.seed)
+        sequence = {account: 0 for account, kind in self.accounts}
+        prefixes = {account: i + 1 for i, (account, kind) in enumerate(self.accounts)}
+        checknum = 1001
+        for month in range(self.months):
+            first = self.month_start(month)
+            days = calendar.monthrange(first.year, first.month)[1]
+            quota = self.count * (month + 1) // self.months - self.count * month // self.months
+            records = self._scheduled(rng, first, days, checknum)
+            checknum += 1
+            if len(records) > quota:
+                records = records[:quota]
+            while len(records) < quota:
+                records.append(self._purchase(rng, first, days))
+            records.sort(key=lambda r: r['posted'])
+            for record in records:
+                sequence[record['account']] += 1
+                record['fitid'] = f'{prefixes[record["account"]]}{sequence[record["account"]]:09d}'
+            yield records
+
+    def records(self) -> List[Dict]:
+        return [record for records in self.iter_months() for record in records]
+
+
+def _escape(text):
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def format_ofx(account, kind, records, start: datetime.date, end: datetime.date) -> str:
+    """One OFX 1.02 (SGML) statement for account"""
+    transactions = []
+    for record in records:
+        checknum = f'<CHECKNUM>{record["checknum"]}' if record['checknum'] and kind != 'credit' else ''
+        transactions.append(
+            f'<STMTTRN><TRNTYPE>{record["type"]}<DTPOSTED>{record["posted"][:10].replace("-", "")}000000'
+            f'<TRNAMT>{record["amount"]:.2f}<FITID>{record["fitid"]}{checknum}'
+            f'<NAME>{_escape(record["name"])}<MEMO>{_escape(record["memo"])}</STMTTRN>'
+        )
+    balance = f'{sum(r["amount"] for r in records):.2f}'
+    asof = f'{end.strftime("%Y%m%d")}120000'
+    transaction_list = (f'<BANKTRANLIST><DTSTART>{start.strftime("%Y%m%d")}<DTEND>{end.strftime("%Y%m%d")}\n' +
+                        '\n'.join(transactions) + '</BANKTRANLIST>\n'
+                        f'<LEDGERBAL><BALAMT>{balance}<DTASOF>{asof}</LEDGERBAL>\n')
+    if kind == 'credit':
+        statement = ('<CREDITCARDMSGSRSV1><CCSTMTTRNRS>\n'
+                     '<TRNUID>0<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+                     f'<CCSTMTRS><CURDEF>USD<CCACCTFROM><ACCTID>{account}</CCACCTFROM>\n' +
+                     transaction_list +
+                     '</CCSTMTRS></CCSTMTTRNRS></CREDITCARDMSGSRSV1>')
+    else:
+        statement = ('<BANKMSGSRSV1><STMTTRNRS>\n'
+                     '<TRNUID>0<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+                     f'<STMTRS><CURDEF>USD<BANKACCTFROM><BANKID>121000358\n'
+                     f'<ACCTID>{account}<ACCTTYPE>{kind.upper()}</BANKACCTFROM>\n' +
+                     transaction_list +
+                     '</STMTRS></STMTTRNRS></BANKMSGSRSV1>')
+    return ('OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\nCHARSET:1252\n'
+            'COMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+            '<OFX><SIGNONMSGSRSV1><SONRS>\n'
+            '<STATUS><CODE>0<SEVERITY>INFO</STATUS>\n'
+            f'<DTSERVER>{asof}<LANGUAGE>ENG\n'
+            '</SONRS></SIGNONMSGSRSV1>\n' +
+            statement + '</OFX>\n')
+
+
+def write_statements(directory, ledger: SyntheticLedger, overlap_days=DEFAULT_OVERLAP_DAYS,
+                     suffix='.qfx') -> List[Path]:
+    """
+    One statement per account and month named ACCOUNT_YYYY-MM.qfx. Every statement after the first also
+    repeats the last overlap_days days of the previous month, so importing all of them finds duplicates.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    kinds = dict(ledger.accounts)
+    previous = {account: [] for account in kinds}
+    paths = []
+    for month, records in enumerate(ledger.iter_months()):
+        first = ledger.month_start(month)
+        last = ledger.month_start(month + 1) - datetime.timedelta(days=1)
+        start = first - datetime.timedelta(days=overlap_days) if month > 0 else first
+        for account, kind in kinds.items():
+            current = [r for r in records if r['account'] == account]
+            overlap = [r for r in previous[account] if r['posted'] >= _posted(start)]
+            path = directory / f'{account}_{first.strftime("%Y-%m")}{suffix}'
+            with open(path, 'w') as f:
+                f.write(format_ofx(account, kind, overlap + current, start, last))
+            paths.append(path)
+            previous[account] = current
+    return paths
+
+
+def create_database(path, ledger: SyntheticLedger, categorize=True) -> BudgyDatabase:
+    """
+    A database holding the ledger as if every month had been imported once. Records are inserted without the
+    duplicate checks of merge_records, one transaction per month, so millions of rows take minutes.
+    """
+    database = BudgyDatabase(path)
+    for records in ledger.iter_months():
+        accounts = {}
+        for record in records:
+            database.insert_record(record, commit=False)
+            accounts.setdefault(record['account'], []).append(record['posted'])
+        for account, posted in accounts.items():
+            database.record_import(database.get_account_id(account, commit=False), min(posted), max(posted),
+                                   len(posted), len(posted), commit=False)
+        database.connection.commit()
+    if categorize:
+        for prefix, category, subcategory in CATEGORIES:
+            database.bulk_categorize(f'{prefix}%', category, subcategory)
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser('budgy.core.synthetic')
+    parser.add_argument('--records', type=int, default=10000, help='Number of transactions')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed, the same seed gives the same data')
+    parser.add_argument('--months', type=int, help='Months of history (default: one per 200 records, at most 120)')
+    parser.add_argument('--db', type=Path, help='Create this database')
+    parser.add_argument('--statements', type=Path, help='Write OFX statements to this directory')
+    parser.add_argument('--overlap', type=int, default=DEFAULT_OVERLAP_DAYS,
+                        help=f'Days each statement repeats from the previous month (default: {DEFAULT_OVERLAP_DAYS})')
+    args = parser.parse_args()
+    if args.db is None and args.statements is None:
+        parser.error('nothing to do, give --db and/or --statements')
+    ledger = SyntheticLedger(args.records, seed=args.seed, months=args.months)
+    if args.db is not None:
+        if args.db.exists():
+            parser.error(f'{args.db} already exists')
+        create_database(args.db, ledger).connection.close()
+        print(f'{args.db}: {args.records} records over {ledger.months} months')
+    if args.statements is not None:
+        paths = write_statements(args.statements, ledger, overlap_days=args.overlap)
+        print(f'{args.statements}: {len(paths)} statements')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
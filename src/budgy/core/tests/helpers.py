@@ -0,0 +1,30 @@
+"""Helpers shared by the core tests"""
+import os
+import tempfile
+import unittest
+
+
+def make_record(name='Test', amount=-10.0, posted='2023-09-01', account='CHK', memo='memo', fitid=None):
+    """A transaction dictionary as the importers produce it. posted may be a plain 'YYYY-MM-DD' date."""
+    if len(posted) == 10:
+        posted = f'{posted} 00:00:00+00:00'
+    return {
+        'fitid': fitid,
+        'account': account,
+        'type': 'DEBIT' if amount < 0 else 'CREDIT',
+        'posted': posted,
+        'amount': amount,
+        'name': name,
+        'memo': memo,
+        'checknum': ''
+    }
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Every test gets a database path, TEST_DB, in its own temporary directory"""
+    def setUp(self):
+        self._tmpdir = tempfile.TemporaryDirectory()
+        self.TEST_DB = os.path.join(self._tmpdir.name, 'test.db')
+
+    def tearDown(self):
+        self._tmpdir.cleanup()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from budgy.core import formats, load_ofx_file
+from budgy.core.cache import StatementCache
+from budgy.core.sources import StatementSource, iter_sources, iter_source_chunks
+
+
+class CacheTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = StatementCache(os.path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_put_get(self):
+        path = os.path.join(self.DATADIR, 'checking.qfx')
+        records = load_ofx_file(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        key = self.cache.key(data)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, records)
+        self.assertEqual(self.cache.get(key), records)
+        # the reader options are part of the key
+        self.assertNotEqual(self.cache.key(data, account='CHK'), key)
+        self.assertNotEqual(self.cache.key(data + b' '), key)
+        with patch('budgy.core.cache.PARSER_VERSION', formats.PARSER_VERSION + 1):
+            self.assertNotEqual(self.cache.key(data), key)
+
+        self.cache.put('empty', [])
+        self.assertEqual(self.cache.get('empty'), [])
+        with open(self.cache._path('broken'), 'wb') as f:
+            f.write(b'not zlib')
+        self.assertIsNone(self.cache.get('broken'))
+
+    def test_eviction(self):
+        records = load_ofx_file(os.path.join(self.DATADIR, 'credit.qfx'))
+        self.cache.put('a', records)
+        entry_size = os.path.getsize(self.cache._path('a'))
+        self.cache.max_bytes = entry_size * 2
+        self.cache.put('b', records)
+        os.utime(self.cache._path('a'), ns=(1, 1))
+        os.utime(self.cache._path('b'), ns=(2, 2))
+        # reading 'a' makes 'b' the least recently used entry
+        self.assertIsNotNone(self.cache.get('a'))
+        self.cache.put('c', records)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('c'))
+
+    def test_sources(self):
+        statements = os.path.join(self.tmpdir.name, 'statements')
+        os.makedirs(statements)
+        for name in ('checking.qfx', 'credit.qfx'):
+            shutil.copy(os.path.join(self.DATADIR, name), statements)
+        sources = list(iter_sources(statements))
+        parsed = list(iter_source_chunks(sources, jobs=2, cache=self.cache))
+        self.assertEqual(len(os.listdir(self.cache.directory)), 2)
+        with patch('budgy.core.formats.load_records') as mock_load:
+            cached = list(iter_source_chunks(sources, chunk_size=10, jobs=1, cache=self.cache))
+            mock_load.assert_not_called()
+        self.assertEqual([records for source, chunk in cached for records in chunk],
+                         [records for source, chunk in parsed for records in chunk])
+        self.assertEqual(len(cached[0][1]), 10)
+
+    def test_streamed_sources(self):
+        path = os.path.join(self.tmpdir.name, 'big.csv')
+        with open(path, 'w') as f:
+            f.write('Date,Description,Amount\n')
+            for day in range(1000):
+                f.write(f'2023-01-01,Purchase {day},-{day}.50\n')
+        source = StatementSource(path)
+        # CSV statements are streamed in chunks, never read whole into memory or cached
+        with patch.object(StatementSource, 'read') as mock_read, \
+                patch('budgy.core.formats.load_records') as mock_load:
+            chunks = source.iter_record_chunks(chunk_size=100, cache=self.cache)
+            self.assertEqual(len(next(chunks)), 100)
+            self.assertEqual(sum(len(chunk) for chunk in chunks), 900)
+            mock_read.assert_not_called()
+            mock_load.assert_not_called()
+        self.assertFalse(os.path.exists(self.cache.directory) and os.listdir(self.cache.directory))
+        # neither are statements larger than MAX_CACHED_BYTES
+        source = StatementSource(os.path.join(self.DATADIR, 'checking.qfx'))
+        self.assertTrue(source.is_cacheable())
+        with patch('budgy.core.sources.MAX_CACHED_BYTES', source.size - 1):
+            self.assertFalse(source.is_cacheable())
+            self.assertEqual(len(source.load_records(self.cache)), len(load_ofx_file(source.path)))
+        self.assertFalse(os.path.exists(self.cache.directory) and os.listdir(self.cache.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import datetime
 import json
 import os.path
+import sqlite3
 import sys
 import tempfile
 import unittest
@@ -257,6 +258,103 @@ class TestDatabase(unittest.TestCase):
             # Verify database integrity
             self.assertTrue(db.table_exists('transactions'))
 
+    def test_dictionary_tables(self):
+        """Test that accounts and names are stored once and read back through the view"""
+        db = BudgyDatabase(self.TEST_DB)
+        self.assertTrue(db.table_exists(db.ACCOUNT_TABLE_NAME))
+        self.assertTrue(db.table_exists(db.NAME_TABLE_NAME))
+        self.assertTrue(db.view_exists(db.TXN_VIEW_NAME))
+        self.assertFalse(db.column_exists(db.TXN_TABLE_NAME, 'account'))
+        self.assertFalse(db.column_exists(db.TXN_TABLE_NAME, 'name'))
+
+        account_id = db.get_account_id('dictionary_account')
+        self.assertEqual(db.get_account_id('dictionary_account'), account_id)
+        self.assertIsNone(db.get_name_id('never seen this name', create=False))
+        self.assertIn('dictionary_account', db.get_account_list())
+
+    def test_dictionary_migration(self):
+        """Test migrating a database that stores account and name text in every row"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db_path = os.path.join(temp_dir, 'old_schema.db')
+            conn = sqlite3.connect(db_path)
+            conn.execute('''CREATE TABLE transactions (
+                fitid INTEGER PRIMARY KEY AUTOINCREMENT,
+                account TEXT, type TEXT, posted TEXT, amount FLOAT,
+                name TEXT, memo TEXT, category INT DEFAULT 1, checknum TEXT
+            )''')
+            conn.execute('CREATE INDEX content_lookup ON transactions (account, posted, amount, name, memo, type)')
+            rows = [
+                (5, 'CHK001', 'DEBIT', '2024-01-01 00:00:00+00:00', -10.0, 'COFFEE SHOP', 'memo', 3, ''),
+                (9, 'CHK001', 'DEBIT', '2024-01-02 00:00:00+00:00', -20.0, 'COFFEE SHOP', 'memo', 1, ''),
+                (12, 'CC002', 'DEBIT', '2024-01-03 00:00:00+00:00', -30.0, 'GROCERY', 'memo', 1, ''),
+            ]
+            conn.executemany('INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.commit()
+            conn.close()
+
+            db = BudgyDatabase(db_path)
+            self.assertTrue(db.column_exists(db.TXN_TABLE_NAME, 'account_id'))
+            self.assertFalse(db.column_exists(db.TXN_TABLE_NAME, 'account'))
+            self.assertTrue(db.index_exists('content_lookup'))
+            records = db.all_records()
+            self.assertEqual([r['fitid'] for r in records], [5, 9, 12])
+            self.assertEqual([r['account'] for r in records], ['CHK001', 'CHK001', 'CC002'])
+            self.assertEqual(records[2]['name'], 'GROCERY')
+            self.assertEqual(records[0]['category'], 3)
+            self.assertEqual(sorted(db.get_account_list()), ['CC002', 'CHK001'])
+            self.assertIsNotNone(records[0]['merchant'])
+
+            # duplicates are still detected after the migration
+            duplicate = {
+                'account': 'CHK001', 'type': 'DEBIT', 'posted': '2024-01-01 00:00:00+00:00',
+                'amount': -10.0, 'name': 'COFFEE SHOP', 'memo': 'memo', 'checknum': ''
+            }
+            self.assertIsNotNone(db.find_duplicate_by_content(duplicate))
+            db.merge_record(duplicate)
+            self.assertEqual(db.count_records(), 3)
+            # new fitids continue after the migrated ones
+            duplicate['posted'] = '2024-02-01 00:00:00+00:00'
+            db.merge_record(duplicate)
+            self.assertGreater(db.all_records()[-1]['fitid'], 12)
+            db.bulk_categorize('COFFEE%', 'Entertainment', 'Coffee')
+            self.assertEqual(db.get_category_for_fitid(9)[:2], ['Entertainment', 'Coffee'])
+            db.connection.close()
+
+    def test_import_coverage(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db = BudgyDatabase(os.path.join(tmpdir, 'coverage.db'))
+            with open(os.path.join(self.DATADIR, 'checking001.json')) as f:
+                test_records = json.loads(f.read())
+            account = test_records[0]['account']
+            result = db.merge_records(test_records)
+            self.assertEqual(result['covered'], 0)
+            nrecords = db.count_records()
+            account_id = db.get_account_id(account, create=False)
+            posted = sorted(r['posted'] for r in test_records if r['account'] == account)
+            self.assertEqual(db.get_coverage(account_id), [(posted[0], posted[-1])])
+
+            # the overlapping part of a later statement takes the bulk path, the new tail is inserted
+            tail = dict(test_records[-1], posted='2099-01-01 00:00:00+00:00', name='NEW TAIL RECORD')
+            result = db.merge_records(test_records + [tail])
+            self.assertEqual(result['merged'], 1)
+            self.assertGreater(result['covered'], 0)
+            self.assertEqual(result['covered'], result['duplicates'])
+            self.assertEqual(db.count_records(), nrecords + 1)
+            self.assertEqual(db.get_coverage(account_id), [(posted[0], '2099-01-01 00:00:00+00:00')])
+            # overlapping imports are folded into one row, checked with one query
+            db.merge_records(test_records)
+            rows = db.execute(f'SELECT COUNT(*) FROM {db.IMPORT_TABLE_NAME} WHERE account_id = ?', (account_id,))
+            self.assertEqual(rows.fetchone()[0], 1)
+
+            # deleting records makes the range unverified again
+            first = db.all_records()[0]
+            db.execute(f'DELETE FROM {db.TXN_TABLE_NAME} WHERE fitid = ?', (first['fitid'],))
+            db.connection.commit()
+            self.assertEqual(db.get_coverage(account_id), [])
+            result = db.merge_records(test_records)
+            self.assertEqual(db.count_records(), nrecords + 1)
+            db.connection.close()
+
     @classmethod
     def setUpClass(cls) -> None:
         if not os.path.isdir(cls.DATADIR):
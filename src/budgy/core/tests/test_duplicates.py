@@ -0,0 +1,65 @@
+import unittest
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.duplicates import find_near_duplicates, format_near_duplicate
+from budgy.core.tests.helpers import DatabaseTestCase, make_record
+
+
+class DuplicatesTestCase(DatabaseTestCase):
+    def test_find_near_duplicates(self):
+        records = [
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-05', memo='POS 1234', fitid=1),
+            # posted a day later with a slightly different memo
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-06', memo='POS 1235', fitid=2),
+            # different amount
+            make_record('BLUE BOTTLE COFFEE', -13.5, '2023-09-05', memo='POS 1234', fitid=3),
+            # different account
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-05', memo='POS 1234', account='CC', fitid=4),
+            # too far apart
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-08', memo='POS 1234', fitid=5),
+            # same block, different merchant
+            make_record('SAFEWAY', -12.5, '2023-09-05', memo='GROCERIES', fitid=6),
+        ]
+        pairs = find_near_duplicates(records)
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(pairs[0]['original']['fitid'], 1)
+        self.assertEqual(pairs[0]['duplicate']['fitid'], 2)
+        self.assertEqual(pairs[0]['days'], 1)
+        self.assertGreater(pairs[0]['score'], 0.9)
+        self.assertIn('BLUE BOTTLE COFFEE', format_near_duplicate(pairs[0]))
+
+    def test_merge_reports_near_duplicates(self):
+        db = BudgyDatabase(self.TEST_DB)
+        result = db.merge_records([
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-05', memo='POS 1234'),
+            make_record('SAFEWAY', -40.0, '2023-09-05', memo='GROCERIES')
+        ])
+        self.assertEqual(result['merged'], 2)
+        self.assertEqual(result['near_duplicates'], [])
+        result = db.merge_records([
+            # exact copy is skipped
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-05', memo='POS 1234'),
+            # near copy is inserted and reported
+            make_record('BLUE BOTTLE COFFEE', -12.5, '2023-09-06', memo='POS 1235')
+        ])
+        self.assertEqual(result['duplicates'], 1)
+        self.assertEqual(result['merged'], 1)
+        self.assertEqual(len(result['near_duplicates']), 1)
+        self.assertEqual(db.count_records(), 3)
+
+        pairs = db.find_near_duplicates()
+        self.assertEqual(len(pairs), 1)
+        original_fitid = pairs[0]['original']['fitid']
+        duplicate_fitid = pairs[0]['duplicate']['fitid']
+        self.assertEqual(duplicate_fitid, result['near_duplicates'][0]['duplicate']['fitid'])
+        # the category set on the copy moves to the original
+        db.set_txn_category(duplicate_fitid, 'Entertainment', 'Coffee')
+        self.assertEqual(db.merge_near_duplicates(pairs), 1)
+        self.assertEqual(db.count_records(), 2)
+        self.assertIsNone(db.get_record_by_fitid(duplicate_fitid))
+        self.assertEqual(db.get_category_for_fitid(original_fitid)[:2], ['Entertainment', 'Coffee'])
+        self.assertEqual(db.find_near_duplicates(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from budgy.core import exporter
+from budgy.core.database import BudgyDatabase
+
+
+class ExporterTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def _run(self, *args):
+        testargs = ['prog', '--db', self.db_path, '--log-dir', self.tmpdir.name] + list(args)
+        with patch.object(sys, 'argv', testargs):
+            app = exporter.ExportApp()
+            with patch('sys.stdout', new=io.StringIO()) as fake_out:
+                count = app.run()
+                return count, fake_out.getvalue()
+
+    def test_iter_records(self):
+        db = BudgyDatabase(self.db_path)
+        records = list(db.iter_records(batch_size=7))
+        self.assertEqual(len(records), db.count_records())
+        self.assertEqual(sorted(r['fitid'] for r in records), sorted(r['fitid'] for r in db.all_records()))
+        self.assertEqual(records, sorted(records, key=lambda r: (r['posted'], r['fitid'])))
+        self.assertEqual(records[0]['category'], db.DEFAULT_CATEGORY)
+        self.assertIsNotNone(records[0]['merchant'])
+
+        september = list(db.iter_records(start='2023-09-01', end='2023-09-30'))
+        self.assertGreater(len(september), 0)
+        self.assertTrue(all(r['posted'][:7] == '2023-09' for r in september))
+        self.assertEqual(list(db.iter_records(account='NoSuchAccount')), [])
+        self.assertEqual(len(list(db.iter_records(category=db.DEFAULT_CATEGORY))), len(records))
+        self.assertEqual(list(db.iter_records(category='Entertainment', subcategory='Coffee')), [])
+        db.connection.close()
+
+    def test_csv(self):
+        count, output = self._run('--end', '2023-09-30')
+        rows = list(csv.DictReader(io.StringIO(output)))
+        self.assertEqual(len(rows), count)
+        self.assertEqual(list(rows[0].keys()), exporter.EXPORT_FIELDS)
+
+    def test_jsonl_gzip(self):
+        output_path = os.path.join(self.tmpdir.name, 'export.jsonl.gz')
+        count, _ = self._run('--output', output_path)
+        with gzip.open(output_path, 'rt') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), count)
+        self.assertEqual(records[0]['account'], 'MyCheckingAccount')
+
+    def test_gzip_stdout(self):
+        testargs = ['prog', '--db', self.db_path, '--log-dir', self.tmpdir.name, '--format', 'jsonl', '--gzip']
+        with patch.object(sys, 'argv', testargs):
+            app = exporter.ExportApp()
+            with patch('sys.stdout', new=io.TextIOWrapper(io.BytesIO())) as fake_out:
+                count = app.run()
+                self.assertFalse(fake_out.closed)
+                data = fake_out.buffer.getvalue()
+        records = [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines()]
+        self.assertEqual(len(records), count)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'export.db')
+        with open(os.path.join(self.DATADIR, 'checking001.json')) as f:
+            test_records = json.loads(f.read())
+        db = BudgyDatabase(self.db_path)
+        db.merge_records(test_records)
+        db.connection.close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
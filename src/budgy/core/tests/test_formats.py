@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from budgy.core import formats, load_ofx_file
+from budgy.core.database import BudgyDatabase
+
+BANK_CSV = '''Posting Date,Description,Amount,Type,Check or Slip #
+09/01/2023,SMART AND FINAL 530      SAN JO,-42.17,DEBIT_CARD,
+09/02/2023,PAYROLL ACME INC,"2,500.00",ACH_CREDIT,
+09/03/2023,Check # 1566,-205.00,CHECK,1566
+'''
+
+DEBIT_CREDIT_CSV = '''Date;Payee;Withdrawal;Deposit;Account
+2023-09-01;COFFEE;4.50;;CHK-1
+2023-09-02;REFUND;;10.00;CHK-1
+'''
+
+QIF = '''!Account
+NMy Savings
+^
+!Type:Bank
+D9/ 1/2023
+T-1,234.56
+PRENT
+MSeptember
+^
+D9/15'23
+T20.00
+PINTEREST
+^
+D2023-09-20
+T-5.00
+PFEE
+^
+D25/9'23
+T-7.00
+PATM
+^
+'''
+
+
+class FormatsTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def _write(self, name, text):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_csv(self):
+        path = self._write('mybank.csv', BANK_CSV)
+        records = list(formats.iter_csv_records(path))
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0], {
+            'account': 'mybank',
+            'type': 'DEBIT_CARD',
+            'posted': '2023-09-01 00:00:00+00:00',
+            'amount': -42.17,
+            'name': 'SMART AND FINAL 530      SAN JO',
+            'memo': '',
+            'checknum': ''
+        })
+        self.assertEqual(records[1]['amount'], 2500.0)
+        self.assertEqual(records[2]['checknum'], '1566')
+
+    def test_csv_mapping(self):
+        # semicolon separated, debit and credit columns
+        path = self._write('export.txt', DEBIT_CREDIT_CSV)
+        mapping_path = self._write('mapping.json', json.dumps({'name': 'Payee', 'date_format': '%Y-%m-%d'}))
+        mapping = formats.load_csv_mapping(mapping_path)
+        records = list(formats.iter_csv_records(path, mapping))
+        self.assertEqual([r['amount'] for r in records], [-4.5, 10.0])
+        self.assertEqual([r['type'] for r in records], ['DEBIT', 'CREDIT'])
+        self.assertEqual(records[0]['account'], 'CHK-1')
+        self.assertEqual(records[0]['name'], 'COFFEE')
+        with self.assertRaises(ValueError):
+            list(formats.iter_csv_records(path, {'date': 'When'}))
+
+    def test_qif(self):
+        path = self._write('savings.qif', QIF)
+        records = list(formats.iter_qif_records(path))
+        self.assertEqual(len(records), 4)
+        self.assertEqual(records[0]['account'], 'My Savings')
+        self.assertEqual(records[0]['amount'], -1234.56)
+        self.assertEqual(records[0]['memo'], 'September')
+        self.assertEqual(records[1]['posted'], '2023-09-15 00:00:00+00:00')
+        self.assertEqual(records[1]['type'], 'CREDIT')
+        # ISO dates and day first dates
+        self.assertEqual(records[2]['posted'], '2023-09-20 00:00:00+00:00')
+        self.assertEqual(records[3]['posted'], '2023-09-25 00:00:00+00:00')
+
+    def test_detect_format(self):
+        self.assertEqual(formats.detect_format(os.path.join(self.DATADIR, 'checking.qfx')), 'ofx')
+        self.assertEqual(formats.detect_format(self._write('a.csv', BANK_CSV)), 'csv')
+        self.assertEqual(formats.detect_format(self._write('a.qif', QIF)), 'qif')
+        # unknown extensions are recognized by their content
+        ofx_copy = os.path.join(self.tmpdir.name, 'download.dat')
+        shutil.copy(os.path.join(self.DATADIR, 'checking.qfx'), ofx_copy)
+        self.assertEqual(formats.detect_format(ofx_copy), 'ofx')
+        self.assertEqual(formats.detect_format(self._write('b.txt', QIF)), 'qif')
+        self.assertEqual(formats.detect_format(self._write('c.txt', BANK_CSV)), 'csv')
+        self.assertTrue(formats.is_supported_file('statement.QFX'))
+        self.assertFalse(formats.is_supported_file('notes.txt'))
+
+    def test_chunks_merge(self):
+        path = self._write('mybank.csv', BANK_CSV)
+        chunks = list(formats.iter_record_chunks(path, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        db = BudgyDatabase(os.path.join(self.tmpdir.name, 'formats.db'))
+        for chunk in chunks:
+            db.merge_records(chunk)
+        self.assertEqual(db.count_records(), 3)
+        # importing the file again adds nothing
+        for chunk in formats.iter_record_chunks(path, chunk_size=2):
+            db.merge_records(chunk)
+        self.assertEqual(db.count_records(), 3)
+        db.connection.close()
+
+    def test_load_ofx(self):
+        path = os.path.join(self.DATADIR, 'checking.qfx')
+        self.assertEqual(formats.load_records(path), load_ofx_file(path))
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
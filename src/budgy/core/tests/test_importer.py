@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import patch
 import logging
@@ -6,6 +7,9 @@ import sys
 import tempfile
 import time
 from budgy.core import importer
+from budgy.core.database import BudgyDatabase
+from budgy.core.metrics import format_summary
+from budgy.core.tests.helpers import make_record
 
 logger = logging.getLogger()
 
@@ -52,6 +56,106 @@ class ImporterTestCase(unittest.TestCase):
             self.assertTrue(os.path.exists(self.DB_PATH))
             self._safe_remove_db(self.DB_PATH)
 
+    def test_dry_run(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'dry_run.db')
+            credit = os.path.join(self.DATADIR, 'credit.qfx')
+            checking = os.path.join(self.DATADIR, 'checking.qfx')
+            common = ['prog', '--log-dir', tmpdir, '--cache-dir', tmpdir, '--db', db_path]
+            testargs = common + ['--dry-run', credit]
+            with patch.object(sys, 'argv', testargs), patch.object(sys, 'stdout'):
+                importer.ImporterApp().run()
+            self.assertFalse(os.path.exists(db_path))
+
+            with patch.object(sys, 'argv', common + [credit]):
+                app = importer.ImporterApp()
+                app.run()
+            nrecords = app._db.count_records()
+            app._db.connection.close()
+            with open(db_path, 'rb') as f:
+                before = f.read()
+
+            testargs = common + ['--dry-run', credit, checking]
+            with patch.object(sys, 'argv', testargs), patch('builtins.print') as mock_print:
+                app = importer.ImporterApp()
+                metrics = app.import_paths([credit, checking])
+                app.run()
+            output = [call.args[0] for call in mock_print.call_args_list]
+            self.assertTrue(output[0].startswith('Dry run'))
+            self.assertEqual(metrics.files[credit]['merged'], 0)
+            self.assertEqual(metrics.files[credit]['duplicates'], metrics.files[credit]['records'])
+            self.assertGreater(metrics.files[checking]['merged'], 0)
+            self.assertEqual(sum(a['records'] for a in metrics.accounts.values()), metrics.totals['records'])
+            with open(db_path, 'rb') as f:
+                self.assertEqual(f.read(), before)
+            self.assertGreater(app._db.count_records(), nrecords)
+
+    def test_metrics(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'metrics.db')
+            metrics_path = os.path.join(tmpdir, 'metrics.json')
+            credit = os.path.join(self.DATADIR, 'credit.qfx')
+            common = ['prog', '--log-dir', tmpdir, '--cache-dir', tmpdir, '--db', db_path]
+            testargs = common + ['--metrics', metrics_path, '--apply-rules', credit]
+            with patch.object(sys, 'argv', testargs):
+                app = importer.ImporterApp()
+                app.run()
+                app.run()
+            app._db.connection.close()
+            with open(metrics_path) as f:
+                first, second = [json.loads(line) for line in f]
+            self.assertEqual(first['totals']['records'], 17)
+            self.assertEqual(first['totals']['inserted'], 17)
+            self.assertEqual(first['totals']['rules_applied'], 0)
+            self.assertEqual(first['files'][credit]['bytes'], os.path.getsize(credit))
+            self.assertGreater(first['totals']['rows_per_second'], 0)
+            self.assertEqual(list(first['accounts']), ['SIG-0-XXXXXXXXXXXXXXXX'])
+            self.assertEqual(second['totals']['inserted'], 0)
+            self.assertEqual(second['totals']['duplicates'], 17)
+
+    def test_metrics_near_duplicates(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'near.db')
+            statement = os.path.join(tmpdir, 'checking.csv')
+            with open(statement, 'w') as f:
+                f.write('Date,Description,Amount,Memo,Account\n'
+                        '2023-09-02,SMART AND FINAL 530      SAN JO,-42.17,memo,CHK\n'
+                        '2023-09-05,NETFLIX.COM,-15.49,,CHK\n')
+            db = BudgyDatabase(db_path)
+            db.merge_records([make_record('SMART AND FINAL 530      SAN JO', -42.17, account='CHK')])
+            before = db.count_records()
+            db.connection.close()
+            testargs = ['prog', '--log-dir', tmpdir, '--cache-dir', tmpdir, '--db', db_path, statement]
+            with patch.object(sys, 'argv', testargs):
+                app = importer.ImporterApp()
+                metrics = app.import_paths([statement])
+            totals = metrics.as_dict()['totals']
+            # the near duplicate is inserted for review, so it is part of inserted
+            self.assertEqual(totals['near_duplicates'], 1)
+            self.assertEqual(totals['inserted'], 2)
+            self.assertEqual(totals['inserted'], app._db.count_records() - before)
+            self.assertIn('2 new', format_summary(metrics))
+            app._db.connection.close()
+
+    def test_metrics_rules_applied(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            db_path = os.path.join(tmpdir, 'rules.db')
+            metrics_path = os.path.join(tmpdir, 'metrics.json')
+            credit = os.path.join(self.DATADIR, 'credit.qfx')
+            db = BudgyDatabase(db_path)
+            db.add_merchant_rule(db.get_merchant_id('SMART AND FINAL'), 'Groceries / Food')
+            db.connection.close()
+            testargs = ['prog', '--log-dir', tmpdir, '--cache-dir', tmpdir, '--db', db_path,
+                        '--metrics', metrics_path, credit]
+            with patch.object(sys, 'argv', testargs):
+                app = importer.ImporterApp()
+                metrics = app.import_paths([credit])
+            app._db.connection.close()
+            self.assertEqual(metrics.rules_applied, 2)
+            with open(metrics_path) as f:
+                self.assertEqual(json.loads(f.readline())['totals']['rules_applied'], 2)
+            self.assertIn('2 categorized by rules', format_summary(metrics))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from budgy.core import formats
+from budgy.core.database import BudgyDatabase
+from budgy.core.journal import merge_sources
+from budgy.core.sources import iter_sources
+
+BANK_CSV = '''Date,Description,Amount
+09/01/2023,COFFEE,-4.50
+09/02/2023,REFUND,10.00
+09/03/2023,GROCERIES,-52.10
+09/04/2023,GAS,-40.00
+09/05/2023,PAYROLL,2500.00
+'''
+
+SAVINGS_CSV = '''Date,Description,Amount
+09/01/2023,INTEREST,1.25
+'''
+
+
+class JournalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.statements = os.path.join(self.tmpdir.name, 'statements')
+        os.makedirs(self.statements)
+        for name, text in (('checking.csv', BANK_CSV), ('savings.csv', SAVINGS_CSV)):
+            with open(os.path.join(self.statements, name), 'w') as f:
+                f.write(text)
+        self.db = BudgyDatabase(os.path.join(self.tmpdir.name, 'journal.db'))
+
+    def tearDown(self):
+        self.db.connection.close()
+        self.tmpdir.cleanup()
+
+    def _crash_after(self, chunks):
+        merge_records = self.db.merge_records
+        calls = []
+
+        def crashing_merge(records, commit=True, **kwargs):
+            if len(calls) == chunks:
+                raise RuntimeError('power cut')
+            calls.append(len(records))
+            return merge_records(records, commit, **kwargs)
+        return crashing_merge
+
+    def test_resume(self):
+        sources = list(iter_sources(self.statements))
+        with patch.object(self.db, 'merge_records', self._crash_after(2)):
+            with self.assertRaises(RuntimeError):
+                list(merge_sources(self.db, sources, chunk_size=2, jobs=1))
+        # two committed chunks, nothing of the third
+        self.assertEqual(self.db.count_records(), 4)
+        checking = sources[0].name
+        size, mtime, records, complete = self.db.get_import_progress(checking)
+        self.assertEqual((records, complete), (4, False))
+
+        merged = [(source.name, len(records)) for source, records, result
+                  in merge_sources(self.db, sources, chunk_size=2, jobs=1)]
+        self.assertEqual(merged, [(checking, 1), (sources[1].name, 1)])
+        self.assertEqual(self.db.count_records(), 6)
+        self.assertIsNone(self.db.get_import_progress(checking))
+
+    def test_coverage_once_per_source(self):
+        sources = list(iter_sources(self.statements))
+        list(merge_sources(self.db, sources, chunk_size=2, jobs=1))
+        rows = self.db.execute(f'SELECT account_id, first_posted, last_posted, records '
+                               f'FROM {self.db.IMPORT_TABLE_NAME} ORDER BY records').fetchall()
+        self.assertEqual([row[3] for row in rows], [1, 5])
+        checking = rows[1]
+        self.assertEqual(self.db.get_coverage(checking[0]), [(checking[1], checking[2])])
+        self.assertEqual(checking[1][:10], '2023-09-01')
+        self.assertEqual(checking[2][:10], '2023-09-05')
+
+    def test_skip_bad_source(self):
+        with open(os.path.join(self.statements, 'random.csv'), 'w') as f:
+            f.write('a,b,c\n1,2,3\n')
+        errors = []
+        merged = list(merge_sources(self.db, iter_sources(self.statements), chunk_size=2, jobs=1, errors=errors))
+        self.assertEqual([os.path.basename(source.name) for source, error in errors], ['random.csv'])
+        self.assertEqual(len(merged), 4)
+        self.assertEqual(self.db.count_records(), 6)
+
+    def test_skip_complete_source(self):
+        sources = list(iter_sources(self.statements))
+        with patch.object(self.db, 'merge_records', self._crash_after(1)):
+            with self.assertRaises(RuntimeError):
+                list(merge_sources(self.db, sources, chunk_size=5, jobs=1))
+        self.assertTrue(self.db.get_import_progress(sources[0].name)[3])
+        with patch('budgy.core.formats.iter_record_chunks', wraps=formats.iter_record_chunks) as mock_parse:
+            merged = list(merge_sources(self.db, sources, chunk_size=5, jobs=1))
+        # the completed statement is not parsed again
+        self.assertEqual([call.args[0] for call in mock_parse.call_args_list], [sources[1].path])
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(self.db.count_records(), 6)
+
+    def test_changed_file_restarts(self):
+        sources = list(iter_sources(self.statements))
+        with patch.object(self.db, 'merge_records', self._crash_after(1)):
+            with self.assertRaises(RuntimeError):
+                list(merge_sources(self.db, sources, chunk_size=2, jobs=1))
+        with open(sources[0].path, 'a') as f:
+            f.write('09/06/2023,BOOKS,-15.00\n')
+        merged = list(merge_sources(self.db, sources, chunk_size=2, jobs=1))
+        self.assertEqual(sum(len(records) for source, records, result in merged), 7)
+        self.assertEqual(self.db.count_records(), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.merchants import normalize_merchant_name, LRUCache
+from budgy.core.tests.helpers import DatabaseTestCase, make_record
+
+
+class MerchantsTestCase(DatabaseTestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize_merchant_name('SMART AND FINAL 530      SAN JO'), 'SMART AND FINAL')
+        self.assertEqual(normalize_merchant_name('SMART AND FINAL 531      SAN JO'), 'SMART AND FINAL')
+        self.assertEqual(normalize_merchant_name('PGA TOUR SUPERSTORE 1234 CUPERT'), 'PGA TOUR SUPERSTORE')
+        self.assertEqual(normalize_merchant_name('Amazon.com*TX0XQ7VP1     Amzn.c'), 'AMAZON.COM')
+        self.assertEqual(normalize_merchant_name('AMAZON.COM*MK1234'), 'AMAZON.COM')
+        self.assertEqual(normalize_merchant_name('FD *CA DMV 516 *SVC      800-77'), 'CA DMV')
+        self.assertEqual(normalize_merchant_name('SQ *BLUE BOTTLE COFFEE'), 'BLUE BOTTLE COFFEE')
+        self.assertEqual(normalize_merchant_name('POS PURCHASE WALMART #1234'), 'WALMART')
+        self.assertEqual(normalize_merchant_name('Check # 1566'), 'CHECK')
+        # the last word of a full length name may be truncated
+        self.assertEqual(normalize_merchant_name('PAYROLL MIDORI NISHIMURA ID90024'), 'PAYROLL MIDORI NISHIMURA')
+        self.assertEqual(normalize_merchant_name(''), '')
+        self.assertEqual(normalize_merchant_name(None), '')
+        # names that are nothing but numbers are kept as they are
+        self.assertEqual(normalize_merchant_name('12345'), '12345')
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        # 'b' was the least recently used
+        self.assertFalse('b' in cache)
+        self.assertTrue('a' in cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+
+    def test_merchant_ids(self):
+        db = BudgyDatabase(self.TEST_DB)
+        self.assertTrue(db.table_exists(db.MERCHANT_TABLE_NAME))
+        self.assertTrue(db.column_exists(db.TXN_TABLE_NAME, 'merchant'))
+        db.insert_record(make_record('SMART AND FINAL 530      SAN JO'))
+        db.insert_record(make_record('SMART AND FINAL 531      SAN JO'))
+        db.insert_record(make_record('NETFLIX.COM              NETFLI'))
+        merchant_id = db.get_merchant_id('SMART AND FINAL 999      SAN JO')
+        self.assertEqual(db.get_merchant_name(merchant_id), 'SMART AND FINAL')
+        records = db.all_records()
+        self.assertEqual(records[0]['merchant'], merchant_id)
+        self.assertEqual(records[1]['merchant'], merchant_id)
+        self.assertNotEqual(records[2]['merchant'], merchant_id)
+        self.assertEqual(len(db.get_merchant_list()), 2)
+
+        report = db.get_merchant_report()
+        self.assertEqual(report[0]['merchant'], merchant_id)
+        self.assertEqual(report[0]['count'], 2)
+        self.assertAlmostEqual(report[0]['total'], 20.0)
+
+        updated = db.categorize_merchant(merchant_id, 'Groceries / Food')
+        self.assertEqual(updated, 2)
+        category = db.get_category_for_fitid(records[0]['fitid'])
+        self.assertEqual(category[0], 'Groceries / Food')
+        category = db.get_category_for_fitid(records[2]['fitid'])
+        self.assertEqual(category[0], db.DEFAULT_CATEGORY)
+
+    def test_merchant_rules(self):
+        db = BudgyDatabase(self.TEST_DB)
+        netflix_id = db.get_merchant_id('NETFLIX.COM')
+        db.add_merchant_rule(netflix_id, 'Entertainment', 'Video Streaming')
+        db.insert_record(make_record('NETFLIX.COM              NETFLI'))
+        db.insert_record(make_record('LUCKY #757 SAN JOSE      SAN JO'))
+        self.assertEqual(db.apply_merchant_rules(), 1)
+        records = db.all_records()
+        self.assertEqual(db.get_category_for_fitid(records[0]['fitid'])[:2], ['Entertainment', 'Video Streaming'])
+        self.assertEqual(db.get_category_for_fitid(records[1]['fitid'])[0], db.DEFAULT_CATEGORY)
+        with self.assertRaises(Exception):
+            db.add_merchant_rule(netflix_id, 'No Such Category')
+
+    def test_rules_on_merge(self):
+        db = BudgyDatabase(self.TEST_DB)
+        db.insert_record(make_record('NETFLIX.COM              NETFLI', posted='2023-08-01'))
+        db.add_merchant_rule(db.get_merchant_id('NETFLIX.COM'), 'Entertainment', 'Video Streaming')
+        result = db.merge_records([make_record('NETFLIX.COM              NETFLI'),
+                                   make_record('LUCKY #757 SAN JOSE      SAN JO', amount=-20.0)])
+        # only the merged records are categorized, older ones are left to apply_merchant_rules
+        self.assertEqual(result['rules_applied'], 1)
+        records = db.all_records()
+        self.assertEqual(db.get_category_for_fitid(records[0]['fitid'])[0], db.DEFAULT_CATEGORY)
+        self.assertEqual(db.get_category_for_fitid(records[1]['fitid'])[:2], ['Entertainment', 'Video Streaming'])
+        self.assertEqual(db.get_category_for_fitid(records[2]['fitid'])[0], db.DEFAULT_CATEGORY)
+        self.assertEqual(db.merge_records([make_record('NETFLIX.COM              NETFLI')])['rules_applied'], 0)
+
+    def test_migration(self):
+        db = BudgyDatabase(self.TEST_DB)
+        db.insert_record(make_record('SMART AND FINAL 530      SAN JO'))
+        # simulate a database from before merchants existed
+        db.execute(f'UPDATE {db.TXN_TABLE_NAME} SET merchant = NULL')
+        db.connection.commit()
+        db.connection.close()
+        db = BudgyDatabase(self.TEST_DB)
+        records = db.all_records()
+        self.assertEqual(records[0]['merchant'], db.get_merchant_id('SMART AND FINAL'))
+
+
+if __name__ == '__main__':
+    unittest.main()
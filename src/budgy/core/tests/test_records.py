@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.records import RecordFilter, PagedRecords, parse_date
+from budgy.core.synthetic import SyntheticLedger, create_database
+
+
+class RecordsTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.database = create_database(os.path.join(cls.tmpdir.name, 'records.db'), SyntheticLedger(1200, seed=3))
+        cls.records = cls.database.all_records()
+        cls.categories = cls.database.get_catetory_dict()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.connection.close()
+        cls.tmpdir.cleanup()
+
+    def category_ids(self, **match):
+        return {info['id'] for category, subcategories in self.categories.items()
+                for subcategory, info in subcategories.items()
+                if all({'name': category, 'subcategory': subcategory, **info}[k] == v for k, v in match.items())}
+
+    def assert_filter(self, record_filter, expected):
+        fitids = [r['fitid'] for r in self.database.filter_records(record_filter, len(self.records) + 1)]
+        self.assertEqual(sorted(fitids), sorted(r['fitid'] for r in expected))
+        self.assertEqual(self.database.count_filtered_records(record_filter), len(expected))
+
+    def test_filters(self):
+        self.assert_filter(RecordFilter(), self.records)
+        self.assert_filter(RecordFilter(account='VISA-0003'),
+                           [r for r in self.records if r['account'] == 'VISA-0003'])
+        self.assert_filter(RecordFilter(account='NO-SUCH-ACCOUNT'), [])
+        self.assert_filter(RecordFilter(min_amount=-50, max_amount=-10),
+                           [r for r in self.records if -50 <= r['amount'] <= -10])
+        ids = self.category_ids(name='Shopping')
+        self.assertGreater(len(ids), 0)
+        self.assert_filter(RecordFilter(category='Shopping'), [r for r in self.records if r['category'] in ids])
+        subcategory = next(iter(self.categories['Shopping']))
+        ids = self.category_ids(subcategory=subcategory)
+        self.assert_filter(RecordFilter(subcategory=subcategory), [r for r in self.records if r['category'] in ids])
+        self.assertLess(self.database.count_filtered_records(RecordFilter(subcategory=subcategory)), len(self.records))
+        ids = self.category_ids(expense_type=BudgyDatabase.RECURRING_EXPENSE_TYPE)
+        self.assert_filter(RecordFilter(expense_type=BudgyDatabase.RECURRING_EXPENSE_TYPE),
+                           [r for r in self.records if r['category'] in ids])
+        self.assert_filter(RecordFilter(start='2020-02-01', end='2020-02-29'),
+                           [r for r in self.records if r['posted'][:7] == '2020-02'])
+
+    def test_sort(self):
+        page = self.database.filter_records(RecordFilter(sort='amount'), 50)
+        self.assertEqual([r['amount'] for r in page], sorted(r['amount'] for r in self.records)[:50])
+        page = self.database.filter_records(RecordFilter(sort='amount', descending=True), 50)
+        self.assertEqual([r['amount'] for r in page], sorted((r['amount'] for r in self.records), reverse=True)[:50])
+        page = self.database.filter_records(RecordFilter(), len(self.records))
+        self.assertEqual([r['posted'] for r in page], sorted(r['posted'] for r in self.records))
+        with self.assertRaises(ValueError):
+            RecordFilter(sort='name')
+
+    def test_paging(self):
+        record_filter = RecordFilter(account='CHK-0001', sort='amount', descending=True)
+        expected = self.database.filter_records(record_filter, len(self.records))
+        # reading forward continues from the previous page, jumping around uses OFFSET
+        paged = PagedRecords(self.database, record_filter, page_size=37, max_pages=3)
+        self.assertEqual(len(paged), len(expected))
+        self.assertEqual(list(paged), expected)
+        jumping = PagedRecords(self.database, record_filter, page_size=37, max_pages=3)
+        for index in (len(expected) - 1, 5, len(expected) // 2, 74, 73):
+            self.assertEqual(jumping[index], expected[index])
+        self.assertEqual(jumping[-1], expected[-1])
+        self.assertEqual(jumping[10:15], expected[10:15])
+        with self.assertRaises(IndexError):
+            jumping[len(expected)]
+
+    def test_index_of_date(self):
+        for record_filter in (RecordFilter(), RecordFilter(descending=True), RecordFilter(account='SAV-0002')):
+            paged = PagedRecords(self.database, record_filter, page_size=50)
+            expected = list(paged)
+            for date in ('2019-12-31', '2020-03-01', '2020-03-17', '2099-01-01'):
+                index = paged.index_of_date(date)
+                if record_filter.descending:
+                    self.assertTrue(all(r['posted'][:10] > date for r in expected[:index]))
+                    self.assertTrue(all(r['posted'][:10] <= date for r in expected[index:]))
+                else:
+                    self.assertTrue(all(r['posted'][:10] < date for r in expected[:index]))
+                    self.assertTrue(all(r['posted'][:10] >= date for r in expected[index:]))
+        with self.assertRaises(ValueError):
+            PagedRecords(self.database, RecordFilter(sort='amount')).index_of_date('2020-03-01')
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date('2021-04'), '2021-04-01')
+        self.assertEqual(parse_date(' 2021-04-15 '), '2021-04-15')
+        for text in ('2021-13', '2021-04-31', 'April', ''):
+            with self.assertRaises(ValueError):
+                parse_date(text)
+
+    def test_update_categories(self):
+        paged = PagedRecords(self.database, page_size=10)
+        fitid = paged[3]['fitid']
+        paged.update_categories([fitid], 42)
+        self.assertEqual(paged[3]['category'], 42)
+        paged.refresh()
+        self.assertNotEqual(paged[3]['category'], 42)
+
+
+if __name__ == '__main__':
+    unittest.main()
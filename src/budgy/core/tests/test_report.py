@@ -0,0 +1,89 @@
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from budgy.core import report
+from budgy.core.database import BudgyDatabase
+
+
+class ReportTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def _create_db(self, db_path):
+        with open(os.path.join(self.DATADIR, 'checking001.json')) as f:
+            test_records = json.loads(f.read())
+        db = BudgyDatabase(db_path)
+        db.merge_records(test_records)
+        db.connection.close()
+
+    def _run(self, *args):
+        testargs = ['prog', '--db', self.db_path, '--log-dir', self.tmpdir.name] + list(args)
+        with patch.object(sys, 'argv', testargs):
+            app = report.ReportApp()
+            with patch('sys.stdout', new=io.StringIO()) as fake_out:
+                app.run()
+                return fake_out.getvalue()
+
+    def test_json(self):
+        data = json.loads(self._run('--format', 'json'))
+        self.assertIn('2023', data['summary'])
+        self.assertEqual(len(data['summary']['2023']['months']), 12)
+        self.assertGreater(len(data['categories']), 0)
+        self.assertGreater(data['categories'][0]['total'], 0)
+
+    def test_csv(self):
+        output = self._run('--report', 'summary', '--format', 'csv')
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(rows[0], report.SUMMARY_COLUMNS)
+        self.assertEqual(rows[1][0], '2023')
+
+    def test_text(self):
+        output = self._run('--report', 'categories', '--year', '2023', '--month', '9')
+        self.assertTrue(output.startswith('Category'))
+        self.assertIn('No Category', output)
+        output = self._run('--report', 'categories', '--year', '1999')
+        self.assertEqual(len(output.splitlines()), 1)
+
+    def test_report_delta(self):
+        db = BudgyDatabase(self.db_path)
+        report_data = db.get_report()
+        record = [r for r in db.all_records() if r['amount'] < 0][0]
+        for category, expense_type in (('Groceries / Food', 2), ('Transfer', 0)):
+            old_expense_type = db.get_category_for_fitid(record['fitid'])[2]
+            db.set_txn_category(record['fitid'], category, '')
+            delta = BudgyDatabase.report_delta(record['posted'], record['amount'], old_expense_type, expense_type)
+            if delta is not None:
+                self.assertTrue(BudgyDatabase.apply_report_delta(report_data, *delta))
+            expected = db.get_report()
+            for year in expected:
+                for field in ('minimum', 'maximum', 'average'):
+                    self.assertAlmostEqual(report_data[year][field], expected[year][field])
+                for month, expense in enumerate(expected[year]['months']):
+                    self.assertAlmostEqual(report_data[year]['months'][month], expense)
+        self.assertIsNone(BudgyDatabase.report_delta(record['posted'], 10.0, 0, 2))
+        self.assertIsNone(BudgyDatabase.report_delta(record['posted'], -10.0, 1, 2))
+        self.assertFalse(BudgyDatabase.apply_report_delta(report_data, '1999', 0, 10.0))
+        db.connection.close()
+
+    def test_missing_db(self):
+        testargs = ['prog', '--db', os.path.join(self.tmpdir.name, 'missing.db'), '--log-dir', self.tmpdir.name]
+        with patch.object(sys, 'argv', testargs), patch('sys.stderr', new=io.StringIO()):
+            with self.assertRaises(SystemExit):
+                report.ReportApp()
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, 'report.db')
+        self._create_db(self.db_path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import bz2
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from concurrent.futures import Future
+from unittest.mock import patch
+
+from budgy.core import load_ofx_file
+from budgy.core.database import BudgyDatabase
+from budgy.core.sources import iter_sources, iter_source_chunks, StatementSource
+
+BANK_CSV = '''Date,Description,Amount
+09/01/2023,COFFEE,-4.50
+09/02/2023,REFUND,10.00
+'''
+
+
+class SourcesTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        root = self.tmpdir.name
+        self.checking = os.path.join(self.DATADIR, 'checking.qfx')
+        self.credit = os.path.join(self.DATADIR, 'credit.qfx')
+        self.statements = os.path.join(root, 'statements')
+        os.makedirs(os.path.join(self.statements, '2023', 'september'))
+        shutil.copy(self.checking, os.path.join(self.statements, '2023', 'september', 'checking.qfx'))
+        with open(os.path.join(self.statements, 'notes.txt'), 'w') as f:
+            f.write('not a statement')
+        with zipfile.ZipFile(os.path.join(self.statements, 'archive.zip'), 'w') as archive:
+            archive.write(self.credit, 'cards/credit.qfx')
+            archive.writestr('mybank.csv', BANK_CSV)
+            archive.writestr('readme.txt', 'skipped')
+        with open(self.credit, 'rb') as src, gzip.open(os.path.join(self.statements, 'credit.qfx.gz'), 'wb') as dst:
+            dst.write(src.read())
+        with tarfile.open(os.path.join(root, 'old.tar.gz'), 'w:gz') as archive:
+            archive.add(self.checking, 'checking.qfx')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_iter_sources(self):
+        sources = list(iter_sources(self.statements))
+        names = [os.path.relpath(source.name, self.statements) for source in sources]
+        self.assertEqual(names, [
+            os.path.join('2023', 'september', 'checking.qfx'),
+            os.path.join('archive.zip', 'cards', 'credit.qfx'),
+            os.path.join('archive.zip', 'mybank.csv'),
+            'credit.qfx'
+        ])
+        self.assertEqual([source.kind for source in sources],
+                         [StatementSource.FILE, StatementSource.ZIP, StatementSource.ZIP, StatementSource.GZIP])
+        self.assertEqual(list(iter_sources(self.statements, recursive=False))[0].kind, StatementSource.ZIP)
+
+        tar_sources = list(iter_sources(os.path.join(self.tmpdir.name, 'old.tar.gz')))
+        self.assertEqual(len(tar_sources), 1)
+        self.assertEqual(tar_sources[0].load_records(), load_ofx_file(self.checking))
+
+    def test_compressed_statements(self):
+        expected = load_ofx_file(self.credit)
+        for suffix, compress, kind in (('.bz2', bz2.compress, StatementSource.BZIP2),
+                                       ('.xz', lzma.compress, StatementSource.XZ)):
+            path = os.path.join(self.tmpdir.name, f'statement.qfx{suffix}')
+            with open(self.credit, 'rb') as src, open(path, 'wb') as dst:
+                dst.write(compress(src.read()))
+            sources = list(iter_sources(path))
+            self.assertEqual([source.kind for source in sources], [kind])
+            self.assertEqual(sources[0].name, path[:-len(suffix)])
+            self.assertEqual(sources[0].load_records(), expected)
+
+    def test_tar_read_once(self):
+        path = os.path.join(self.tmpdir.name, 'statements.tar.gz')
+        with tarfile.open(path, 'w:gz') as archive:
+            archive.add(self.credit, 'b/credit.qfx')
+            info = tarfile.TarInfo('a/mybank.csv')
+            info.size = len(BANK_CSV)
+            archive.addfile(info, io.BytesIO(BANK_CSV.encode()))
+            archive.add(self.checking, 'a/checking.qfx')
+        with patch('budgy.core.sources.tarfile.open', wraps=tarfile.open) as mock_open:
+            sources = list(iter_sources(path))
+            # members in archive order, their sizes come from the listing
+            self.assertEqual([source.member for source in sources], ['b/credit.qfx', 'a/mybank.csv', 'a/checking.qfx'])
+            self.assertEqual(sources[1].size, len(BANK_CSV))
+            chunks = list(iter_source_chunks(sources, jobs=1))
+            self.assertEqual(mock_open.call_count, 1)
+        self.assertEqual([records for source, records in chunks if source is sources[0]], [load_ofx_file(self.credit)])
+        self.assertEqual(sum(len(records) for source, records in chunks if source is sources[1]), 2)
+        parallel = [(source.name, records) for source, records in iter_source_chunks(iter_sources(path), jobs=2)]
+        self.assertEqual(parallel, [(source.name, records) for source, records in chunks])
+
+    def test_skip_bad_sources(self):
+        with open(os.path.join(self.statements, 'random.csv'), 'w') as f:
+            f.write('a,b,c\n1,2,3\n')
+        with open(os.path.join(self.statements, 'broken.zip'), 'wb') as f:
+            f.write(b'not a zip file')
+        with self.assertRaises(Exception):
+            list(iter_sources(self.statements))
+        errors = []
+        sources = list(iter_sources(self.statements, errors=errors))
+        self.assertEqual([os.path.basename(source.name) for source, error in errors], ['broken.zip'])
+        for jobs in (1, 2):
+            errors = []
+            parsed = [source.name for source, records in iter_source_chunks(sources, jobs=jobs, errors=errors)]
+            self.assertEqual([os.path.basename(source.name) for source, error in errors], ['random.csv'])
+            self.assertEqual(len(parsed), len(sources) - 1)
+        with self.assertRaises(ValueError):
+            list(iter_source_chunks(sources, jobs=1))
+
+    def test_parallel_parse(self):
+        sources = list(iter_sources(self.statements))
+        serial = [(source.name, records) for source, records in iter_source_chunks(sources, jobs=1)]
+        parallel = [(source.name, records) for source, records in iter_source_chunks(sources, jobs=2)]
+        self.assertEqual(serial, parallel)
+        csv_records = [records for name, records in serial if name.endswith('mybank.csv')][0]
+        self.assertEqual(csv_records[0]['account'], 'mybank')
+        self.assertEqual(csv_records[0]['amount'], -4.5)
+
+        db = BudgyDatabase(os.path.join(self.tmpdir.name, 'sources.db'))
+        for name, records in serial[:-1]:
+            db.merge_records(records)
+        nrecords = db.count_records()
+        self.assertGreater(nrecords, 2)
+        # the gzip copy of credit.qfx adds nothing
+        name, records = serial[-1]
+        self.assertTrue(name.endswith('credit.qfx'))
+        db.merge_records(records)
+        self.assertEqual(db.count_records(), nrecords)
+        db.connection.close()
+
+    def test_bounded_pool(self):
+        for i in range(5):
+            shutil.copy(self.checking, os.path.join(self.statements, f'checking{i}.qfx'))
+        sources = list(iter_sources(self.statements))
+        submitted = []
+        in_flight = []
+
+        class Job(Future):
+            def result(self, timeout=None):
+                in_flight.remove(self)
+                return super().result(timeout)
+
+        class Pool(object):
+            """Runs the jobs at once, remembering the ones whose results were not read yet"""
+            def __init__(self, max_workers):
+                self.max_workers = max_workers
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def submit(self, function, args):
+                submitted.append(args[0].name)
+                job = Job()
+                job.set_result(function(args))
+                in_flight.append(job)
+                assert len(in_flight) <= self.max_workers
+                return job
+
+        with patch('budgy.core.sources.ProcessPoolExecutor', Pool):
+            parallel = [(source.name, records) for source, records in iter_source_chunks(sources, 3, jobs=2)]
+        serial = [(source.name, records) for source, records in iter_source_chunks(sources, 3, jobs=1)]
+        self.assertEqual(parallel, serial)
+        self.assertEqual(in_flight, [])
+        # the CSV statement is streamed in process, only the OFX statements go to the pool
+        self.assertEqual(submitted, [source.name for source in sources if not source.name.endswith('.csv')])
+
+if __name__ == '__main__':
+    unittest.main()
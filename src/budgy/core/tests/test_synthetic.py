@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from budgy.core import load_ofx_file
+from budgy.core.database import BudgyDatabase
+from budgy.core.synthetic import SyntheticLedger, create_database, write_statements
+
+
+class SyntheticTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ledger(self):
+        records = SyntheticLedger(1500, seed=7).records()
+        self.assertEqual(len(records), 1500)
+        self.assertEqual(records, SyntheticLedger(1500, seed=7).records())
+        self.assertNotEqual(records, SyntheticLedger(1500, seed=8).records())
+        self.assertEqual({r['account'] for r in records}, {'CHK-0001', 'SAV-0002', 'VISA-0003'})
+        self.assertEqual(len({(r['account'], r['fitid']) for r in records}), len(records))
+        # both sides of every credit card payment
+        paid = sorted(-r['amount'] for r in records if r['name'] == 'TRANSFER TO VISA-0003')
+        received = sorted(r['amount'] for r in records if r['account'] == 'VISA-0003' and r['type'] == 'XFER')
+        self.assertEqual(paid, received)
+        self.assertGreater(len(paid), 0)
+
+    def test_statements(self):
+        ledger = SyntheticLedger(600, seed=1, months=3)
+        paths = write_statements(os.path.join(self.tmpdir.name, 'statements'), ledger, overlap_days=5)
+        self.assertEqual(len(paths), 9)
+        loaded = [record for path in paths for record in load_ofx_file(path)]
+        generated = [{k: v for k, v in record.items() if k != 'fitid'} for record in ledger.records()]
+        keys = {tuple(sorted(record.items())) for record in loaded}
+        self.assertEqual(keys, {tuple(sorted(record.items())) for record in generated})
+        # the overlapping days are in two statements
+        self.assertGreater(len(loaded), len(generated))
+
+        database = create_database(os.path.join(self.tmpdir.name, 'synthetic.db'), ledger)
+        self.assertEqual(database.count_records(), 600)
+        default_category = database.get_category_id(BudgyDatabase.DEFAULT_CATEGORY, BudgyDatabase.EMPTY_SUBCATEGORY)
+        categorized = database.execute('SELECT COUNT(*) FROM transactions WHERE category != ?',
+                                       (default_category,)).fetchone()[0]
+        self.assertGreater(categorized, 300)
+        # importing the statements into the database finds nothing new
+        result = database.merge_records(loaded)
+        self.assertEqual(result['merged'], 0)
+        self.assertEqual(database.count_records(), 600)
+        database.connection.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.transfers import find_transfer_pairs, format_transfer_pair
+from budgy.core.tests.helpers import DatabaseTestCase, make_record
+
+
+class TransfersTestCase(DatabaseTestCase):
+    def test_find_pairs(self):
+        records = [
+            make_record('Tfr', -500.0, '2023-09-05', account='CHK', fitid=1),
+            make_record('Tfr', 500.0, '2023-09-07', account='CC', fitid=2),
+            # same account is never a transfer
+            make_record('Tfr', -42.0, '2023-09-05', account='CHK', fitid=3),
+            make_record('Tfr', 42.0, '2023-09-06', account='CHK', fitid=4),
+            # too far apart
+            make_record('Tfr', -75.0, '2023-09-01', account='CHK', fitid=5),
+            make_record('Tfr', 75.0, '2023-09-20', account='SAV', fitid=6),
+            # two transfers of the same amount are each matched once
+            make_record('Tfr', -100.0, '2023-10-01', account='CHK', fitid=7),
+            make_record('Tfr', -100.0, '2023-10-02', account='CHK', fitid=8),
+            make_record('Tfr', 100.0, '2023-10-02', account='SAV', fitid=9),
+            make_record('Tfr', 100.0, '2023-10-03', account='SAV', fitid=10),
+        ]
+        pairs = find_transfer_pairs(records, window_days=3)
+        matched = sorted((p['withdrawal']['fitid'], p['deposit']['fitid']) for p in pairs)
+        self.assertEqual(matched, [(1, 2), (7, 9), (8, 10)])
+        self.assertEqual(pairs[0]['amount'], 500.0)
+        self.assertEqual(pairs[0]['days'], 2)
+        self.assertIn('CHK -> CC', format_transfer_pair(pairs[0]))
+
+        # deposit posted before the withdrawal
+        pairs = find_transfer_pairs([make_record('Tfr', 20.0, '2023-09-01', account='CC', fitid=1),
+                                     make_record('Tfr', -20.0, '2023-09-02', account='CHK', fitid=2)])
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(pairs[0]['withdrawal']['fitid'], 2)
+
+    def test_assign_transfers(self):
+        db = BudgyDatabase(self.TEST_DB)
+        db.insert_record(make_record('Tfr to ***6996', -500.0, '2023-09-05', account='CHK'))
+        db.insert_record(make_record('PAYMENT THANK YOU', 500.0, '2023-09-06', account='CC'))
+        db.insert_record(make_record('COFFEE', -12.0, '2023-09-06', account='CHK'))
+        pairs = db.find_transfers()
+        self.assertEqual(len(pairs), 1)
+        self.assertEqual(db.assign_transfers(pairs), 2)
+        records = sorted(db.all_records(), key=lambda r: r['fitid'])
+        self.assertEqual(db.get_category_for_fitid(records[0]['fitid'])[0], db.TRANSFER_CATEGORY)
+        self.assertEqual(db.get_category_for_fitid(records[1]['fitid'])[0], db.TRANSFER_CATEGORY)
+        self.assertEqual(db.get_category_for_fitid(records[2]['fitid'])[0], db.DEFAULT_CATEGORY)
+        # once assigned there is nothing left to review
+        self.assertEqual(db.find_transfers(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
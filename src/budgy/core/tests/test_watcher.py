@@ -0,0 +1,128 @@
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from budgy.core import importer
+from budgy.core.watcher import FolderWatcher
+
+
+class WatcherTestCase(unittest.TestCase):
+    DATADIR = os.path.join(os.path.dirname(__file__), 'testdata')
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = os.path.join(self.tmpdir.name, 'downloads')
+        os.makedirs(self.folder)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_poll(self):
+        watcher = FolderWatcher(self.folder, settle_seconds=5)
+        self.assertEqual(watcher.poll(now=0), [])
+        path = os.path.join(self.folder, 'credit.qfx')
+        with open(path, 'w') as f:
+            f.write('<OFX>')
+        with open(os.path.join(self.folder, 'notes.txt'), 'w') as f:
+            f.write('not a statement')
+        self.assertEqual(watcher.poll(now=1), [])
+        # still being written: the settle clock starts again
+        with open(path, 'a') as f:
+            f.write('<BANKMSGSRSV1>')
+        self.assertEqual(watcher.poll(now=4), [])
+        self.assertEqual(watcher.poll(now=8), [])
+        ready = watcher.poll(now=9)
+        self.assertEqual([p for p, signature in ready], [path])
+        self.assertEqual(ready[0][1][0], os.path.getsize(path))
+        # reported once
+        self.assertEqual(watcher.poll(now=20), [])
+        os.remove(path)
+        self.assertEqual(watcher.poll(now=21), [])
+
+    def test_file_gone_during_scan(self):
+        paths = [os.path.join(self.folder, name) for name in ('a.qfx', 'c.qfx')]
+        for path in paths:
+            with open(path, 'w') as f:
+                f.write('<OFX>')
+        # listed by scandir, but stat() finds nothing, like a file deleted in the middle of a scan
+        try:
+            os.symlink(os.path.join(self.folder, 'missing.qfx'), os.path.join(self.folder, 'b.qfx'))
+        except (OSError, NotImplementedError):
+            self.skipTest('symbolic links are not available')
+        scandir = os.scandir
+
+        @contextlib.contextmanager
+        def sorted_scandir(path):
+            # b.qfx comes before c.qfx
+            with scandir(path) as it:
+                yield iter(sorted(it, key=lambda entry: entry.name))
+
+        watcher = FolderWatcher(self.folder, settle_seconds=5)
+        with patch('budgy.core.watcher.os.scandir', sorted_scandir):
+            self.assertEqual(watcher.poll(now=0), [])
+            self.assertEqual([path for path, signature in watcher.poll(now=5)], paths)
+
+    def test_watch_import(self):
+        db_path = os.path.join(self.tmpdir.name, 'watch.db')
+        shutil.copy(os.path.join(self.DATADIR, 'credit.qfx'), self.folder)
+        testargs = ['prog', '--log-dir', self.tmpdir.name, '--cache-dir', self.tmpdir.name, '--db', db_path,
+                    '--watch', self.folder, '--settle', '0', '--poll-interval', '0']
+        with patch.object(sys, 'argv', testargs):
+            app = importer.ImporterApp()
+        app.watch_folder(self.folder, max_polls=2)
+        nrecords = app._db.count_records()
+        self.assertGreater(nrecords, 0)
+        path = os.path.join(self.folder, 'credit.qfx')
+        stat = os.stat(path)
+        self.assertTrue(app._db.is_file_imported(path, stat.st_size, stat.st_mtime_ns))
+
+        # a new watcher skips files in the manifest
+        with patch.object(app, 'import_paths') as mock_import:
+            app.watch_folder(self.folder, max_polls=2)
+            mock_import.assert_not_called()
+        shutil.copy(os.path.join(self.DATADIR, 'checking.qfx'), self.folder)
+        with patch.object(app, 'import_paths') as mock_import:
+            app.watch_folder(self.folder, max_polls=2)
+            mock_import.assert_called_once_with([os.path.join(self.folder, 'checking.qfx')])
+        app._db.connection.close()
+
+    def test_watch_skips_bad_files(self):
+        db_path = os.path.join(self.tmpdir.name, 'watch.db')
+        shutil.copy(os.path.join(self.DATADIR, 'credit.qfx'), self.folder)
+        junk = os.path.join(self.folder, 'random.csv')
+        with open(junk, 'w') as f:
+            f.write('name,size\nphoto.jpg,1234\n')
+        testargs = ['prog', '--log-dir', self.tmpdir.name, '--cache-dir', self.tmpdir.name, '--db', db_path,
+                    '--watch', self.folder, '--settle', '0', '--poll-interval', '0']
+        with patch.object(sys, 'argv', testargs):
+            app = importer.ImporterApp()
+        app.watch_folder(self.folder, max_polls=2)
+        self.assertGreater(app._db.count_records(), 0)
+        path = os.path.join(self.folder, 'credit.qfx')
+        stat = os.stat(path)
+        self.assertTrue(app._db.is_file_imported(path, stat.st_size, stat.st_mtime_ns))
+        stat = os.stat(junk)
+        self.assertFalse(app._db.is_file_imported(junk, stat.st_size, stat.st_mtime_ns))
+        # still polling: a statement that arrives later is imported
+        shutil.copy(os.path.join(self.DATADIR, 'checking.qfx'), self.folder)
+        with patch.object(app, 'import_paths', wraps=app.import_paths) as mock_import:
+            app.watch_folder(self.folder, max_polls=2)
+        self.assertIn(os.path.join(self.folder, 'checking.qfx'), mock_import.call_args.args[0])
+        path = os.path.join(self.folder, 'checking.qfx')
+        stat = os.stat(path)
+        self.assertTrue(app._db.is_file_imported(path, stat.st_size, stat.st_mtime_ns))
+        app._db.connection.close()
+
+    def test_datafiles_required(self):
+        testargs = ['prog', '--log-dir', self.tmpdir.name, '--db', os.path.join(self.tmpdir.name, 'x.db')]
+        with patch.object(sys, 'argv', testargs), patch.object(sys, 'stderr'):
+            with self.assertRaises(SystemExit):
+                importer.ImporterApp()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+Transfer detection for Budgy
+
+Money moved between two of your own accounts shows up as a withdrawal in one
+account and a deposit of the same amount in another a few days apart.
+find_transfer_pairs() matches those with a sort and sweep: records are sorted
+by (amount in cents, posted date) so the candidates for a match are always
+neighbours, which keeps matching O(n log n) instead of comparing every pair.
+"""
+import datetime
+from collections import deque
+from itertools import groupby
+from typing import Dict, List
+
+DEFAULT_WINDOW_DAYS = 3
+
+
+def _cents(record):
+    return int(round(abs(float(record['amount'])) * 100))
+
+
+def _posted_day(record):
+    return datetime.datetime.fromisoformat(record['posted']).date().toordinal()
+
+
+def find_transfer_pairs(records, window_days=DEFAULT_WINDOW_DAYS) -> List[Dict]:
+    """
+    Pair withdrawals with deposits of the same amount in a different account posted
+    within window_days of each other. Each record is used at most once.
+    :param records: dicts with at least 'account', 'posted' and 'amount'
+    :return: list of {'withdrawal', 'deposit', 'amount', 'days'} dicts ordered by withdrawal date
+    """
+    keyed = []
+    for record in records:
+        if record['amount'] is None or float(record['amount']) == 0:
+            continue
+        keyed.append((_cents(record), _posted_day(record), record))
+    keyed.sort(key=lambda k: (k[0], k[1]))
+
+    pairs = []
+    for cents, group in groupby(keyed, key=lambda k: k[0]):
+        # unmatched records of each sign that are still inside the window
+        pending = {True: deque(), False: deque()}
+        for _, day, record in group:
+            is_withdrawal = float(record['amount']) < 0
+            candidates = pending[not is_withdrawal]
+            while len(candidates) > 0 and day - candidates[0][0] > window_days:
+                candidates.popleft()
+            match = None
+            for candidate in candidates:
+                if candidate[1]['account'] != record['account']:
+                    match = candidate
+                    break
+            if match is None:
+                pending[is_withdrawal].append((day, record))
+                continue
+            candidates.remove(match)
+            withdrawal, deposit = (record, match[1]) if is_withdrawal else (match[1], record)
+            pairs.append({
+                'withdrawal': withdrawal,
+                'deposit': deposit,
+                'amount': cents / 100,
+                'days': day - match[0]
+            })
+    pairs.sort(key=lambda p: (p['withdrawal']['posted'], p['amount']))
+    return pairs
+
+
+def format_transfer_pair(pair) -> str:
+    withdrawal = pair['withdrawal']
+    deposit = pair['deposit']
+    return (f'{withdrawal["posted"][:10]} {pair["amount"]:10.2f} '
+            f'{withdrawal["account"]} -> {deposit["account"]} ({deposit["posted"][:10]}) '
+            f'| {withdrawal.get("name", "")} | {deposit.get("name", "")}')
@@ -0,0 +1,81 @@
+"""
+Watch folder polling for budgy-import --watch
+
+FolderWatcher.poll() scans a directory with os.scandir and keeps the size and
+modification time of every statement file it has seen. A file is only reported once
+it has kept the same size and mtime for settle_seconds, so downloads that are still
+being written are left alone. Between polls the importer just sleeps, so an idle
+watcher costs one directory scan per poll interval.
+"""
+import logging
+import os
+import time
+from typing import Dict, List, Tuple
+
+from budgy.core.formats import is_supported_file
+from budgy.core.sources import is_archive
+
+DEFAULT_POLL_INTERVAL = 10.0
+DEFAULT_SETTLE_SECONDS = 5.0
+
+
+def file_signature(stat_result) -> Tuple[int, int]:
+    """(size, mtime in ns) - a file with a different signature has changed"""
+    return stat_result.st_size, stat_result.st_mtime_ns
+
+
+class FolderWatcher(object):
+    def __init__(self, directory, settle_seconds=DEFAULT_SETTLE_SECONDS, recursive=True):
+        self.directory = os.fspath(directory)
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        # path -> (signature, time the signature was first seen)
+        self._seen: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        # path -> signature already handed out by poll()
+        self._reported: Dict[str, Tuple[int, int]] = {}
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found = {}
+        directories = [self.directory]
+        while len(directories) > 0:
+            try:
+                with os.scandir(directories.pop()) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            if self.recursive:
+                                directories.append(entry.path)
+                        elif is_supported_file(entry.path) or is_archive(entry.path):
+                            try:
+                                found[entry.path] = file_signature(entry.stat())
+                            except FileNotFoundError:
+                                # deleted or renamed since the directory was listed
+                                continue
+            except FileNotFoundError:
+                continue
+        return found
+
+    def poll(self, now=None) -> List[Tuple[str, Tuple[int, int]]]:
+        """
+        Files that are new or changed and have settled since the last poll.
+        :return: sorted list of (path, (size, mtime_ns))
+        """
+        now = time.monotonic() if now is None else now
+        found = self._scan()
+        ready = []
+        for path, signature in found.items():
+            seen = self._seen.get(path)
+            if seen is None or seen[0] != signature:
+                # new or still being written, start the settle clock again
+                self._seen[path] = (signature, now)
+                continue
+            if self._reported.get(path) == signature:
+                continue
+            if now - seen[1] >= self.settle_seconds:
+                ready.append((path, signature))
+                self._reported[path] = signature
+        for path in set(self._seen) - set(found):
+            del self._seen[path]
+            self._reported.pop(path, None)
+        if len(ready) > 0:
+            logging.debug(f'{len(ready)} files ready in {self.directory}')
+        return sorted(ready)
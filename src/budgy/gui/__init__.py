@@ -2,7 +2,6 @@ import logging
 import os
 
 from budgy.gui import configdata
-from budgy.gui import data_panel
 
 install_path = os.path.dirname(__file__)
 _data_dir = os.path.join(install_path, 'data')
@@ -19,8 +19,12 @@ class BgColorPanel(UIPanel):
                 'bottom': 'bottom', 'right': 'right'
             }
         )
+        self._color_str = None
         self.set_color(color_str)
 
     def set_color(self, color_str:str):
+        if color_str == self._color_str:
+            return
+        self._color_str = color_str
         color:pygame.Color = parse_colour_name(color_str)
         self.color_image.image.fill(color)
\ No newline at end of file
@@ -4,7 +4,6 @@ import pygame_gui
 from pygame_gui.elements import UIButton
 
 from budgy.core.database import BudgyDatabase
-from budgy.gui.category_dialog import CategoryDialog
 
 class CategoryButton(UIButton):
     def __init__(self,
@@ -61,6 +60,8 @@ class CategoryButton(UIButton):
             return True
         if event.type == pygame_gui.UI_BUTTON_PRESSED and event.ui_element == self:
             logging.debug(f'Category Button pressed for {self.fitid}')
+            # the dialog and its category panels are only loaded once a category is edited
+            from budgy.gui.category_dialog import CategoryDialog
             self.dialog = CategoryDialog(
                 self.fitid,
                 self.account,
@@ -74,7 +75,11 @@ class CategoryButton(UIButton):
 
     def set_category_text(self):
         category = self.database.get_category_for_fitid(self.fitid)
-        self.expense_type = category[2]
-        expense_marker = '*' if self.expense_type != BudgyDatabase.NON_EXPENSE_TYPE else ''
-        category_str = f'({category[2]}) {category[0]}' if category[1] == '' else f'({category[2]}) {category[0]} | {category[1]}'
-        self.set_text(category_str)
+        self.show_category(*category)
+
+    def show_category(self, category, subcategory, expense_type):
+        """Show a category that is already known, without reading it from the database"""
+        self.expense_type = expense_type
+        category_str = f'({expense_type}) {category}' if subcategory == '' else f'({expense_type}) {category} | {subcategory}'
+        if category_str != self.text:
+            self.set_text(category_str)
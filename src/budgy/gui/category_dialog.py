@@ -6,7 +6,7 @@ from pygame_gui.elements import UIWindow, UIPanel, UIButton
 from budgy.core.database import BudgyDatabase
 from budgy.gui.category_view_panel import CategoryViewPanel, SubcategoryViewPanel
 from budgy.gui.constants import BUTTON_HEIGHT, MARGIN, BUTTON_WIDTH
-from budgy.gui.events import CATEGORY_SELECTION_CHANGED, CATEGORY_CHANGED
+from budgy.gui.events import CATEGORY_SELECTION_CHANGED, category_changed_event
 
 
 class CategoryDialog(UIWindow):
@@ -215,16 +215,10 @@ class CategoryDialog(UIWindow):
             # TODO: Confirmation Dialog?
             logging.info(f'NEW CATEGORY for {self.fitid}|{self.account}|{self.posted}: {category} / {subcategory}')
             self.database.set_txn_category(self.fitid, category, subcategory)
-            event_data = {
-                'fitid': self.fitid,
-                'account': self.account,
-                'posted': self.posted,
-                'category': category,
-                'subcategory': subcategory,
-                'category_id': self.categories[category][subcategory]['id'],
-                'expense_type': self.categories[category][subcategory]['expense_type'],
-            }
-            pygame.event.post(pygame.event.Event(CATEGORY_CHANGED, event_data))
+            record = self.database.record_from_row(self.database.get_record_by_fitid(self.fitid))
+            pygame.event.post(category_changed_event(self.fitid, self.account, self.posted, record['amount'],
+                                                     category, subcategory, self.categories[category][subcategory],
+                                                     self.original_category[2]))
             self.kill()
         else:
             logging.debug('CATEGORY UNCHANGED')
@@ -13,9 +13,10 @@ from pygame_gui.elements import UIPanel, UIVerticalScrollBar, UILabel
 from budgy.core.database import BudgyDatabase
 from budgy.gui.db_record_view_panel import DbRecordView
 from budgy.gui.toggle_button import ToggleButton, TOGGLE_BUTTON
+from budgy.gui.scrolling import ScrollState
 
 from budgy.gui.constants import BUTTON_HEIGHT
-from budgy.gui.events import post_show_message, CATEGORY_SELECTION_CHANGED
+from budgy.gui.events import CATEGORY_SELECTION_CHANGED
 
 
 class CategoryView(DbRecordView):
@@ -152,6 +153,7 @@ class CategoryViewPanel(UIPanel):
         self.visible_records:int = 0
         self.setup_category_views()
         self.last_start_percent = 0
+        self._scrolling = ScrollState(self.scrollbar)
         self._selection = None
 
         self.starting_row = 0
@@ -228,20 +230,9 @@ class CategoryViewPanel(UIPanel):
     def process_event(self, event: pygame.event.Event) -> bool:
         event_consumed = super().process_event(event)
         if not event_consumed:
-            if event.type == pygame.MOUSEWHEEL:
-                # Trick the scrollbar into thinking it got the event
-                self.scrollbar.scroll_wheel_moved = True
-                self.scrollbar.scroll_wheel_amount = event.y
-                # forcing an update makes the scrolling smoother
-                self.scrollbar.update(0.01)
-
-            if self.scrollbar.has_moved_recently:
-                if self.scrollbar.start_percentage != self.last_start_percent:
-                    self.last_start_percent = self.scrollbar.start_percentage
-                    self.starting_row = math.ceil(len(self._data) * self.last_start_percent)
-                    self.render_data()
-                    last = min(self.starting_row + self.visible_records, len(self._data))
-                    post_show_message(f'Showing Records {self.starting_row} to {last} out of {len(self._data)}')
+            if event.type == pygame.MOUSEWHEEL and self.visible:
+                # applied once per frame in update()
+                self._scrolling.add_wheel(event.y)
                 event_consumed = True
 
             if False and event.type == CATEGORY_SELECTION_CHANGED:
@@ -250,6 +241,17 @@ class CategoryViewPanel(UIPanel):
                 self.render_data()
         return event_consumed
 
+    def update(self, time_delta: float):
+        super().update(time_delta)
+        self._scrolling.apply_wheel()
+        if self._data is not None and self.scrollbar.start_percentage != self.last_start_percent:
+            self.last_start_percent = self.scrollbar.start_percentage
+            self.starting_row = math.ceil(len(self._data) * self.last_start_percent)
+            self.render_data()
+            last = min(self.starting_row + self.visible_records, len(self._data))
+            self._scrolling.show_message(f'Showing Records {self.starting_row} to {last} out of {len(self._data)}')
+        self._scrolling.flush_message()
+
 class SubcategoryViewPanel(CategoryViewPanel):
     def __init__(self, database_path:Path, *args, **kwargs):
         super().__init__(database_path, *args, **kwargs)
@@ -5,7 +5,7 @@ from pathlib import Path
 import pygame
 import pygame_gui
 from pygame_gui.core import ObjectID
-from pygame_gui.elements import UIPanel, UIButton
+from pygame_gui.elements import UIPanel, UIButton, UITextEntryLine
 from pygame_gui.windows.ui_message_window import UIMessageWindow
 from pygame_gui.windows.ui_confirmation_dialog import UIConfirmationDialog
 
@@ -13,9 +13,13 @@ import budgy.gui
 from budgy.gui.constants import MARGIN, BUTTON_HEIGHT, BUTTON_WIDTH
 from budgy.gui.dialogs import show_confirmation_dialog, show_file_dialog, is_confirmation_dialog, is_file_dialog
 import budgy.gui.events
+from budgy.gui.filter_bar import RecordFilterBar
 from budgy.gui.function_subpanel import BudgyFunctionSubPanel
 from budgy.gui.record_view_panel import RecordViewPanel
 from budgy.gui.configdata import BudgyConfig
+from budgy.core.database import BudgyDatabase
+from budgy.core.records import RecordFilter, PagedRecords, parse_date
+from budgy.core.sources import supported_suffixes
 
 CONFIRM_IMPORT_TITLE = 'Confirm Import'
 CONFIRM_DELETE_ALL_TITLE = 'Confirm Delete All Data'
@@ -39,7 +43,7 @@ def is_import_file_dialog(element):
 def show_import_data_file_dialog(initial_path):
     show_file_dialog(IMPORT_FILE_DIALOG_TITLE,
                      initial_path,
-                     allowed_suffixes=['.ofx', '.qfx'],
+                     allowed_suffixes=supported_suffixes(),
                      allow_picking_directories=True)
 
 
@@ -71,9 +75,36 @@ class BudgyDataPanel(BudgyFunctionSubPanel):
             }
         )
 
+        x = self._clear_data_button.get_relative_rect().right + MARGIN
+        self._jump_entry = UITextEntryLine(
+            pygame.Rect(x, y, w, h),
+            self.ui_manager,
+            container=self,
+            anchors={
+                'top': 'top', 'left': 'left',
+                'bottom': 'top', 'right': 'left'
+            },
+            placeholder_text='Jump to YYYY-MM(-DD)'
+        )
+        self._jump_entry.set_allowed_characters(list('0123456789-'))
+
         x = 0
         y = self._clear_data_button.get_relative_rect().bottom + MARGIN
+        w = self.get_relative_rect().width - 6 * MARGIN
+        self._filter_bar = RecordFilterBar(
+            pygame.Rect(x, y, w, BUTTON_HEIGHT),
+            manager=self.ui_manager,
+            container=self,
+            anchors={
+                'top': 'top', 'left': 'left',
+                'bottom': 'top', 'right': 'right'
+            },
+            object_id=ObjectID(object_id='#record_filter_bar')
+        )
+        self._record_filter = RecordFilter()
+        self.database:BudgyDatabase = None
 
+        y = self._filter_bar.get_relative_rect().bottom + MARGIN
         w, h = self.get_relative_rect().size
         w -= 6 * MARGIN
         h -= 6 * MARGIN + y
@@ -98,9 +129,29 @@ class BudgyDataPanel(BudgyFunctionSubPanel):
     def set_data(self, new_data):
         self._records_view_panel.set_data(new_data)
 
+    def set_database(self, database:BudgyDatabase):
+        self.database = database
+        self._filter_bar.set_database(database)
+        self.refresh_data()
+
+    def refresh_data(self):
+        """Show the records matching the current filter, read from the database a page at a time"""
+        if self.database is None:
+            return
+        self.set_data(PagedRecords(self.database, self._record_filter))
+
     def render_data(self):
         self._records_view_panel.render_data()
 
+    def jump_to_date(self, text):
+        try:
+            date = parse_date(text)
+            row = self._records_view_panel.jump_to_date(date)
+        except ValueError as e:
+            budgy.gui.events.post_show_message(str(e), 'error')
+            return
+        budgy.gui.events.post_show_message(f'{date} is record {row} of {len(self._records_view_panel.data)}')
+
     def process_confirm_dialog_events(self, event: pygame.event.Event) -> bool:
         if event.type == pygame_gui.UI_CONFIRMATION_DIALOG_CONFIRMED:
             if is_confirm_import_dialog(event.ui_element):
@@ -161,6 +212,14 @@ class BudgyDataPanel(BudgyFunctionSubPanel):
                     is_directory = os.path.isdir(self.import_path)
                     show_confirm_import_dialog(import_directory=is_directory)
                 event_consumed = True
+            if event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED and event.ui_element == self._jump_entry:
+                self.jump_to_date(self._jump_entry.get_text())
+                event_consumed = True
+            if event.type == budgy.gui.events.RECORD_FILTER_CHANGED:
+                self._record_filter = event.record_filter
+                self.refresh_data()
+                budgy.gui.events.post_show_message(f'{len(self._records_view_panel.data)} records match the filter')
+                event_consumed = True
             if event.type == budgy.gui.events.DELETE_ALL_DATA:
                 logging.debug('CLEAR DATA (data panel)')
                 show_confirm_delete_all_dialog()
@@ -8,7 +8,10 @@ DELETE_ALL_DATA_CONFIRMED = pygame.event.custom_type()
 SELECT_DATABASE = pygame.event.custom_type()
 SELECT_SOURCE_FILE = pygame.event.custom_type()
 CATEGORY_SELECTION_CHANGED = pygame.event.custom_type()
+# fitids: changed transactions, changes: [{fitid, posted, amount, old_expense_type, expense_type}]
 CATEGORY_CHANGED = pygame.event.custom_type()
+# record_filter: the RecordFilter the record view should show
+RECORD_FILTER_CHANGED = pygame.event.custom_type()
 
 
 SHOW_MESSAGE = pygame.event.custom_type()
@@ -36,4 +39,26 @@ def post_show_progress(value, total):
     pygame.event.post(pygame.event.Event(SHOW_PROGRESS, event_data))
 
 def post_hide_progress():
-    pygame.event.post(pygame.event.Event(HIDE_PROGRESS))
\ No newline at end of file
+    pygame.event.post(pygame.event.Event(HIDE_PROGRESS))
+
+def category_changed_event(fitid, account, posted, amount, category, subcategory, category_info, old_expense_type):
+    """CATEGORY_CHANGED for one transaction moved to category / subcategory, category_info is its category dict entry"""
+    event_data = {
+        'fitid': fitid,
+        'account': account,
+        'posted': posted,
+        'category': category,
+        'subcategory': subcategory,
+        'category_id': category_info['id'],
+        'expense_type': category_info['expense_type'],
+        # listeners update only what the change affects instead of reloading everything
+        'fitids': [fitid],
+        'changes': [{
+            'fitid': fitid,
+            'posted': posted,
+            'amount': amount,
+            'old_expense_type': old_expense_type,
+            'expense_type': category_info['expense_type'],
+        }]
+    }
+    return pygame.event.Event(CATEGORY_CHANGED, event_data)
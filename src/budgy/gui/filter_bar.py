@@ -0,0 +1,175 @@
+"""
+Filter and sort bar of the record view
+
+Every change builds a new RecordFilter and posts RECORD_FILTER_CHANGED. The data panel turns
+the filter into a PagedRecords, so the filtering, sorting and paging all happen in SQL.
+"""
+import logging
+
+import pygame
+import pygame_gui
+from pygame_gui.elements import UIPanel, UIButton, UIDropDownMenu, UITextEntryLine
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.records import RecordFilter
+from budgy.gui.constants import MARGIN, BUTTON_HEIGHT
+from budgy.gui.events import RECORD_FILTER_CHANGED, post_show_message
+
+ALL_ACCOUNTS = 'All Accounts'
+ALL_CATEGORIES = 'All Categories'
+ALL_EXPENSE_TYPES = 'All Types'
+EXPENSE_TYPE_OPTIONS = {
+    ALL_EXPENSE_TYPES: None,
+    'Not Expenses': BudgyDatabase.NON_EXPENSE_TYPE,
+    'One Time': BudgyDatabase.ONE_TIME_EXPENSE_TYPE,
+    'Recurring': BudgyDatabase.RECURRING_EXPENSE_TYPE
+}
+# option -> (sort, descending)
+SORT_OPTIONS = {
+    'Oldest First': ('posted', False),
+    'Newest First': ('posted', True),
+    'Smallest Amount': ('amount', False),
+    'Largest Amount': ('amount', True)
+}
+
+
+class RecordFilterBar(UIPanel):
+    ACCOUNT_WIDTH = 160
+    CATEGORY_WIDTH = 170
+    EXPENSE_TYPE_WIDTH = 120
+    AMOUNT_WIDTH = 100
+    SORT_WIDTH = 150
+    CLEAR_WIDTH = 60
+    EXPANSION_HEIGHT = 10 * BUTTON_HEIGHT
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._accounts = []
+        self._categories = []
+        self._account = ALL_ACCOUNTS
+        self._category = ALL_CATEGORIES
+        self._expense_type = ALL_EXPENSE_TYPES
+        self._sort = next(iter(SORT_OPTIONS))
+        self.account_menu = None
+        self.category_menu = None
+        self.expense_type_menu = None
+        self.sort_menu = None
+        self.min_amount_entry = None
+        self.max_amount_entry = None
+        self.clear_button = None
+        self._build()
+
+    def _build(self):
+        for element in (self.account_menu, self.category_menu, self.expense_type_menu, self.sort_menu,
+                        self.min_amount_entry, self.max_amount_entry, self.clear_button):
+            if element is not None:
+                element.kill()
+        x = 0
+        h = BUTTON_HEIGHT
+        self.account_menu = self._drop_down([ALL_ACCOUNTS] + self._accounts, self._account, x, self.ACCOUNT_WIDTH)
+        x += self.ACCOUNT_WIDTH + MARGIN
+        self.category_menu = self._drop_down([ALL_CATEGORIES] + self._categories, self._category, x,
+                                             self.CATEGORY_WIDTH)
+        x += self.CATEGORY_WIDTH + MARGIN
+        self.expense_type_menu = self._drop_down(list(EXPENSE_TYPE_OPTIONS), self._expense_type, x,
+                                                 self.EXPENSE_TYPE_WIDTH)
+        x += self.EXPENSE_TYPE_WIDTH + MARGIN
+        self.min_amount_entry = self._amount_entry(x, 'Min Amount')
+        x += self.AMOUNT_WIDTH + MARGIN
+        self.max_amount_entry = self._amount_entry(x, 'Max Amount')
+        x += self.AMOUNT_WIDTH + MARGIN
+        self.sort_menu = self._drop_down(list(SORT_OPTIONS), self._sort, x, self.SORT_WIDTH)
+        x += self.SORT_WIDTH + MARGIN
+        self.clear_button = UIButton(pygame.Rect(x, 0, self.CLEAR_WIDTH, h), 'Clear', self.ui_manager,
+                                     container=self, parent_element=self)
+
+    def _drop_down(self, options, selected, x, w):
+        return UIDropDownMenu(options, selected, pygame.Rect(x, 0, w, BUTTON_HEIGHT),
+                              manager=self.ui_manager, container=self, parent_element=self,
+                              expansion_height_limit=self.EXPANSION_HEIGHT)
+
+    def _amount_entry(self, x, placeholder):
+        entry = UITextEntryLine(pygame.Rect(x, 0, self.AMOUNT_WIDTH, BUTTON_HEIGHT), self.ui_manager,
+                                container=self, parent_element=self, placeholder_text=placeholder)
+        entry.set_allowed_characters(list('0123456789.-'))
+        return entry
+
+    def set_database(self, database: BudgyDatabase):
+        """Offer the accounts and categories in the database"""
+        accounts = database.get_account_list()
+        categories = [category['name'] for category in database.get_category_list()]
+        if accounts == self._accounts and categories == self._categories:
+            return
+        self._accounts = accounts
+        self._categories = categories
+        if self._account not in accounts:
+            self._account = ALL_ACCOUNTS
+        if self._category not in categories:
+            self._category = ALL_CATEGORIES
+        min_text = self.min_amount_entry.get_text()
+        max_text = self.max_amount_entry.get_text()
+        self._build()
+        self.min_amount_entry.set_text(min_text)
+        self.max_amount_entry.set_text(max_text)
+
+    @staticmethod
+    def _amount(entry):
+        text = entry.get_text().strip()
+        if text == '':
+            return None
+        try:
+            return float(text)
+        except ValueError:
+            post_show_message(f'Not an amount: {text}', 'error')
+            return None
+
+    @property
+    def record_filter(self) -> RecordFilter:
+        sort, descending = SORT_OPTIONS[self._sort]
+        return RecordFilter(
+            account=None if self._account == ALL_ACCOUNTS else self._account,
+            category=None if self._category == ALL_CATEGORIES else self._category,
+            expense_type=EXPENSE_TYPE_OPTIONS[self._expense_type],
+            min_amount=self._amount(self.min_amount_entry),
+            max_amount=self._amount(self.max_amount_entry),
+            sort=sort,
+            descending=descending
+        )
+
+    def clear(self):
+        self._account = ALL_ACCOUNTS
+        self._category = ALL_CATEGORIES
+        self._expense_type = ALL_EXPENSE_TYPES
+        self._sort = next(iter(SORT_OPTIONS))
+        self._build()
+
+    def post_filter_changed(self):
+        record_filter = self.record_filter
+        logging.debug(f'Record filter: {record_filter}')
+        pygame.event.post(pygame.event.Event(RECORD_FILTER_CHANGED, {'record_filter': record_filter}))
+
+    def process_event(self, event: pygame.event.Event) -> bool:
+        event_consumed = super().process_event(event)
+        if not event_consumed:
+            if event.type == pygame_gui.UI_DROP_DOWN_MENU_CHANGED:
+                if event.ui_element == self.account_menu:
+                    self._account = event.text
+                elif event.ui_element == self.category_menu:
+                    self._category = event.text
+                elif event.ui_element == self.expense_type_menu:
+                    self._expense_type = event.text
+                elif event.ui_element == self.sort_menu:
+                    self._sort = event.text
+                else:
+                    return event_consumed
+                self.post_filter_changed()
+                event_consumed = True
+            elif event.type == pygame_gui.UI_TEXT_ENTRY_FINISHED and \
+                    event.ui_element in (self.min_amount_entry, self.max_amount_entry):
+                self.post_filter_changed()
+                event_consumed = True
+            elif event.type == pygame_gui.UI_BUTTON_PRESSED and event.ui_element == self.clear_button:
+                self.clear()
+                self.post_filter_changed()
+                event_consumed = True
+        return event_consumed
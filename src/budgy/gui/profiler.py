@@ -0,0 +1,288 @@
+"""
+Viewer profiler
+
+budgy-viewer --profile measures where the viewer spends its time:
+
+- frame: time from one UIManager.update() call to the next, i.e. one frame, split into
+  ui.update (pygame_gui layout) and ui.draw
+- handle_event/NAME and process_events/NAME: time our app and the UI elements take to
+  handle each event type, e.g. handle_event/DATA_SOURCE_CONFIRMED or
+  process_events/CATEGORY_CHANGED
+- db.execute, db.executemany and db.fetch: time spent in BudgyDatabase.execute(), in
+  connection.executemany() and in reading rows from the cursors execute() returns
+  (fetchone / fetchmany / fetchall, or one sample per cursor iterated to the end)
+- widgets: number of UI elements
+
+Each timer keeps its last samples in a rolling window. F3 shows or hides an overlay with
+the current numbers; when the viewer exits the summaries and histograms are written to a
+JSON file.
+"""
+import datetime
+import functools
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+import pygame
+
+DEFAULT_WINDOW = 1000
+# upper bounds of the histogram buckets in milliseconds, the last bucket is everything slower
+HISTOGRAM_BUCKETS_MS = (1, 2, 4, 8, 16, 33, 50, 100, 250, 500, 1000)
+OVERLAY_REFRESH_SECONDS = 0.5
+
+_event_names = None
+
+
+def event_name(event_type) -> str:
+    """Name of a pygame, pygame_gui or budgy event type"""
+    global _event_names
+    if _event_names is None:
+        import pygame_gui
+        import budgy.gui.events
+        # report_panel has to be imported through function_panel
+        import budgy.gui.function_panel
+        import budgy.gui.report_panel
+        _event_names = {}
+        for module in (budgy.gui.events, budgy.gui.report_panel, pygame_gui):
+            for name, value in vars(module).items():
+                if name.isupper() and isinstance(value, int) and value >= pygame.USEREVENT:
+                    _event_names.setdefault(value, name)
+    if event_type in _event_names:
+        return _event_names[event_type]
+    return pygame.event.event_name(event_type)
+
+
+class RollingStats(object):
+    """Timings of the last window samples, plus totals since the start"""
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def histogram(self) -> Dict[str, int]:
+        counts = {f'<={bound}ms': 0 for bound in HISTOGRAM_BUCKETS_MS}
+        counts[f'>{HISTOGRAM_BUCKETS_MS[-1]}ms'] = 0
+        for seconds in self.samples:
+            ms = seconds * 1000
+            for bound in HISTOGRAM_BUCKETS_MS:
+                if ms <= bound:
+                    counts[f'<={bound}ms'] += 1
+                    break
+            else:
+                counts[f'>{HISTOGRAM_BUCKETS_MS[-1]}ms'] += 1
+        return counts
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def percentile(p):
+            return round(ordered[min(n - 1, int(n * p))] * 1000, 3) if n > 0 else None
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(sum(ordered) / n * 1000, 3) if n > 0 else None,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(ordered[-1] * 1000, 3) if n > 0 else None,
+            'histogram': self.histogram()
+        }
+
+
+class Profiler(object):
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.stats: Dict[str, RollingStats] = {}
+        self.widget_counts = deque(maxlen=window)
+        self.started = datetime.datetime.now().isoformat(timespec='seconds')
+        self._last_frame = None
+        self.on_frame = None
+
+    def record(self, name, seconds):
+        if name not in self.stats:
+            self.stats[name] = RollingStats(self.window)
+        self.stats[name].add(seconds)
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def wrap(self, name, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            with self.measure(name):
+                return function(*args, **kwargs)
+        return timed
+
+    def wrap_event_handler(self, prefix, function):
+        """Time function(event, ...) per event type"""
+        @functools.wraps(function)
+        def timed(event, *args, **kwargs):
+            with self.measure(f'{prefix}/{event_name(event.type)}'):
+                return function(event, *args, **kwargs)
+        return timed
+
+    def frame(self, widget_count=None):
+        """Mark the start of a frame"""
+        now = time.perf_counter()
+        if self._last_frame is not None:
+            self.record('frame', now - self._last_frame)
+        self._last_frame = now
+        if widget_count is not None:
+            self.widget_counts.append(widget_count)
+
+    def attach_ui_manager(self, ui_manager):
+        """Time the frames, layout, drawing and event handling of ui_manager"""
+        update = ui_manager.update
+
+        def profiled_update(time_delta):
+            self.frame(len(ui_manager.get_sprite_group().sprites()))
+            with self.measure('ui.update'):
+                result = update(time_delta)
+            if self.on_frame is not None:
+                self.on_frame()
+            return result
+        ui_manager.update = profiled_update
+        ui_manager.draw_ui = self.wrap('ui.draw', ui_manager.draw_ui)
+        ui_manager.process_events = self.wrap_event_handler('process_events', ui_manager.process_events)
+
+    def attach_database(self, database):
+        """Time the statements database runs and the rows read from them"""
+        execute = database.execute
+
+        def profiled_execute(*args, **kwargs):
+            with self.measure('db.execute'):
+                cursor = execute(*args, **kwargs)
+            return _TimedCursor(cursor, self)
+        database.execute = profiled_execute
+        database.connection = _TimedConnection(database.connection, self)
+
+    def as_dict(self) -> Dict:
+        widgets = list(self.widget_counts)
+        return {
+            'started': self.started,
+            'window': self.window,
+            'widgets': {
+                'current': widgets[-1] if len(widgets) > 0 else None,
+                'max': max(widgets) if len(widgets) > 0 else None
+            },
+            'timers': {name: stats.summary() for name, stats in sorted(self.stats.items())}
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write('\n')
+
+    def overlay_lines(self) -> List[str]:
+        """The busiest timers, for the overlay"""
+        lines = []
+        if 'frame' in self.stats:
+            frame = self.stats['frame'].summary()
+            fps = 1000 / frame['mean_ms'] if frame['mean_ms'] else 0
+            lines.append(f'frame {frame["mean_ms"]:.1f}ms p95 {frame["p95_ms"]:.1f}ms ({fps:.0f} fps)')
+        if len(self.widget_counts) > 0:
+            lines.append(f'widgets {self.widget_counts[-1]}')
+        timers = [(stats.total, name, stats) for name, stats in self.stats.items() if name != 'frame']
+        for total, name, stats in sorted(timers, reverse=True)[:8]:
+            summary = stats.summary()
+            lines.append(f'{name} n={summary["count"]} mean {summary["mean_ms"]:.2f}ms max {summary["max_ms"]:.1f}ms')
+        return lines
+
+
+class _TimedConnection(object):
+    """sqlite3 connection that times executemany(), everything else is passed through"""
+    def __init__(self, connection, profiler: Profiler):
+        self._connection = connection
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def executemany(self, *args, **kwargs):
+        with self._profiler.measure('db.executemany'):
+            return self._connection.executemany(*args, **kwargs)
+
+
+class _TimedCursor(object):
+    """sqlite3 cursor that times reading its rows as db.fetch"""
+    def __init__(self, cursor, profiler: Profiler):
+        self._cursor = cursor
+        self._profiler = profiler
+        self._iter_seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def fetchone(self):
+        with self._profiler.measure('db.fetch'):
+            return self._cursor.fetchone()
+
+    def fetchmany(self, *args, **kwargs):
+        with self._profiler.measure('db.fetch'):
+            return self._cursor.fetchmany(*args, **kwargs)
+
+    def fetchall(self):
+        with self._profiler.measure('db.fetch'):
+            return self._cursor.fetchall()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # one sample for the whole iteration, a sample per row would bury the other timers
+        start = time.perf_counter()
+        try:
+            row = next(self._cursor)
+        except StopIteration:
+            self._profiler.record('db.fetch', self._iter_seconds + time.perf_counter() - start)
+            self._iter_seconds = 0.0
+            raise
+        self._iter_seconds += time.perf_counter() - start
+        return row
+
+
+class ProfilerOverlay(object):
+    """Text box in the top right corner showing the profiler numbers, refreshed twice a second"""
+    def __init__(self, profiler: Profiler, ui_manager, size):
+        from pygame_gui.elements import UITextBox
+        self.profiler = profiler
+        self._text_box = UITextBox(
+            '',
+            pygame.Rect(size[0] - 460, 0, 460, 200),
+            manager=ui_manager,
+            starting_height=100
+        )
+        self._text_box.hide()
+        self._last_refresh = 0.0
+        profiler.on_frame = self.refresh
+
+    @property
+    def visible(self):
+        return self._text_box.visible
+
+    def toggle(self):
+        if self.visible:
+            self._text_box.hide()
+        else:
+            self._text_box.show()
+            self._last_refresh = 0.0
+            self.refresh()
+
+    def refresh(self):
+        now = time.perf_counter()
+        if not self.visible or now - self._last_refresh < OVERLAY_REFRESH_SECONDS:
+            return
+        self._last_refresh = now
+        self._text_box.set_text('<br>'.join(self.profiler.overlay_lines()))
@@ -2,6 +2,7 @@ import datetime
 import logging
 import math
 import re
+from bisect import bisect_left
 from pathlib import Path
 from typing import List
 import pygame
@@ -13,9 +14,10 @@ import budgy.gui.constants
 from budgy.core.database import BudgyDatabase
 from budgy.gui.category_button import CategoryButton
 from budgy.gui.db_record_view_panel import DbRecordView
+from budgy.gui.scrolling import ScrollState
 from budgy.gui.toggle_button import ToggleButton, TOGGLE_BUTTON
 
-from budgy.gui.events import post_show_message, CATEGORY_CHANGED
+from budgy.gui.events import CATEGORY_CHANGED
 
 
 class RecordView(DbRecordView):
@@ -116,7 +118,7 @@ class RecordView(DbRecordView):
             self._category_button.enable()
             if self.visible:
                 self._category_button.show()
-                self._category_button.set_category_text()
+                # the category text is read when the fitid is set below
                 self._category_button.txn_name = record['name']
 
         for field in self.field_names:
@@ -149,8 +151,9 @@ class RecordView(DbRecordView):
                             self.set_color(self.ONE_TIME_EXPENSE_COLOR)
                         else:
                             self.set_color(self.NON_EXPENSE_COLOR)
-                if field != 'category':
-                    self._fields[i].set_text(str(value))
+                # rows are recycled, most labels already show the right text
+                if field != 'category' and self._fields[i].text != value:
+                    self._fields[i].set_text(value)
 
     def process_event(self, event: pygame.event.Event) -> bool:
         event_consumed = super().process_event(event)
@@ -163,6 +166,8 @@ class RecordView(DbRecordView):
                 if (event.fitid == self._record['fitid'] and
                     event.account == self._record['account'] and
                     event.posted == self._record['posted']):
+                    self._record['category'] = event.category_id
+                    self._category_button.show_category(event.category, event.subcategory, event.expense_type)
                     if event.expense_type == BudgyDatabase.RECURRING_EXPENSE_TYPE:
                         self.set_color(self.RECURRING_EXPENSE_COLOR)
                     elif event.expense_type == BudgyDatabase.ONE_TIME_EXPENSE_TYPE:
@@ -198,13 +203,20 @@ class RecordViewPanel(UIPanel):
             },
         )
         self.visible_records:int = 0
+        self._data = []
+        # the first row shown by record_views, None when they have to be bound again
+        self._bound_row = None
+        # fitid -> index in _data, built when a category changes
+        self._row_index = None
         self.setup_record_views()
         self.last_start_percent = 0
+        self._scrolling = ScrollState(self.scrollbar)
 
     def setup_record_views(self):
         for rv in self.record_views:
             rv.kill()
         self.record_views:List[RecordView] = []
+        self._bound_row = None
         # calculate number of visible rows
         h = self.relative_rect.height
         n = math.floor(h / RecordView.RECORD_VIEW_HEIGHT)
@@ -232,17 +244,45 @@ class RecordViewPanel(UIPanel):
 
 
     def render_data(self):
+        """
+        Show the rows from starting_row. When the list scrolled by less than a page the row views are
+        recycled: the ones still showing visible rows move to their new place and only the rows that
+        scrolled into view are bound, so scrolling costs what the scroll distance costs.
+        """
         if not self.visible:
             return
 
-        for i in range(self.visible_records):
+        n = self.visible_records
+        shift = None if self._bound_row is None else self.starting_row - self._bound_row
+        if shift is not None and abs(shift) < n:
+            if shift != 0:
+                self.record_views = self.record_views[shift:] + self.record_views[:shift]
+                self._position_record_views()
+            exposed = range(n - shift, n) if shift > 0 else range(0, -shift)
+        else:
+            exposed = range(n)
+        for i in exposed:
             if self.starting_row + i < len(self._data):
                 self.record_views[i].set_record(self._data[self.starting_row + i])
             else:
                 self.record_views[i].set_record(None)
+        self._bound_row = self.starting_row
+
+    def _position_record_views(self):
+        h = RecordView.RECORD_VIEW_HEIGHT
+        for i, rv in enumerate(self.record_views):
+            if rv.relative_rect.y != i * h:
+                rv.set_relative_position((rv.relative_rect.x, i * h))
+
+    def show(self):
+        # hidden rows miss CATEGORY_CHANGED events, bind them all again
+        self._bound_row = None
+        super().show()
 
     def set_data(self, rows):
         self._data = rows
+        self._row_index = None
+        self._bound_row = None
         self.starting_row = 0
         self.last_start_percent = self.scrollbar.start_percentage
         n_records = len(self._data)
@@ -251,23 +291,64 @@ class RecordViewPanel(UIPanel):
         self.scrollbar.set_visible_percentage(pct)
         self.render_data()
 
+    @property
+    def data(self):
+        return self._data
+
+    def scroll_to_row(self, row):
+        n_records = len(self._data)
+        self.starting_row = max(0, min(row, n_records - self.visible_records))
+        if n_records > 0:
+            self.scrollbar.set_scroll_from_start_percentage(self.starting_row / n_records)
+        # the scroll bar moved, update() must not map its position back to a row
+        self.last_start_percent = self.scrollbar.start_percentage
+        self.render_data()
+
+    def jump_to_date(self, date) -> int:
+        """
+        Scroll to the first record posted on date ('YYYY-MM-DD') or after it and return its row.
+        PagedRecords counts the records before the date in the database, lists are in posted order.
+        """
+        if hasattr(self._data, 'index_of_date'):
+            row = self._data.index_of_date(date)
+        else:
+            # bisect has no key= before Python 3.10
+            row = bisect_left([record['posted'][:10] for record in self._data], date)
+        self.scroll_to_row(row)
+        return row
+
+    def update_categories(self, fitids, category_id):
+        """Keep the rows in sync after a category change. The visible rows update themselves."""
+        if hasattr(self._data, 'update_categories'):
+            # PagedRecords only holds the cached pages
+            self._data.update_categories(fitids, category_id)
+            return
+        if self._row_index is None:
+            self._row_index = {row['fitid']: i for i, row in enumerate(self._data)}
+        for fitid in fitids:
+            i = self._row_index.get(fitid)
+            if i is not None:
+                self._data[i]['category'] = category_id
+
     def process_event(self, event: pygame.event.Event) -> bool:
         event_consumed = super().process_event(event)
         if not event_consumed:
-            if event.type == pygame.MOUSEWHEEL:
-                # Trick the scrollbar into thinking it got the event
-                self.scrollbar.scroll_wheel_moved = True
-                self.scrollbar.scroll_wheel_amount = event.y
-                # forcing an update makes the scrolling smoother
-                self.scrollbar.update(0.01)
-
-            if self.scrollbar.has_moved_recently:
-                if self.scrollbar.start_percentage != self.last_start_percent:
-                    self.last_start_percent = self.scrollbar.start_percentage
-                    self.starting_row = math.ceil(len(self._data) * self.last_start_percent)
-                    self.render_data()
-                    last = min(self.starting_row + self.visible_records, len(self._data))
-                    post_show_message(f'Showing Records {self.starting_row} to {last} out of {len(self._data)}')
+            if event.type == budgy.gui.events.CATEGORY_CHANGED:
+                self.update_categories(event.fitids, event.category_id)
+            if event.type == pygame.MOUSEWHEEL and self.visible:
+                # applied once per frame in update()
+                self._scrolling.add_wheel(event.y)
                 event_consumed = True
 
         return event_consumed
+
+    def update(self, time_delta: float):
+        super().update(time_delta)
+        self._scrolling.apply_wheel()
+        if self.scrollbar.start_percentage != self.last_start_percent:
+            self.last_start_percent = self.scrollbar.start_percentage
+            self.starting_row = math.ceil(len(self._data) * self.last_start_percent)
+            self.render_data()
+            last = min(self.starting_row + self.visible_records, len(self._data))
+            self._scrolling.show_message(f'Showing Records {self.starting_row} to {last} out of {len(self._data)}')
+        self._scrolling.flush_message()
@@ -8,7 +8,7 @@ from pygame_gui.core import ObjectID
 from pygame_gui.elements import UILabel, UIButton, UIPanel
 import budgy.gui.constants
 from budgy.core.database import BudgyDatabase
-from budgy.gui.events import TOGGLE_BUTTON, post_show_message
+from budgy.gui.events import TOGGLE_BUTTON
 from budgy.gui.function_panel import BudgyFunctionSubPanel
 from budgy.gui.constants import MARGIN, BUTTON_HEIGHT
 from budgy.gui.record_view_panel import RecordViewPanel
@@ -37,13 +37,21 @@ class ExpenseDetailButton(UIButton):
 
 
 class BudgyReportPanel(BudgyFunctionSubPanel):
+    COLUMN_HEADERS = (
+        '', 'Ave', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'
+    )
+
     def __init__(self, config_in, function_panel, *args, **kwargs):
         super().__init__(config_in, function_panel, *args, **kwargs)
 
         self.database:BudgyDatabase = None
-        # put all labels and buttons in one place so we can destroy them when we rebuild
+        # the table widgets are kept and updated in place when the report changes
         self.header_labels = []
+        # year -> {'label', 'buttons' (average + 12 months), 'texts' shown on the buttons, 'tooltip', 'y'}
         self.row_items = {}
+        # rows of years no longer in the report, hidden until a new year needs them
+        self.row_pool = []
+        self.report_data = {}
         self.detail_y = 0
         self.detail_panel:UIPanel = None
         self.detail_rows:List[Dict] = []
@@ -55,34 +63,59 @@ class BudgyReportPanel(BudgyFunctionSubPanel):
 
     def rebuild_report(self):
         if self.database is not None:
-            self.clear_report()
-            self.create_summary_table()
+            if len(self.header_labels) == 0:
+                self.create_summary_table()
+            else:
+                self.update_summary_table()
             self.render_data()
 
     def clear_report(self):
         for label in self.header_labels:
             label.kill()
-        for year in self.row_items:
-            self.row_items[year]['label'].kill()
-            for button in self.row_items[year]['buttons']:
+        for row in list(self.row_items.values()) + self.row_pool:
+            row['label'].kill()
+            for button in row['buttons']:
                 if button is not None:
                     button.kill()
         self.header_labels = []
         self.row_items = {}
+        self.row_pool = []
 
-    def create_summary_table(self):
-        # table headers
-        column_headers = (
-            '', 'Ave', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'
-        )
-        ncolumns = len(column_headers)
+    def _column_sizes(self):
+        ncolumns = len(self.COLUMN_HEADERS)
         column_width = self.relative_rect.width / ncolumns
-        column0_width = column_width - 12
-        column_height = BUTTON_HEIGHT
+        return column_width, column_width - 12, BUTTON_HEIGHT
+
+    def _button_x(self, column):
+        """x of the average button (column 0) or a month button (columns 1 to 12)"""
+        column_width, column0_width, _ = self._column_sizes()
+        return column0_width + 1 + column * (column_width + 1)
+
+    def _row_y(self, row):
+        _, _, column_height = self._column_sizes()
+        return (row + 1) * (column_height + 1)
+
+    def _create_button(self, year, month, column, y, text):
+        column_width, _, column_height = self._column_sizes()
+        return ExpenseDetailButton(
+            year, month,
+            pygame.Rect(self._button_x(column), y, column_width - 1, column_height),
+            text,
+            container=self,
+            anchors={
+                'top': 'top', 'left': 'left',
+                'bottom': 'top', 'right': 'left'
+            },
+            object_id=ObjectID(class_id='#average-button')
+        )
+
+    def create_summary_table(self):
+        self.clear_report()
+        column_width, column0_width, column_height = self._column_sizes()
         x = 0
         y = 0
 
-        for header in column_headers:
+        for header in self.COLUMN_HEADERS:
             if header != '':
                 label = UILabel(
                     pygame.Rect(x, y, column_width - 1, column_height),
@@ -99,87 +132,126 @@ class BudgyReportPanel(BudgyFunctionSubPanel):
                 x += column_width + 1
             else:
                 x += column0_width + 1
-        y += column_height + 1
+        self.update_summary_table()
 
-        report_data = self.database.get_report()
+    def _create_row(self, year, y):
+        _, column0_width, column_height = self._column_sizes()
+        year_label = UILabel(
+            pygame.Rect(0, y, column0_width - 1, column_height),
+            year,
+            container=self,
+            object_id=ObjectID(class_id='#label', object_id='@label-center'),
+            anchors={
+                'top': 'top', 'left': 'left',
+                'bottom': 'top', 'right': 'left'
+            }
+        )
+        # month buttons are created when a month has expenses
+        return {
+            'label': year_label,
+            'buttons': [self._create_button(year, None, 0, y, '')] + [None] * 12,
+            'texts': [None] * 13,
+            'tooltip': None,
+            'y': y
+        }
 
-        for year in sorted(report_data):
-            if year not in self.row_items:
-                self.row_items[year] = {
-                    'label': None,
-                    'buttons': [],
-                }
-            x = 0
-            year_label = UILabel(
-                pygame.Rect(x, y, column0_width - 1, column_height),
-                year,
-                container=self,
-                object_id=ObjectID(class_id='#label', object_id='@label-center'),
-                anchors={
-                    'top': 'top', 'left': 'left',
-                    'bottom': 'top', 'right': 'left'
-                }
-            )
-            year_label.set_tooltip(f'<b><center>{year}</center></b><br/>'
-                                   f'<b>Min: </b>{report_data[year]["minimum"]:.0f}<br/>'
-                                   f'<b>Max: </b>{report_data[year]["maximum"]:.0f}<br/>'
-                                   f'<b>Ave: </b>{report_data[year]["average"]:.0f}')
-            self.row_items[year]['label'] = year_label
-            x += column0_width + 1
-
-            average = report_data[year]['average']
-            button = ExpenseDetailButton(
-                year, None,
-                pygame.Rect(x, y, column_width - 1, column_height),
-                f'{abs(average):.0f}',
-                container=self,
-                anchors={
-                    'top': 'top', 'left': 'left',
-                    'bottom': 'top', 'right': 'left'
-                },
-                object_id=ObjectID(class_id='#average-button')
-            )
-            self.row_items[year]['buttons'].append(button)
-            x += column_width + 1
-
-            month = 0
-            for monthly_expense in report_data[year]['months']:
-                month += 1
-                button = None
-                if monthly_expense is not None:
-                    button = ExpenseDetailButton(
-                        year, f'{month:02d}',
-                        pygame.Rect(x, y, column_width - 1, column_height),
-                        f'{abs(float(monthly_expense)):.0f}',
-                        container=self,
-                        anchors={
-                            'top': 'top', 'left': 'left',
-                            'bottom': 'top', 'right': 'left'
-                        },
-                        object_id=ObjectID(class_id='#average-button')
-                    )
-                self.row_items[year]['buttons'].append(button)
-                x += column_width + 1
-            y += column_height + 1
-        self.detail_y = y
+    def _take_row(self, year, y):
+        """A row of widgets for year: reused from the pool if possible"""
+        if len(self.row_pool) == 0:
+            return self._create_row(year, y)
+        row = self.row_pool.pop()
+        row['label'].set_text(year)
+        row['label'].show()
+        for button in row['buttons']:
+            if button is not None:
+                button.year = year
+        row['y'] = None
+        return row
+
+    def _release_row(self, year):
+        row = self.row_items.pop(year)
+        row['label'].hide()
+        for button in row['buttons']:
+            if button is not None:
+                button.hide()
+        # the texts are set again when the row is reused
+        row['texts'] = [None] * 13
+        row['tooltip'] = None
+        self.row_pool.append(row)
+
+    def _set_button_text(self, row, column, text):
+        if row['texts'][column] != text:
+            row['buttons'][column].set_text(text)
+            row['texts'][column] = text
 
     def update_summary_table(self):
+        """
+        Bring the table in line with the database report. Existing widgets are moved and updated in place,
+        only cells whose value changed get new text, and widgets are only created for new years and months.
+        """
         report_data = self.database.get_report()
-        for year in report_data:
-            if year in self.row_items:
-                average = report_data[year]['average']
-                self.row_items[year]['buttons'][0].set_text(f'{abs(average):.0f}')
-                for month in range(12):
-                    expense = report_data[year]['months'][month]
-                    if expense is not None:
-                        month_item = self.row_items[year]['buttons'][month+1] # add one to skip monthly average
-                        if month_item is not None:
-                            month_item.set_text(f'{abs(float(expense)):.0f}')
-                        else:
-                            post_show_message(f'ERROR: Month {year}/{month} not found in summary table', 'error')
-            else:
-                post_show_message(f'ERROR: Year {year} not found in summary table', 'error')
+        self.report_data = report_data
+        for year in [year for year in self.row_items if year not in report_data]:
+            self._release_row(year)
+        for row_number, year in enumerate(sorted(report_data)):
+            y = self._row_y(row_number)
+            row = self.row_items.get(year)
+            if row is None:
+                row = self._take_row(year, y)
+                self.row_items[year] = row
+            if row['y'] != y:
+                row['label'].set_relative_position((0, y))
+                for column, button in enumerate(row['buttons']):
+                    if button is not None:
+                        button.set_relative_position((self._button_x(column), y))
+                row['y'] = y
+            self.set_year_tooltip(row, year)
+            self._set_button_text(row, 0, f'{abs(report_data[year]["average"]):.0f}')
+            row['buttons'][0].show()
+            for month, expense in enumerate(report_data[year]['months']):
+                button = row['buttons'][month + 1]
+                if expense is None:
+                    if button is not None:
+                        button.hide()
+                    continue
+                text = f'{abs(float(expense)):.0f}'
+                if button is None:
+                    row['buttons'][month + 1] = self._create_button(year, f'{month + 1:02d}', month + 1, y, text)
+                    row['texts'][month + 1] = text
+                else:
+                    button.show()
+                    self._set_button_text(row, month + 1, text)
+        detail_y = self._row_y(len(report_data))
+        if detail_y != self.detail_y and self.detail_panel is not None:
+            self.detail_panel.set_relative_position((0, detail_y))
+        self.detail_y = detail_y
+
+    def set_year_tooltip(self, row, year):
+        tooltip = (f'<b><center>{year}</center></b><br/>'
+                   f'<b>Min: </b>{self.report_data[year]["minimum"]:.0f}<br/>'
+                   f'<b>Max: </b>{self.report_data[year]["maximum"]:.0f}<br/>'
+                   f'<b>Ave: </b>{self.report_data[year]["average"]:.0f}')
+        if row['tooltip'] != tooltip:
+            row['label'].set_tooltip(tooltip)
+            row['tooltip'] = tooltip
 
+    def apply_category_changes(self, changes):
+        """Update only the report cells a category change affects"""
+        for change in changes:
+            delta = BudgyDatabase.report_delta(change['posted'], change['amount'],
+                                               change['old_expense_type'], change['expense_type'])
+            if delta is None:
+                continue
+            year, month, amount = delta
+            if not BudgyDatabase.apply_report_delta(self.report_data, year, month, amount) or \
+                    year not in self.row_items or self.row_items[year]['buttons'][month + 1] is None:
+                logging.warning(f'{year}/{month + 1} not in the summary table, updating the report')
+                self.update_summary_table()
+                return
+            row = self.row_items[year]
+            self._set_button_text(row, month + 1, f'{abs(float(self.report_data[year]["months"][month])):.0f}')
+            self._set_button_text(row, 0, f'{abs(self.report_data[year]["average"]):.0f}')
+            self.set_year_tooltip(row, year)
 
     def render_data(self):
         if self.detail_record_view is not None:
@@ -244,5 +316,6 @@ class BudgyReportPanel(BudgyFunctionSubPanel):
             if event.type == EXPENSE_DETAILS_REQUEST:
                 self.create_detail_report(event.year, event.month)
             if event.type == budgy.gui.events.CATEGORY_CHANGED:
-                self.rebuild_report()
+                if self.database is not None:
+                    self.apply_category_changes(event.changes)
         return event_consumed
@@ -0,0 +1,52 @@
+"""
+Scroll handling shared by the record and category lists
+
+Mouse wheel events are only added up in process_event. The list applies them to its scroll
+bar once per frame, in update(), and renders at most once per frame however fast the wheel
+spins. The "Showing Records X to Y" message is posted at most every MESSAGE_INTERVAL
+seconds; the last position is always shown once the list stops moving.
+"""
+import time
+
+from budgy.gui.events import post_show_message
+
+MESSAGE_INTERVAL = 0.25
+
+
+class ScrollState(object):
+    def __init__(self, scrollbar, message_interval=MESSAGE_INTERVAL):
+        self.scrollbar = scrollbar
+        self.message_interval = message_interval
+        self.wheel_amount = 0
+        self._message = None
+        self._message_time = None
+
+    def add_wheel(self, amount):
+        self.wheel_amount += amount
+
+    def apply_wheel(self):
+        """Move the scroll bar by the wheel events since the last frame"""
+        if self.wheel_amount == 0:
+            return
+        # Trick the scrollbar into thinking it got the event
+        self.scrollbar.scroll_wheel_moved = True
+        self.scrollbar.scroll_wheel_amount = self.wheel_amount
+        self.wheel_amount = 0
+        # forcing an update makes the scrolling smoother
+        self.scrollbar.update(0.01)
+
+    def show_message(self, message, now=None):
+        self._message = message
+        self.flush_message(now)
+
+    def flush_message(self, now=None):
+        """Post the latest message if the last one is old enough"""
+        if self._message is None:
+            return
+        if now is None:
+            now = time.monotonic()
+        if self._message_time is not None and now - self._message_time < self.message_interval:
+            return
+        post_show_message(self._message)
+        self._message = None
+        self._message_time = now
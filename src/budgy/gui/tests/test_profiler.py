@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+import pygame
+
+from budgy.core.database import BudgyDatabase
+from budgy.core.tests.helpers import make_record
+from budgy.gui.events import CATEGORY_CHANGED
+from budgy.gui.profiler import Profiler, RollingStats, event_name
+
+
+class ProfilerTestCase(unittest.TestCase):
+    def test_rolling_stats(self):
+        stats = RollingStats(window=4)
+        for ms in (0.5, 3, 20, 2000, 10):
+            stats.add(ms / 1000)
+        summary = stats.summary()
+        # the window keeps the last 4 samples, the totals count all of them
+        self.assertEqual(summary['count'], 5)
+        self.assertAlmostEqual(summary['total_ms'], 2033.5)
+        self.assertAlmostEqual(summary['max_ms'], 2000)
+        histogram = summary['histogram']
+        self.assertEqual(sum(histogram.values()), 4)
+        self.assertEqual(histogram['<=4ms'], 1)
+        self.assertEqual(histogram['<=16ms'], 1)
+        self.assertEqual(histogram['<=33ms'], 1)
+        self.assertEqual(histogram['>1000ms'], 1)
+        self.assertIsNone(RollingStats().summary()['mean_ms'])
+
+    def test_event_handler(self):
+        profiler = Profiler()
+        handled = []
+        handler = profiler.wrap_event_handler('handle_event', handled.append)
+        handler(pygame.event.Event(CATEGORY_CHANGED, {}))
+        handler(pygame.event.Event(CATEGORY_CHANGED, {}))
+        handler(pygame.event.Event(pygame.KEYDOWN, {}))
+        self.assertEqual(len(handled), 3)
+        self.assertEqual(event_name(CATEGORY_CHANGED), 'CATEGORY_CHANGED')
+        self.assertEqual(profiler.stats['handle_event/CATEGORY_CHANGED'].count, 2)
+        self.assertEqual(profiler.stats[f'handle_event/{pygame.event.event_name(pygame.KEYDOWN)}'].count, 1)
+
+    def test_dump(self):
+        profiler = Profiler()
+        for widgets in (10, 12, 11):
+            profiler.frame(widgets)
+        with profiler.measure('db.execute'):
+            pass
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'profile.json')
+            profiler.dump(path)
+            with open(path) as f:
+                profile = json.load(f)
+        self.assertEqual(profile['widgets'], {'current': 11, 'max': 12})
+        self.assertEqual(profile['timers']['frame']['count'], 2)
+        self.assertEqual(profile['timers']['db.execute']['count'], 1)
+        self.assertGreater(len(profiler.overlay_lines()), 2)
+
+    def test_attach_database(self):
+        profiler = Profiler()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            database = BudgyDatabase(os.path.join(tmpdir, 'profile.db'))
+            profiler.attach_database(database)
+            database.merge_records([make_record(f'STORE {i}', -i - 1.0) for i in range(20)])
+            self.assertEqual(len(database.all_records()), 20)
+            self.assertEqual(len(list(database.iter_records(batch_size=7))), 20)
+            database.clear_import_progress(['statement.qfx'])
+            database.connection.close()
+        for name in ('db.execute', 'db.executemany', 'db.fetch'):
+            self.assertGreater(profiler.stats[name].count, 0, name)
+        # all_records() iterates its cursor, iter_records() reads it with fetchmany()
+        self.assertGreaterEqual(profiler.stats['db.fetch'].count, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
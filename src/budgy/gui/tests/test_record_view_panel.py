@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import unittest
+
+# Configure pygame for headless environment before creating any windows
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+# Skip tests on problematic CI environments, see test_gui_app.py
+skip_gui_tests = (
+    (sys.platform.startswith('linux') and sys.version_info[:2] == (3, 9)) or
+    sys.platform == 'win32'
+)
+
+if skip_gui_tests:
+    import pytest
+    pytest.skip(
+        f"GUI tests skipped on {sys.platform} Python {sys.version_info[:2]} due to CI environment issues",
+        allow_module_level=True
+    )
+
+import pygame
+import pygame_gui
+
+from budgy.core.synthetic import SyntheticLedger, create_database
+from budgy.gui.record_view_panel import RecordView, RecordViewPanel
+
+
+class RecordViewPanelTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        pygame.init()
+        pygame.display.set_mode((1280, 480))
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.database = create_database(os.path.join(cls.tmpdir.name, 'records.db'), SyntheticLedger(300, seed=5))
+        cls.all_records = cls.database.all_records()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.database.connection.close()
+        cls.tmpdir.cleanup()
+        pygame.quit()
+
+    def setUp(self):
+        self.records = [dict(record) for record in self.all_records]
+        self.manager = pygame_gui.UIManager((1280, 480))
+        self.panel = RecordViewPanel(self.database, pygame.Rect(0, 0, 1280, 10 * RecordView.RECORD_VIEW_HEIGHT),
+                                     manager=self.manager)
+        self.panel.set_data(self.records)
+
+    def assert_rows(self):
+        """Every row view shows _data[starting_row + i], in its place"""
+        panel = self.panel
+        for i, record_view in enumerate(panel.record_views):
+            record = self.records[panel.starting_row + i]
+            self.assertEqual(record_view._record['fitid'], record['fitid'], f'row {i} at {panel.starting_row}')
+            self.assertEqual(record_view._fields[0].text, record['posted'][:10])
+            self.assertEqual(record_view._fields[2].text, str(record['name']))
+            self.assertEqual(record_view._record['category'], record['category'])
+            self.assertEqual(record_view.relative_rect.y, i * RecordView.RECORD_VIEW_HEIGHT)
+
+    def test_recycled_rows(self):
+        n = self.panel.visible_records
+        self.assertEqual(n, 10)
+        self.assert_rows()
+        # forward and back by less than a page recycles the row views, a page or more binds them all
+        for row in (1, 2, 12, 9, 9, 9 + n, 10 + 2 * n, 12 + 2 * n, 11 + 2 * n, 5, 4 + n, 3, 0):
+            self.panel.scroll_to_row(row)
+            self.assertEqual(self.panel.starting_row, row)
+            self.assert_rows()
+        self.panel.scroll_to_row(len(self.records))
+        self.assertEqual(self.panel.starting_row, len(self.records) - n)
+        self.assert_rows()
+
+    def test_rebind_after_show(self):
+        self.panel.scroll_to_row(20)
+        self.panel.hide()
+        # hidden panels do not render, the rows still show row 20
+        self.panel.scroll_to_row(23)
+        self.assertEqual(self.panel.record_views[0]._record['fitid'], self.records[20]['fitid'])
+        self.panel.scroll_to_row(20)
+        # hidden rows miss CATEGORY_CHANGED, showing the panel binds every row again
+        self.panel.update_categories([self.records[21]['fitid']], -1)
+        self.panel.show()
+        self.panel.render_data()
+        self.assert_rows()
+        self.panel.scroll_to_row(21)
+        self.assert_rows()
+
+    def test_jump_to_date(self):
+        dates = [record['posted'][:10] for record in self.records]
+        self.assertEqual(dates, sorted(dates))
+        date = dates[len(dates) // 2]
+        row = self.panel.jump_to_date(date)
+        self.assertEqual(row, dates.index(date))
+        self.assertEqual(self.panel.starting_row, row)
+        self.assert_rows()
+        self.assertEqual(self.panel.jump_to_date('1900-01-01'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
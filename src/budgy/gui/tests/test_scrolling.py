@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from budgy.gui.scrolling import ScrollState
+
+
+class ScrollStateTestCase(unittest.TestCase):
+    def test_wheel(self):
+        scrollbar = MagicMock()
+        scrolling = ScrollState(scrollbar)
+        scrolling.apply_wheel()
+        scrollbar.update.assert_not_called()
+        for amount in (-1, -1, -3, 1):
+            scrolling.add_wheel(amount)
+        # one scroll bar update per frame, with the events added up
+        scrolling.apply_wheel()
+        scrollbar.update.assert_called_once()
+        self.assertEqual(scrollbar.scroll_wheel_amount, -4)
+        self.assertEqual(scrolling.wheel_amount, 0)
+
+    def test_message(self):
+        scrolling = ScrollState(MagicMock(), message_interval=0.25)
+        with patch('budgy.gui.scrolling.post_show_message') as mock_post:
+            scrolling.show_message('Showing Records 1 to 30', now=10.0)
+            scrolling.show_message('Showing Records 2 to 31', now=10.1)
+            scrolling.show_message('Showing Records 3 to 32', now=10.2)
+            scrolling.flush_message(now=10.2)
+            self.assertEqual(mock_post.call_count, 1)
+            # the last position is shown when the interval is over
+            scrolling.flush_message(now=10.3)
+            mock_post.assert_called_with('Showing Records 3 to 32')
+            scrolling.flush_message(now=11.0)
+            self.assertEqual(mock_post.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,6 @@ from budgy.gui.constants import MARGIN, BUTTON_HEIGHT
 import pygame
 from pygame_gui.elements import UIPanel, UILabel, UIDropDownMenu
 from pygame_gui.core import ObjectID
-from dateutils import relativedelta
 from datetime import datetime
 
 from budgy.gui.configdata import BudgyConfig
@@ -145,6 +144,7 @@ class TopPanel(UIPanel):
         target_date = datetime.strptime(target_date, '%Y/%m/%d')
         today = datetime.today()
 
+        from dateutils import relativedelta
         delta = relativedelta(target_date, today)
 
         year_str = ''
@@ -1,5 +1,4 @@
 import argparse
-import glob
 import logging
 import logging.handlers
 import os.path
@@ -13,7 +12,10 @@ from pygame_gui_extras.app import GuiApp
 from pygame_gui.elements import UIPanel, UIButton
 
 from budgy.core.database import BudgyDatabase
-from budgy.core import load_ofx_file
+from budgy.core.sources import iter_sources
+from budgy.core.cache import StatementCache
+from budgy.core.journal import merge_sources
+from budgy.core.metrics import ImportMetrics, format_summary
 from budgy.version import __version__ as package_version
 
 import budgy.gui
@@ -25,6 +27,7 @@ from budgy.gui.function_panel import BudgyFunctionPanel
 from budgy.gui.configdata import BudgyConfig
 from budgy.gui.events import SELECT_DATABASE, OPEN_DATABASE, DELETE_ALL_DATA, post_show_message, post_clear_messages
 from budgy.gui.constants import BUTTON_WIDTH, BUTTON_HEIGHT, MARGIN
+from budgy.gui.profiler import Profiler, ProfilerOverlay
 
 class BudgyViewerApp(GuiApp):
 
@@ -43,6 +46,21 @@ class BudgyViewerApp(GuiApp):
         self._button_rect:pygame.Rect = pygame.Rect(0, 0, BUTTON_WIDTH, BUTTON_HEIGHT)
         self._database:BudgyDatabase = None
         self._config:BudgyConfig = BudgyConfig()
+        self._profiler:Profiler = None
+        self._profiler_overlay:ProfilerOverlay = None
+        if self._args.profile is not None:
+            self._profiler = Profiler()
+            self._profiler.attach_ui_manager(self._ui_manager)
+            # instance attribute, so the GuiApp main loop calls the timed handler
+            self.handle_event = self._profiler.wrap_event_handler('handle_event', self.handle_event)
+
+    @property
+    def profile_path(self):
+        if self._args.profile is None:
+            return None
+        if self._args.profile == '':
+            return self._args.log_dir / 'viewer-profile.json'
+        return Path(self._args.profile).expanduser()
 
     @property
     def database_path(self):
@@ -102,25 +120,32 @@ class BudgyViewerApp(GuiApp):
         # Once the database is open, pass it to the report panel. (this all need to be thought out better)
         self.function_panel.set_database(self._database)
 
+        if self._profiler is not None:
+            self._profiler_overlay = ProfilerOverlay(self._profiler, self.ui_manager, self.size)
+
     def open_database(self):
         dbpath = Path(self.database_path).expanduser()
         logging.info(f'Open database: {dbpath}')
         self._database = BudgyDatabase(dbpath)
+        if self._profiler is not None:
+            self._profiler.attach_database(self._database)
         self.update_database_status()
 
     def update_database_status(self):
-        records = self._database.all_records()
-        self.top_panel.set_record_count(len(records))
+        self.top_panel.set_record_count(self._database.count_records())
         start, end = self._database.get_date_range()
         self.top_panel.set_data_range(start, end)
 
         # TODO: BudgyFunctionalPanel should have a "update_database_status"
-        self.function_panel.data_panel.set_data(records)
+        self.function_panel.data_panel.set_database(self._database)
         self.function_panel.report_panel.rebuild_report()
 
     def handle_event(self, event):
         if super().handle_event(event):
             return True
+        if event.type == pygame.KEYDOWN and event.key == pygame.K_F3 and self._profiler_overlay is not None:
+            self._profiler_overlay.toggle()
+            return True
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
             if event.ui_element == self._quit_button:
                 self.is_running = False
@@ -160,26 +185,32 @@ class BudgyViewerApp(GuiApp):
             logging.info(f'load database: {event.db_path}')
             #self.open_database(event.db_path)
         elif event.type == budgy.gui.events.DATA_SOURCE_CONFIRMED:
-            files = []
-            if os.path.isdir(event.path):
-                all_files = glob.glob(event.path + '/*')
-                logging.warning(f'ALL FILES: {all_files}')
-                for file in all_files:
-                    if file.endswith('.ofx') or file.endswith('.qfx'):
-                        files.append(file)
-                        logging.debug(f'FILE: {file}')
-            else:
-                files.append(event.path)
-                logging.debug(f'FILE: {event.path}')
-            for file in files:
-                msg = f'Loading OFX data from {file}'
-                post_show_message(msg)
-                logging.info(msg)
-                records = load_ofx_file(file)
-                post_show_message(f'Merging {len(records)} imported records')
-                self._database.merge_records(records)
-                self.update_database_status()
-                post_clear_messages()
+            # directories are searched recursively, archives are read without extracting them.
+            # Files that cannot be read are reported and skipped, the rest is still imported.
+            errors = []
+            sources = list(iter_sources(event.path, errors=errors))
+            logging.info(f'Importing {len(sources)} statements from {event.path}')
+            post_show_message(f'Loading data from {len(sources)} statements')
+            # chunks are journaled, so an interrupted import resumes where it stopped
+            metrics = ImportMetrics()
+            try:
+                # parsed here, a process pool does not belong in the GUI process
+                for source, records, result in merge_sources(self._database, sources, jobs=1, metrics=metrics,
+                                                             cache=StatementCache(), errors=errors):
+                    msg = f'Merged {len(records)} records from {source.name}'
+                    post_show_message(msg)
+                    logging.info(msg)
+            except Exception as e:
+                logging.exception(f'Import from {event.path} failed')
+                post_show_message(f'Import failed: {e}', 'error')
+            metrics.finish()
+            self.update_database_status()
+            post_clear_messages()
+            summary = format_summary(metrics)
+            logging.info(summary)
+            post_show_message(summary)
+            for source, error in errors:
+                post_show_message(f'Skipped {os.path.basename(source.name)}: {error}', 'error')
             return True
         elif event.type == budgy.gui.events.DELETE_ALL_DATA_CONFIRMED:
             logging.warn('DELETING ALL DATA FROM DATABASE')
@@ -187,7 +218,7 @@ class BudgyViewerApp(GuiApp):
             self.update_database_status()
             return True
         elif event.type == budgy.gui.events.CATEGORY_CHANGED:
-            self.update_database_status()
+            # the record count and date range do not change, the panels update the affected rows and cells
             return False
 
     def _parse_args(self):
@@ -211,6 +242,14 @@ class BudgyViewerApp(GuiApp):
             action='store_true',
             help='Log to both file and console'
         )
+        parser.add_argument(
+            '--profile',
+            nargs='?',
+            const='',
+            metavar='FILE',
+            help='Time frames, event handling and database queries. F3 shows the numbers, they are '
+                 'written to FILE on exit (default: viewer-profile.json in the log directory)'
+        )
         return parser.parse_args()
 
     def _setup_logging(self):
@@ -269,6 +308,10 @@ class BudgyViewerApp(GuiApp):
         except Exception as e:
             logging.exception(f'UNHANDLED EXEPTION: {e}')
             raise e
+        finally:
+            if self._profiler is not None:
+                self._profiler.dump(self.profile_path)
+                logging.info(f'Profile written to {self.profile_path}')
 
 
 def main():
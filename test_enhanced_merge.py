@@ -215,13 +215,21 @@ def test_qfx_files(qfx_directory):
             os.unlink(test_db_path)
             print(f"\nCleaned up test database: {test_db_path}")
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python3 test_enhanced_merge.py <directory_with_qfx_files>")
+    if len(sys.argv) > 2:
+        print("Usage: python3 test_enhanced_merge.py [directory_with_qfx_files]")
         print("Example: python3 test_enhanced_merge.py ~/Documents/Retirement/statements/budget/")
+        print("Without a directory, overlapping synthetic statements are generated")
         sys.exit(1)
-    qfx_directory = sys.argv[1]
-    print(f"Testing enhanced merge logic with QFX files from: {qfx_directory}")
-    success = test_qfx_files(qfx_directory)
+    if len(sys.argv) == 2:
+        qfx_directory = sys.argv[1]
+        print(f"Testing enhanced merge logic with QFX files from: {qfx_directory}")
+        success = test_qfx_files(qfx_directory)
+    else:
+        from budgy.core.synthetic import SyntheticLedger, write_statements
+        with tempfile.TemporaryDirectory() as qfx_directory:
+            write_statements(qfx_directory, SyntheticLedger(2000, seed=1))
+            print(f"Testing enhanced merge logic with synthetic QFX files in: {qfx_directory}")
+            success = test_qfx_files(qfx_directory)
     sys.exit(0 if success else 1)
 if __name__ == '__main__':
     main()